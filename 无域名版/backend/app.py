@@ -3,26 +3,63 @@
 from __future__ import annotations
 
 import asyncio
+import atexit
+import hmac
+import itertools
+import json
 import logging
+import math
+import os
+import random
+import signal
+import sys
 import time
-from datetime import timedelta
-from typing import Dict, List, Optional, Set
+from collections import OrderedDict, deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from livekit.api import AccessToken, VideoGrants
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field, validator
 
+from coldstore import ColdStore
 from config import settings
-
-# 配置日志
-logging.basicConfig(
-    level=getattr(logging, settings.log_level),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+from eventlog import EventLog
+from fastjson import FastJSONResponse
+from journal import RoomJournal
+from load import ConnectGate, LoadMonitor
+from logsetup import setup_logging
+from lobby import LobbyFeed
+from profiler import MessageTimings, ProfilerBusy, StackSampler
+from sfu import SfuEventBatcher, SfuReconciler, SfuSnapshot, SfuUpdate, parse_webhook
+from tracing import FileExporter, RingExporter, Tracer, span, traced
+
+# 配置日志：记录经有界队列交给后台线程格式化和写出，事件循环不做日志 I/O
+log_pipeline = setup_logging(
+    settings.log_level,
+    fmt=settings.log_format,
+    queue_size=settings.log_queue_size,
+    rate=settings.log_rate_limit,
+    burst=settings.log_burst,
 )
+atexit.register(log_pipeline.stop)
 logger = logging.getLogger(__name__)
 
+event_log = EventLog(
+    settings.event_log_dir,
+    segment_bytes=settings.event_log_segment_bytes,
+    max_segments=settings.event_log_max_segments,
+    flush_interval=settings.event_log_flush_interval,
+)
+
+journal = RoomJournal(
+    settings.journal_dir,
+    segment_bytes=settings.journal_segment_bytes,
+    fsync=settings.journal_fsync,
+)
+lobby = LobbyFeed()
+
 
 def sanitize_room_id(value: str) -> str:
     cleaned = (value or "").strip()
@@ -68,6 +105,8 @@ class RoomState(BaseModel):
     media_states: Dict[str, Dict[str, bool]] = Field(default_factory=dict)
     leaderboard: List[Dict[str, int]] = Field(default_factory=list)
     updated_at: float
+    # 运行中的倒计时在服务器墙钟上的结束时间，客户端结合 time:ping 估计的时钟偏移自行插值
+    ends_at: Optional[float] = None
 
 
 class LiveKitTokenRequest(BaseModel):
@@ -85,11 +124,118 @@ class LiveKitTokenRequest(BaseModel):
         return sanitize_user_name(value)
 
 
+MEDIA_AUDIO = 1
+MEDIA_VIDEO = 2
+MEDIA_SCREEN = 4
+MEDIA_FLAGS = (("audio", MEDIA_AUDIO), ("video", MEDIA_VIDEO), ("screen", MEDIA_SCREEN))
+MEDIA_BITS = dict(MEDIA_FLAGS)
+
+
+def pack_media(media: Optional[Dict[str, Any]]) -> int:
+    """把 ``{"audio": .., "video": .., "screen": ..}`` 压缩为位字段"""
+    if not media:
+        return 0
+    return sum(bit for key, bit in MEDIA_FLAGS if media.get(key))
+
+
+def unpack_media(bits: int) -> Dict[str, bool]:
+    return {key: bool(bits & bit) for key, bit in MEDIA_FLAGS}
+
+
+# 进程实例标识，拼进 ETag，避免重启后版本号从头计数与客户端缓存的旧 ETag 撞上
+_ETAG_PREFIX = os.urandom(4).hex()
+
+
+def _etag(version: int) -> str:
+    return f'"{_ETAG_PREFIX}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """按 If-None-Match 的弱比较规则判断客户端缓存是否仍然有效"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+# 转发给只读旁观者的消息类型
+SPECTATOR_EVENT_TYPES = frozenset({"state", "event", "chat"})
+
+# 驱逐时关闭半开连接的等待上限；连接已先从房间移除，关闭只是尽力而为
+EVICT_CLOSE_TIMEOUT = 1.0
+
+
+async def close_quietly(websocket: WebSocket) -> None:
+    """尽力关闭一个被驱逐的连接，最多等待 ``EVICT_CLOSE_TIMEOUT`` 秒"""
+    try:
+        await asyncio.wait_for(websocket.close(code=1001), timeout=EVICT_CLOSE_TIMEOUT)
+    except Exception:
+        # 半开连接关闭失败是预期内的，连接已经先被移除
+        pass
+
+
+def _end_spectator(queue: asyncio.Queue) -> None:
+    """清空旁观者队列后放入结束标记，让对应的 SSE 流自行结束"""
+    while not queue.empty():
+        queue.get_nowait()
+    queue.put_nowait(None)
+
+
+def sse_frame(payload: dict) -> str:
+    """编码一条 Server-Sent Events 帧，事件名取消息的 ``type``"""
+    data = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    return f"event: {payload['type']}\ndata: {data}\n\n"
+
+
+class Participant:
+    """房间内的一个参与者：加入时间、打包后的媒体状态和进入当前专注段时的剩余秒数"""
+
+    __slots__ = ("joined_at", "media", "focus_from")
+
+    def __init__(self, joined_at: float, media: int = 0, focus_from: Optional[int] = None) -> None:
+        self.joined_at = joined_at
+        self.media = media
+        # 进入当前专注段时计时器的剩余秒数，没有进行中的专注段时为 None
+        self.focus_from = focus_from
+
+
 class Room:
-    """表示一个带有计时器和聊天状态的自习室"""
+    """表示一个带有计时器和聊天状态的自习室
+
+    房间数量可能很大，因此使用 ``__slots__``，参与者名字做驻留，
+    媒体状态存为位字段，锁在第一次使用时才创建。
+    """
+
+    __slots__ = (
+        "room_id",
+        "goal",
+        "timer_length",
+        "break_length",
+        "status",
+        "cycle",
+        "remaining",
+        "updated_at",
+        "participants",
+        "clients",
+        "client_users",
+        "user_connections",
+        "timer_task",
+        "deadline",
+        "ends_at",
+        "version",
+        "seq",
+        "replay",
+        "focus_mark",
+        "focus_credits",
+        "_lock",
+        "_media_pending",
+        "_media_flush_task",
+        "spectators",
+    )
 
-    def __init__(self, config: RoomConfig):
-        self.room_id = config.room_id
+    def __init__(self, config: RoomConfig, version: Optional[int] = None):
+        self.room_id = sys.intern(config.room_id)
         self.goal = config.goal
         self.timer_length = config.timer_length
         self.break_length = config.break_length
@@ -97,11 +243,47 @@ class Room:
         self.cycle = "focus"  # focus | break
         self.remaining = self.timer_length
         self.updated_at = time.time()
-        self.participants: Dict[str, float] = {}
-        self.clients: Set[WebSocket] = set()
-        self.media_states: Dict[str, Dict[str, bool]] = {}
+        self.participants: Dict[str, Participant] = {}
+        # 连接 -> 最近一次收到该连接消息的单调时钟时间，供心跳清理判断
+        self.clients: Dict[WebSocket, float] = {}
+        # 在线状态按连接引用计数：连接 -> 用户名，以及用户名 -> 该用户的连接数。
+        # 连接本身已在 client_users 中，这里只存计数，不为每个用户再建一个集合
+        self.client_users: Dict[WebSocket, str] = {}
+        self.user_connections: Dict[str, int] = {}
         self.timer_task: Optional[asyncio.Task] = None
-        self.lock = asyncio.Lock()
+        # 运行中倒计时归零的单调时钟时间，计时任务按它对齐每一秒，误差不会累积
+        self.deadline = 0.0
+        # 同一时刻的墙钟时间，通过 RoomState.ends_at 公开给客户端
+        self.ends_at = 0.0
+        # 公开状态的版本号，每次变化都换新值，用作 ETag；从记录恢复的房间沿用记录中的版本号，
+        # 冷存储恢复前后 ETag 不变，轮询的客户端仍能拿到 304
+        self.version = manager.next_version() if version is None else manager.adopt_version(version)
+        # 最近一条出站消息的序号。以毫秒时间戳为起点，同一房间重建（冷存储恢复、
+        # 交接、重启）后的序号总大于旧实例发出的序号，客户端带着旧序号重连时会拿到快照
+        self.seq = int(time.time() * 1000)
+        # 最近的出站消息 (序号, 已编码帧)，供断线重连的客户端续传，第一次广播时才创建
+        self.replay: Optional[deque] = None
+        # 本轮专注开始时的剩余秒数，用于在专注结束时计算实际专注时长
+        self.focus_mark: Optional[int] = None
+        # 本轮专注中途离开的用户已累计的专注秒数，有人离开时才创建
+        self.focus_credits: Optional[Dict[str, int]] = None
+        self._lock: Optional[asyncio.Lock] = None
+        # 合并窗口内待广播的媒体状态（用户 -> 最新状态），与刷新任务一起按需创建
+        self._media_pending: Optional[Dict[str, Dict[str, bool]]] = None
+        self._media_flush_task: Optional[asyncio.Task] = None
+        # 只读旁观者（SSE）的发送队列，不计入参与者，也不接收媒体流量
+        self.spectators: Optional[Set[asyncio.Queue]] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @property
+    def media_states(self) -> Dict[str, Dict[str, bool]]:
+        """参与者媒体状态的展开视图（只读副本）"""
+        return {name: unpack_media(p.media) for name, p in self.participants.items()}
 
     async def apply_config(self, config: RoomConfig) -> None:
         async with self.lock:
@@ -113,49 +295,178 @@ class Room:
             else:
                 self.remaining = min(self.remaining, self.break_length)
             self.updated_at = time.time()
+            self.mark_changed()
+
+    async def connect(self, websocket: WebSocket, since: Optional[int] = None) -> None:
+        """接受连接，并且只给这个连接补齐状态，不惊动房间里的其他人
 
-    async def connect(self, websocket: WebSocket) -> None:
+        带着 ``since`` 重连且缺口仍在重放缓冲区内时只补发错过的消息，否则发送一份
+        完整快照。最后一次检查缓冲区与加入广播目标之间没有 await，因此不会漏掉
+        消息；与随后广播重复的序号由客户端丢弃。
+        """
         await websocket.accept()
-        async with self.lock:
-            self.clients.add(websocket)
+        last = since
+        while True:
+            frames = None if last is None else self.frames_after(last)
+            if frames is None:
+                last = self.seq
+                await websocket.send_text(self.snapshot_frame())
+                continue
+            if not frames:
+                break
+            for _, frame in frames:
+                await websocket.send_text(frame)
+            last = frames[-1][0]
+        self.clients[websocket] = time.monotonic()
+        manager.note_dormancy(self)
 
     async def disconnect(self, websocket: WebSocket) -> None:
+        """停止向连接发送消息；在线状态由 ``detach`` 负责"""
         async with self.lock:
-            self.clients.discard(websocket)
+            self.clients.pop(websocket, None)
+            manager.note_dormancy(self)
 
-    async def add_participant(self, name: str) -> None:
+    async def disconnect_many(self, websockets: List[WebSocket]) -> None:
         async with self.lock:
-            self.participants[name] = time.time()
-
-    async def remove_participant(self, name: str) -> None:
+            for websocket in websockets:
+                self.clients.pop(websocket, None)
+            manager.note_dormancy(self)
+
+    @traced("room.attach")
+    async def attach(self, websocket: WebSocket, name: str) -> bool:
+        """把连接登记到用户名下，返回是否为该用户的第一个连接（即新加入）"""
+        name = sys.intern(name)
         async with self.lock:
-            self.participants.pop(name, None)
-            self.media_states.pop(name, None)
-
+            if self.client_users.get(websocket) == name:
+                # 同一连接重复发送 join
+                return False
+            self.client_users[websocket] = name
+            count = self.user_connections.get(name, 0)
+            self.user_connections[name] = count + 1
+            first = count == 0
+            if first:
+                self.participants[name] = Participant(time.time(), focus_from=self._focus_point())
+                manager.note_occupancy(self)
+            return first
+
+    @traced("room.detach")
+    async def detach(self, websocket: WebSocket) -> Optional[str]:
+        """注销连接，只有当它是该用户的最后一个连接时才移除参与者并返回用户名"""
+        async with self.lock:
+            return self._detach_locked(websocket)
+
+    def _detach_locked(self, websocket: WebSocket) -> Optional[str]:
+        name = self.client_users.pop(websocket, None)
+        if name is None:
+            return None
+        count = self.user_connections.pop(name, 0) - 1
+        if count > 0:
+            self.user_connections[name] = count
+            return None
+        self._drop_participant_locked(name)
+        manager.note_occupancy(self)
+        return name
+
+    def touch(self, websocket: WebSocket) -> None:
+        """记录连接的活跃时间；只在事件循环内调用，无需加锁"""
+        if websocket in self.clients:
+            self.clients[websocket] = time.monotonic()
+
+    @traced("room.evict")
+    async def evict(self, websockets: List[WebSocket]) -> None:
+        """批量移除无响应的连接及其参与者身份，并发关闭底层套接字后按正常离开广播"""
+        async with self.lock:
+            users = []
+            for websocket in websockets:
+                self.clients.pop(websocket, None)
+                user = self._detach_locked(websocket)
+                if user is not None:
+                    users.append(user)
+            manager.note_dormancy(self)
+
+        await asyncio.gather(*(close_quietly(websocket) for websocket in websockets))
+        await self.announce_leave(users)
+
+    async def announce_leave(self, users: List[str]) -> None:
+        """记录并广播用户离开：每人一条 ``user:leave`` 事件，最后只广播一次状态"""
+        for user in users:
+            event_log.record(self.room_id, "user:leave", user)
+            await self.broadcast({"type": "event", "event": "user:leave", "user": user})
+        if users:
+            await self.broadcast_state()
+
+    def _focus_point(self) -> Optional[int]:
+        """新参与者计入当前专注段的起点，没有进行中的专注段时为 None"""
+        return self.remaining if self.focus_mark is not None else None
+
+    def _drop_participant_locked(self, name: str) -> None:
+        """移除参与者，并把他在当前专注段内已经专注的秒数记入 ``focus_credits``"""
+        participant = self.participants.pop(name, None)
+        if participant is None or participant.focus_from is None or self.focus_mark is None:
+            return
+        seconds = participant.focus_from - self.remaining
+        if seconds > 0:
+            if self.focus_credits is None:
+                self.focus_credits = {}
+            self.focus_credits[name] = self.focus_credits.get(name, 0) + seconds
+
+    def _close_focus(self) -> Dict[str, Any]:
+        """结束当前专注段并返回要写入事件日志的字段，调用方需持有锁
+
+        每个用户只计入自己在段内实际在场的秒数：仍在场的人从加入时刻算到现在，
+        中途离开的人取离开时已记入 ``focus_credits`` 的秒数。
+        """
+        if self.focus_mark is None:
+            return {}
+        seconds = self.focus_mark - self.remaining
+        credits = self.focus_credits or {}
+        for name, participant in self.participants.items():
+            if participant.focus_from is not None:
+                present = participant.focus_from - self.remaining
+                if present > 0:
+                    credits[name] = credits.get(name, 0) + present
+                participant.focus_from = None
+        self.focus_mark = None
+        self.focus_credits = None
+        if seconds <= 0:
+            return {}
+        return {"focus": seconds, "credits": dict(sorted(credits.items()))}
+
+    @traced("room.pause")
     async def pause(self, user: str) -> None:
         async with self.lock:
             if self.status != "running":
                 return
             self.status = "paused"
             self.updated_at = time.time()
+            self.mark_changed()
             if self.timer_task:
                 self.timer_task.cancel()
                 self.timer_task = None
+            focus = self._close_focus()
+            self._journal_timer()
+        event_log.record(self.room_id, "timer:pause", user, **focus)
         await self.broadcast({"type": "event", "event": "timer:pause", "user": user})
         await self.broadcast_state()
 
+    @traced("room.reset")
     async def reset(self, user: str) -> None:
         async with self.lock:
             if self.timer_task:
                 self.timer_task.cancel()
                 self.timer_task = None
+            focus = self._close_focus()
             self.cycle = "focus"
             self.status = "idle"
             self.remaining = self.timer_length
             self.updated_at = time.time()
+            self.mark_changed()
+            self._journal_timer()
+        event_log.record(self.room_id, "timer:reset", user, **focus)
         await self.broadcast({"type": "event", "event": "timer:reset", "user": user})
         await self.broadcast_state()
 
+    @traced("room.skip_break")
     async def skip_break(self, user: str) -> None:
         async with self.lock:
             if self.cycle != "break":
@@ -167,37 +478,56 @@ class Room:
             self.status = "idle"
             self.remaining = self.timer_length
             self.updated_at = time.time()
+            self.mark_changed()
+            self._journal_timer()
+        event_log.record(self.room_id, "timer:skip_break", user)
         await self.broadcast({"type": "event", "event": "timer:skip_break", "user": user})
         await self.broadcast_state()
 
+    @traced("room.start_focus")
     async def start_focus(self, user: str) -> None:
         async with self.lock:
             if self.timer_task:
                 self.timer_task.cancel()
+            focus = self._close_focus()
             if self.cycle != "focus":
                 self.cycle = "focus"
                 self.remaining = self.timer_length
             elif self.status == "idle":
                 self.remaining = self.timer_length
             self.status = "running"
+            self.focus_mark = self.remaining
+            for participant in self.participants.values():
+                participant.focus_from = self.focus_mark
             self.updated_at = time.time()
+            self.mark_changed()
+            self._arm_deadline()
+            self._journal_timer()
             self.timer_task = asyncio.create_task(self._timer_loop())
+        event_log.record(self.room_id, "timer:start_focus", user, **focus)
         await self.broadcast({"type": "event", "event": "timer:start_focus", "user": user})
         await self.broadcast_state()
 
+    @traced("room.start_break")
     async def start_break(self, user: str) -> None:
         async with self.lock:
             if self.timer_task:
                 self.timer_task.cancel()
+            focus = self._close_focus()
             self.cycle = "break"
             self.status = "running"
             self.remaining = self.break_length
             self.updated_at = time.time()
+            self.mark_changed()
+            self._arm_deadline()
+            self._journal_timer()
             self.timer_task = asyncio.create_task(self._timer_loop())
+        event_log.record(self.room_id, "timer:start_break", user, **focus)
         await self.broadcast({"type": "event", "event": "timer:start_break", "user": user})
         await self.broadcast_state()
 
     async def _timer_loop(self) -> None:
+        interval = settings.timer_broadcast_interval
         try:
             while True:
                 async with self.lock:
@@ -205,20 +535,25 @@ class Room:
                         self.timer_task = None
                         return
                     remaining = self.remaining
-                    cycle = self.cycle
+                    deadline = self.deadline
                 if remaining <= 0:
                     proceed = await self._advance_cycle()
                     if not proceed:
                         return
                     continue
-                await asyncio.sleep(1)
+                # 睡到下一个整秒边界，按截止时间计算而不是固定 sleep(1)
+                await asyncio.sleep(max(0.0, deadline - (remaining - 1) - time.monotonic()))
                 async with self.lock:
                     if self.status != "running":
                         self.timer_task = None
                         return
-                    self.remaining = max(0, self.remaining - 1)
+                    self.remaining = min(remaining, max(0, math.ceil(deadline - time.monotonic())))
+                    ticked = self.remaining != remaining
+                    if ticked:
+                        self.mark_changed()
                     remaining = self.remaining
-                if remaining % 5 == 0 or remaining <= 10:
+                # 客户端按 ends_at 自行倒计时，周期广播只用来纠偏
+                if ticked and interval and remaining and remaining % interval == 0:
                     await self.broadcast_state()
         except asyncio.CancelledError:
             pass
@@ -229,11 +564,14 @@ class Room:
 
     async def _advance_cycle(self) -> bool:
         async with self.lock:
+            focus = self._close_focus()
             if self.cycle == "focus":
                 self.cycle = "break"
                 self.status = "running"
                 self.remaining = self.break_length
                 self.updated_at = time.time()
+                self.mark_changed()
+                self._arm_deadline()
                 continue_running = True
                 event = "timer:break_auto"
             else:
@@ -241,85 +579,473 @@ class Room:
                 self.status = "idle"
                 self.remaining = self.timer_length
                 self.updated_at = time.time()
+                self.mark_changed()
                 continue_running = False
                 event = "timer:cycle_complete"
+            self._journal_timer()
+        event_log.record(self.room_id, event, **focus)
         await self.broadcast({"type": "event", "event": event})
         await self.broadcast_state()
         return continue_running
 
+    def _arm_deadline(self) -> None:
+        """计时器开始运行时记下归零时刻，调用方需持有锁"""
+        self.deadline = time.monotonic() + self.remaining
+        self.ends_at = round(time.time() + self.remaining, 3)
+
+    def mark_changed(self) -> None:
+        """公开状态（RoomState 中的任何字段）发生变化后调用，换一个新的版本号
+
+        计时状态的每次转换都经过这里，顺带更新房间是否可以淘汰。
+        """
+        self.version = manager.next_version()
+        manager.note_dormancy(self)
+
+    @property
+    def etag(self) -> str:
+        return _etag(self.version)
+
+    def _journal_timer(self) -> None:
+        """把计时状态转换写入变更日志，调用方需持有锁；每秒的倒计时不记录，重放时按时间推算"""
+        journal.record(
+            self.room_id,
+            "timer",
+            status=self.status,
+            cycle=self.cycle,
+            remaining=self.remaining,
+            focus_mark=self.focus_mark,
+            updated_at=self.updated_at,
+        )
+
+    def to_record(self) -> Dict[str, Any]:
+        """房间持久状态的快照，用于进程交接和冷存储"""
+        return {
+            "room_id": self.room_id,
+            "goal": self.goal,
+            "timer_length": self.timer_length,
+            "break_length": self.break_length,
+            "status": self.status,
+            "cycle": self.cycle,
+            "remaining": self.remaining,
+            "focus_mark": self.focus_mark,
+            "focus_credits": self.focus_credits,
+            "updated_at": self.updated_at,
+            "saved_at": time.time(),
+            "version": self.version,
+        }
+
+    @property
+    def dormant(self) -> bool:
+        """没有任何连接、参与者或运行中的任务，可以转入冷存储"""
+        return (
+            not self.clients
+            and not self.participants
+            and not self.spectators
+            and self.status != "running"
+            and self._media_flush_task is None
+        )
+
+    async def freeze(self) -> Dict[str, Any]:
+        """停止计时任务、注销所有在线用户，并返回用于进程交接的房间记录
+
+        仍在场用户已专注的秒数先记入 ``focus_credits`` 随记录交接；排空期间
+        ``/rooms`` 和大厅也不再显示这些即将断开的参与者。
+        """
+        async with self.lock:
+            if self.timer_task:
+                self.timer_task.cancel()
+                self.timer_task = None
+            for name in list(self.participants):
+                self._drop_participant_locked(name)
+            self.client_users.clear()
+            self.user_connections.clear()
+            manager.note_occupancy(self)
+            record = self.to_record()
+        lobby.observe(self.room_id, 0, self.status, self.cycle)
+        return record
+
+    @classmethod
+    def from_handoff(cls, record: Dict[str, Any]) -> "Room":
+        """从交接记录恢复房间，运行中的计时器扣除停机期间流逝的时间后继续"""
+        room = cls(
+            RoomConfig(
+                room_id=record["room_id"],
+                goal=record.get("goal", ""),
+                timer_length=record["timer_length"],
+                break_length=record["break_length"],
+            ),
+            version=record.get("version"),
+        )
+        room.status = record["status"]
+        room.cycle = record["cycle"]
+        room.remaining = record["remaining"]
+        room.focus_mark = record.get("focus_mark")
+        room.focus_credits = record.get("focus_credits")
+        room.updated_at = record.get("updated_at", room.updated_at)
+        if room.status == "running":
+            elapsed = int(time.time() - record["saved_at"])
+            room.remaining = max(0, room.remaining - max(0, elapsed))
+            room._arm_deadline()
+            room.timer_task = asyncio.create_task(room._timer_loop())
+        return room
+
+    async def drain(self) -> None:
+        """通知所有连接服务器即将下线，并给出错开的重连延迟后关闭连接，同时结束旁观者的流"""
+        async with self.lock:
+            targets = list(self.clients)
+            self.clients.clear()
+            spectators, self.spectators = self.spectators or set(), None
+            manager.note_dormancy(self)
+        # 打开的 SSE 响应会让服务器一直等待而不进入关闭流程，排空时一并结束
+        for queue in spectators:
+            _end_spectator(queue)
+
+        async def notify(ws: WebSocket) -> None:
+            delay = round(random.uniform(0, settings.drain_reconnect_spread), 2)
+            try:
+                await ws.send_json({"type": "server:draining", "reconnect_after": delay})
+                await ws.close(code=1012)
+            except Exception:
+                pass
+
+        await asyncio.gather(*(notify(ws) for ws in targets))
+
+    def state_dict(self) -> Dict[str, Any]:
+        """``RoomState`` 的纯 dict 形式，字段顺序与模型一致，可直接编码
+
+        只在事件循环内调用。所有持锁的修改中间都不会 await，同步读取本身就是
+        一致的快照，因此不需要加锁，也省去了构造和校验 pydantic 模型。
+        """
+        return {
+            "room_id": self.room_id,
+            "goal": self.goal,
+            "timer_length": self.timer_length,
+            "break_length": self.break_length,
+            "remaining": self.remaining,
+            "status": self.status,
+            "cycle": self.cycle,
+            "participants": sorted(self.participants),
+            "media_states": self.media_states,
+            "leaderboard": [],
+            "updated_at": self.updated_at,
+            "ends_at": self.ends_at if self.status == "running" else None,
+        }
+
+    def snapshot_frame(self) -> str:
+        """当前状态的完整快照，带上它所对应的最新序号；只发给单个连接，不占用新序号"""
+        payload = {"type": "state", "data": self.state_dict(), "seq": self.seq}
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+    def frames_after(self, seq: int) -> Optional[List[Tuple[int, str]]]:
+        """返回序号大于 ``seq`` 的缓冲消息；缺口已超出缓冲区或序号不属于这个房间实例时返回 None"""
+        if seq == self.seq:
+            return []
+        replay = self.replay
+        if not replay or seq > self.seq or seq < replay[0][0] - 1:
+            return None
+        return list(itertools.islice(replay, seq - replay[0][0] + 1, None))
+
+    def _record_frame(self, payload: dict) -> str:
+        """给出站消息分配下一个序号并编码一次，同时放入重放缓冲区"""
+        self.seq += 1
+        payload["seq"] = self.seq
+        frame = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+        if settings.replay_buffer_size > 0:
+            if self.replay is None:
+                self.replay = deque(maxlen=settings.replay_buffer_size)
+            self.replay.append((self.seq, frame))
+        return frame
+
+    @traced("room.serialize")
     async def serialize(self) -> RoomState:
         async with self.lock:
-            return RoomState(
-                room_id=self.room_id,
-                goal=self.goal,
-                timer_length=self.timer_length,
-                break_length=self.break_length,
-                remaining=self.remaining,
-                status=self.status,
-                cycle=self.cycle,
-                participants=sorted(self.participants.keys()),
-                media_states={k: dict(v) for k, v in self.media_states.items()},
-                updated_at=self.updated_at,
-            )
+            return RoomState(**self.state_dict())
 
     async def broadcast_state(self) -> None:
-        state = await self.serialize()
-        await self.broadcast({"type": "state", "data": state.dict()})
-
+        with span("room.state_dict"):
+            state = self.state_dict()
+        lobby.observe(self.room_id, len(state["participants"]), state["status"], state["cycle"])
+        await self.broadcast({"type": "state", "data": state})
+
+    def add_spectator(self, queue: asyncio.Queue) -> bool:
+        if self.spectators is None:
+            self.spectators = set()
+        if len(self.spectators) >= settings.max_spectators_per_room:
+            return False
+        self.spectators.add(queue)
+        manager.note_dormancy(self)
+        return True
+
+    def remove_spectator(self, queue: asyncio.Queue) -> None:
+        if self.spectators is not None:
+            self.spectators.discard(queue)
+            if not self.spectators:
+                self.spectators = None
+                manager.note_dormancy(self)
+
+    def _fanout_spectators(self, payload: dict) -> None:
+        """把消息编码一次后放入所有旁观者队列；队列已满的慢旁观者会被断开"""
+        if not self.spectators or payload.get("type") not in SPECTATOR_EVENT_TYPES:
+            return
+        frame = sse_frame(payload)
+        slow = []
+        for queue in self.spectators:
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                slow.append(queue)
+        for queue in slow:
+            self.remove_spectator(queue)
+            _end_spectator(queue)
+
+    @traced("room.broadcast")
     async def broadcast(self, payload: dict) -> None:
-        """并发地向所有连接的客户端广播消息"""
+        """向所有连接的客户端广播消息
+
+        每条消息带有房间内递增的 ``seq`` 并进入重放缓冲区，只编码一次；连接按
+        ``fanout_batch_size`` 分批并发发送，批次之间让出事件循环，因此大房间每次
+        广播的协程数量和循环停顿都有上限。发送失败的连接最后在一次加锁中批量移除。
+        """
+        with span("room.encode"):
+            frame = self._record_frame(payload)
+            self._fanout_spectators(payload)
         async with self.lock:
             targets = list(self.clients)
+        if not targets:
+            return
 
-        async def send_to_client(ws: WebSocket) -> tuple[WebSocket, bool]:
-            """向单个客户端发送消息并返回成功状态"""
+        async def send_to_client(ws: WebSocket) -> bool:
             try:
-                await ws.send_json(payload)
-                return ws, True
+                await ws.send_text(frame)
+                return True
             except (WebSocketDisconnect, RuntimeError):
-                return ws, False
-
-        # 并发发送到所有客户端
-        results = await asyncio.gather(
-            *[send_to_client(ws) for ws in targets],
-            return_exceptions=True
-        )
-
-        # 断开失败的客户端
-        dead = []
-        for result in results:
-            if isinstance(result, tuple):
-                ws, success = result
-                if not success:
+                return False
+
+        dead: List[WebSocket] = []
+        errors = 0
+        batch_size = max(1, settings.fanout_batch_size)
+        with span("room.fanout", clients=len(targets)):
+            for start in range(0, len(targets), batch_size):
+                if start:
+                    await asyncio.sleep(0)
+                batch = targets[start : start + batch_size]
+                load_monitor.outbound_pending += len(batch)
+                try:
+                    results = await asyncio.gather(*[send_to_client(ws) for ws in batch], return_exceptions=True)
+                finally:
+                    load_monitor.outbound_pending -= len(batch)
+                for ws, result in zip(batch, results):
+                    if result is True:
+                        continue
                     dead.append(ws)
-            else:
-                # 发生异常
-                logger.error(f"向客户端广播时出错: {result}")
-
-        for ws in dead:
-            await self.disconnect(ws)
-
+                    if isinstance(result, BaseException):
+                        errors += 1
+
+        if errors:
+            logger.error("向 %s 个客户端广播时出错", errors)
+        if dead:
+            await self.disconnect_many(dead)
+
+    def queue_media_broadcast(self, user: str, media: Dict[str, bool]) -> None:
+        """把媒体状态变化放入合并窗口，窗口结束时以一条 ``media:batch`` 广播每个用户的最新状态"""
+        if self._media_pending is None:
+            self._media_pending = {}
+        self._media_pending[user] = media
+        if self._media_flush_task is None:
+            self._media_flush_task = asyncio.create_task(self._flush_media_batch())
+            manager.note_dormancy(self)
+
+    async def _flush_media_batch(self) -> None:
+        try:
+            if settings.media_batch_window > 0:
+                await asyncio.sleep(settings.media_batch_window)
+        finally:
+            pending, self._media_pending = self._media_pending, None
+            self._media_flush_task = None
+            manager.note_dormancy(self)
+        if pending:
+            updates = [{"user": user, "media": media} for user, media in pending.items()]
+            await self.broadcast({"type": "media:batch", "updates": updates})
+
+    @traced("room.apply_sfu_updates")
+    async def apply_sfu_updates(self, updates: List[SfuUpdate]) -> bool:
+        """在一次加锁中应用一批 LiveKit 事件，返回公开状态是否发生变化
+
+        SFU 是媒体状态的权威来源：取消发布或离开会清除对应标记，即使浏览器已经
+        崩溃、没有机会发送 ``media:update``。离开 SFU 且没有任何 WebSocket 连接的
+        参与者会被移除。
+        """
+        changed = False
+        removed = False
+        async with self.lock:
+            for identity, op, media in updates:
+                if op == "finished":
+                    for participant in self.participants.values():
+                        if participant.media:
+                            participant.media = 0
+                            changed = True
+                    continue
+                member = self.participants.get(identity)
+                if member is None:
+                    continue
+                if op == "left":
+                    if member.media:
+                        member.media = 0
+                        changed = True
+                    if identity not in self.user_connections:
+                        self._drop_participant_locked(identity)
+                        removed = changed = True
+                    continue
+                if media is None:
+                    continue
+                bit = MEDIA_BITS[media]
+                bits = member.media | bit if op == "publish" else member.media & ~bit
+                if bits != member.media:
+                    member.media = bits
+                    changed = True
+            if removed:
+                manager.note_occupancy(self)
+            elif changed:
+                self.mark_changed()
+        return changed
+
+    @traced("room.reconcile_sfu")
+    async def reconcile_sfu(self, snapshot: SfuSnapshot, since: float) -> bool:
+        """用 SFU 的参与者快照修正媒体状态和幽灵参与者，返回公开状态是否发生变化
+
+        快照中的参与者以 SFU 的媒体状态为准，不在快照中的参与者清除媒体标记；
+        既不在 SFU 上也没有 WebSocket 连接的参与者会被移除。``since`` 之后才加入的
+        参与者可能晚于快照，跳过不处理。
+        """
+        changed = False
+        removed = False
+        async with self.lock:
+            for name, participant in list(self.participants.items()):
+                if participant.joined_at >= since:
+                    continue
+                media = snapshot.get(name)
+                if media is None and name not in self.user_connections:
+                    self._drop_participant_locked(name)
+                    removed = changed = True
+                    continue
+                bits = pack_media(media)
+                if bits != participant.media:
+                    participant.media = bits
+                    changed = True
+            if removed:
+                manager.note_occupancy(self)
+            elif changed:
+                self.mark_changed()
+        return changed
+
+    @traced("room.update_media_state")
     async def update_media_state(self, user: str, media: Optional[Dict[str, bool]]) -> Dict[str, bool]:
-        defaults = {"audio": False, "video": False, "screen": False}
-        media = media or {}
-        normalized = {
-            "audio": bool(media.get("audio")),
-            "video": bool(media.get("video")),
-            "screen": bool(media.get("screen")),
-        }
+        """更新参与者的媒体状态；未加入房间的用户不保存状态，只返回规范化结果"""
+        bits = pack_media(media)
         async with self.lock:
-            self.media_states[user] = normalized
-            snapshot = dict(self.media_states[user])
-        return snapshot
+            participant = self.participants.get(user)
+            if participant is not None and participant.media != bits:
+                participant.media = bits
+                self.mark_changed()
+        return unpack_media(bits)
 
 
 class RoomManager:
     """管理多个房间"""
 
     def __init__(self) -> None:
-        self.rooms: Dict[str, Room] = {}
+        # 按最近使用顺序排列（最久未用的在最前）
+        self.rooms: "OrderedDict[str, Room]" = OrderedDict()
+        # 可以淘汰的休眠房间（``Room.dormant``），同样按最近使用顺序排列，容量满时从最前面淘汰。
+        # 房间获得连接、参与者、旁观者或开始计时时立即移出，淘汰因此是 O(1)
+        self._vacant: "OrderedDict[str, None]" = OrderedDict()
+        # 休眠房间的紧凑冷存储，下次访问时透明恢复
+        self.cold = ColdStore(settings.max_cold_rooms)
         self.lock = asyncio.Lock()
         self._cleanup_task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.draining = False
+        # 全局单调递增的状态版本，房间状态或活跃房间集合变化时递增，也是房间列表的 ETag
+        self.version = 0
+
+    def next_version(self) -> int:
+        self.version += 1
+        return self.version
+
+    def adopt_version(self, version: int) -> int:
+        """沿用记录中的版本号，并保证之后发出的版本号都比它大，不会与恢复的状态重复"""
+        self.version = max(self.version, version)
+        return version
+
+    async def start_heartbeat_task(self) -> None:
+        """启动覆盖所有连接的心跳清理任务"""
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+            logger.info("心跳清理任务已启动")
+
+    async def stop_heartbeat_task(self) -> None:
+        """停止心跳清理任务"""
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+            logger.info("心跳清理任务已停止")
+
+    async def _heartbeat_loop(self) -> None:
+        """定期 ping 静默的连接并清理超时未响应的连接"""
+        while True:
+            try:
+                await asyncio.sleep(settings.heartbeat_interval)
+                await self.sweep_connections()
+                await self.demote_dormant_rooms()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("心跳循环出错: %s", e, exc_info=True)
+
+    async def sweep_connections(self) -> None:
+        """一次遍历所有房间和大厅：驱逐超时连接，向静默超过一个心跳周期的连接发送 ping"""
+        now = time.monotonic()
+        async with self.lock:
+            rooms = list(self.rooms.values())
+
+        stale: Dict[Room, List[WebSocket]] = {}
+        pings = []
+        for room in rooms:
+            for ws, last_seen in list(room.clients.items()):
+                idle = now - last_seen
+                if idle > settings.heartbeat_timeout:
+                    stale.setdefault(room, []).append(ws)
+                elif idle >= settings.heartbeat_interval:
+                    pings.append(ws)
+        stale_lobby = []
+        for ws, last_seen in list(lobby.subscribers.items()):
+            idle = now - last_seen
+            if idle > settings.heartbeat_timeout:
+                lobby.unsubscribe(ws)
+                stale_lobby.append(ws)
+            elif idle >= settings.heartbeat_interval:
+                pings.append(ws)
+
+        async def ping(ws: WebSocket) -> None:
+            try:
+                await asyncio.wait_for(ws.send_json({"type": "ping", "ts": time.time()}), timeout=5)
+            except Exception:
+                # 发送失败的连接会在超时后被驱逐
+                pass
+
+        # 各房间的驱逐与 ping 并发进行，单个卡住的关闭不会拖慢整轮扫描
+        await asyncio.gather(
+            *(room.evict(sockets) for room, sockets in stale.items()),
+            *(close_quietly(ws) for ws in stale_lobby),
+            *(ping(ws) for ws in pings),
+        )
+        evicted = sum(len(sockets) for sockets in stale.values()) + len(stale_lobby)
+        if evicted:
+            logger.info("心跳超时，已驱逐 %s 个连接", evicted)
 
     async def start_cleanup_task(self) -> None:
         """启动后台清理任务"""
@@ -347,62 +1073,291 @@ class RoomManager:
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"清理循环出错: {e}", exc_info=True)
+                logger.error("清理循环出错: %s", e, exc_info=True)
 
     async def _cleanup_idle_rooms(self) -> None:
-        """移除空闲时间过长的房间"""
-        now = time.time()
-        to_remove = []
+        """把空闲时间过长的休眠房间转入冷存储
 
+        只看 ``_vacant`` 中的休眠房间；仍有连接、旁观者或运行中计时器的房间即使
+        没有参与者也保留，不会被丢弃而让这些连接挂在已不在管理器中的房间上。
+        """
         async with self.lock:
-            for room_id, room in self.rooms.items():
-                # 清理没有参与者且已空闲的房间
-                if not room.participants and (now - room.updated_at) > settings.room_idle_timeout:
-                    to_remove.append(room_id)
-
-            for room_id in to_remove:
-                # 取消任何正在运行的计时器任务
-                room = self.rooms[room_id]
-                if room.timer_task:
-                    room.timer_task.cancel()
-                del self.rooms[room_id]
-
-        if to_remove:
-            logger.info(f"已清理 {len(to_remove)} 个空闲房间: {to_remove}")
+            demoted = self._demote_idle_locked(time.time() - settings.room_idle_timeout)
+        if demoted:
+            logger.info("已清理 %s 个空闲房间: %s", len(demoted), demoted)
+
+    def _lookup_or_create(self, room_id: str, config: Optional[RoomConfig] = None) -> Tuple[Room, bool]:
+        """查找、解冻或创建房间，返回 (房间, 是否新建)
+
+        整个过程没有 await，在事件循环中天然是原子的：同一房间 ID 的并发请求
+        只有第一个会创建房间，其余直接拿到同一个实例（single-flight）；容量
+        检查读的是 ``len(self.rooms)``，也不需要持有全局锁，不同房间的创建
+        互不排队。房间 ID 先按 ``RoomConfig`` 的规则规范化，所有索引都使用
+        规范化后的 ID，与 ``Room.room_id`` 一致。
+        """
+        room_id = config.room_id if config is not None else sanitize_room_id(room_id)
+        room = self.rooms.get(room_id)
+        if room is None:
+            if self.draining:
+                raise HTTPException(status_code=503, detail="Server is draining")
+            room = self._thaw_locked(room_id)
+        if room is not None:
+            self._touch(room_id)
+            return room, False
+
+        self._ensure_capacity_locked()
+        room = Room(config or RoomConfig(room_id=room_id))
+        self.rooms[room_id] = room
+        self.note_dormancy(room)
+        lobby.room_created(room_id, 0, room.status, room.cycle)
+        journal.record(room_id, "upsert", room=room.to_record())
+        logger.info("Created room: %s", room_id)
+        return room, True
 
     async def upsert(self, config: RoomConfig) -> Room:
-        async with self.lock:
-            # Check room limit
-            if len(self.rooms) >= settings.max_rooms and config.room_id not in self.rooms:
-                raise HTTPException(
-                    status_code=429,
-                    detail=f"Maximum number of rooms ({settings.max_rooms}) reached"
-                )
-
-            room = self.rooms.get(config.room_id)
-            if room:
-                await room.apply_config(config)
-                logger.info(f"Updated room: {config.room_id}")
-            else:
-                room = Room(config)
-                self.rooms[config.room_id] = room
-                logger.info(f"Created room: {config.room_id}")
-            return room
+        room, created = self._lookup_or_create(config.room_id, config)
+        if not created:
+            # 只持有该房间自己的锁，不阻塞其他房间的创建和更新
+            await room.apply_config(config)
+            journal.record(room.room_id, "upsert", room=room.to_record())
+            logger.info("Updated room: %s", config.room_id)
+        return room
+
+    async def get_or_create(self, room_id: str) -> Room:
+        """返回已有房间，不存在时按默认配置创建；不会覆盖已有房间的配置"""
+        room, _ = self._lookup_or_create(room_id)
+        return room
 
     async def get(self, room_id: str) -> Room:
+        try:
+            room_id = sanitize_room_id(room_id)
+        except ValueError as exc:
+            raise KeyError(room_id) from exc
+        room = self.rooms.get(room_id) or self._thaw_locked(room_id)
+        if room is None:
+            raise KeyError(room_id)
+        self._touch(room_id)
+        return room
+
+    async def peek(self, room_id: str) -> Room:
+        """只读查询房间：冷存储中的房间不恢复，直接按冷记录构造一个不登记的房间
+
+        读取不占用活跃容量，也就不会因容量已满被拒绝或挤出其他休眠房间。
+        """
+        try:
+            room_id = sanitize_room_id(room_id)
+        except ValueError as exc:
+            raise KeyError(room_id) from exc
+        room = self.rooms.get(room_id)
+        if room is not None:
+            self._touch(room_id)
+            return room
+        record = self.cold.peek(room_id)
+        if record is None:
+            raise KeyError(room_id)
+        return Room.from_handoff(record)
+
+    def _ensure_capacity_locked(self) -> None:
+        """容量已满时先淘汰最久未使用的无人房间，仍然满则拒绝"""
+        while len(self.rooms) >= settings.max_rooms and self._evict_lru_locked():
+            pass
+        if len(self.rooms) >= settings.max_rooms:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Maximum number of rooms ({settings.max_rooms}) reached"
+            )
+
+    def _thaw_locked(self, room_id: str) -> Optional[Room]:
+        """把冷存储中的房间恢复为活跃房间"""
+        record = self.cold.take(room_id)
+        if record is None:
+            return None
+        try:
+            self._ensure_capacity_locked()
+        except HTTPException:
+            self.cold.put(room_id, record)
+            raise
+        room = Room.from_handoff(record)
+        self.rooms[room_id] = room
+        # 房间沿用原来的版本号，活跃房间集合的变化单独换一个全局版本
+        self.next_version()
+        self.note_dormancy(room)
+        lobby.room_created(room_id, 0, room.status, room.cycle)
+        return room
+
+    def _demote_locked(self, room: Room) -> bool:
+        if not room.dormant:
+            return False
+        self._remove_locked(room.room_id)
+        dropped = self.cold.put(room.room_id, room.to_record())
+        if dropped is not None:
+            journal.record(dropped, "remove")
+            logger.info("Cold store full, dropped room: %s", dropped)
+        return True
+
+    async def demote_dormant_rooms(self) -> int:
+        """把没有连接且超过 ``cold_room_after`` 未更新的房间转入冷存储"""
         async with self.lock:
+            demoted = self._demote_idle_locked(time.time() - settings.cold_room_after)
+        if demoted:
+            logger.info("已将 %s 个休眠房间转入冷存储", len(demoted))
+        return len(demoted)
+
+    def _demote_idle_locked(self, cutoff: float) -> List[str]:
+        """把 ``cutoff`` 之前最后更新的休眠房间转入冷存储，返回这些房间 ID"""
+        demoted = []
+        for room_id in list(self._vacant):
             room = self.rooms.get(room_id)
-            if room is None:
-                raise KeyError(room_id)
-            return room
+            if room is not None and room.updated_at < cutoff and self._demote_locked(room):
+                demoted.append(room_id)
+        return demoted
+
+    def _touch(self, room_id: str) -> None:
+        self.rooms.move_to_end(room_id)
+        if room_id in self._vacant:
+            self._vacant.move_to_end(room_id)
+
+    def note_occupancy(self, room: Room) -> None:
+        """房间参与者变化后调用，更新状态版本和休眠房间的 LRU 索引"""
+        room.mark_changed()
+
+    def note_dormancy(self, room: Room) -> None:
+        """房间的连接、参与者、旁观者或计时状态变化后调用，维护可淘汰房间的 LRU 索引
+
+        刚变为休眠的房间视为最近使用过，排在队尾。
+        """
+        room_id = room.room_id
+        if self.rooms.get(room_id) is not room:
+            return
+        if not room.dormant:
+            self._vacant.pop(room_id, None)
+        elif room_id not in self._vacant:
+            self._vacant[room_id] = None
+
+    def _remove_locked(self, room_id: str) -> Optional[Room]:
+        room = self.rooms.pop(room_id, None)
+        self._vacant.pop(room_id, None)
+        if room is None:
+            return None
+        self.next_version()
+        # 取消任何正在运行的计时器任务
+        if room.timer_task:
+            room.timer_task.cancel()
+        lobby.room_removed(room_id)
+        return room
+
+    def _discard_locked(self, room_id: str) -> None:
+        """彻底丢弃房间（不进入冷存储），并记入变更日志"""
+        if self._remove_locked(room_id) is not None:
+            journal.record(room_id, "remove")
+
+    def _evict_lru_locked(self) -> bool:
+        """淘汰最久未使用的休眠房间（转入冷存储），没有可淘汰的房间时返回 False
+
+        ``_vacant`` 只包含休眠房间，队首就是淘汰对象。万一索引与房间状态不一致，
+        该条目被移除而不是移到队尾，每个条目最多被跳过一次。
+        """
+        while self._vacant:
+            room_id = next(iter(self._vacant))
+            room = self.rooms.get(room_id)
+            if room is None or not self._demote_locked(room):
+                del self._vacant[room_id]
+                continue
+            logger.info("Evicted least recently used room: %s", room_id)
+            return True
+        return False
+
+    def list_states(self) -> List[Dict[str, Any]]:
+        # 按房间 ID 排序而不是按 LRU 顺序，同一版本号对应的列表内容才是确定的
+        return [self.rooms[room_id].state_dict() for room_id in sorted(self.rooms)]
 
-    async def list_states(self) -> List[RoomState]:
+
+    async def drain(self, handoff_file: str) -> int:
+        """进入排空模式：停止接收新房间、保存房间状态供下一个进程加载、通知并断开所有连接"""
         async with self.lock:
+            if self.draining:
+                return 0
+            self.draining = True
             rooms = list(self.rooms.values())
-        return await asyncio.gather(*(room.serialize() for room in rooms))
+
+        records = [await room.freeze() for room in rooms]
+        records.extend(self.cold.records())
+        await asyncio.to_thread(_write_handoff, handoff_file, records)
+        await asyncio.gather(*(room.drain() for room in rooms))
+        logger.info("已排空 %s 个房间，交接文件: %s", len(rooms), handoff_file)
+        return len(rooms)
+
+    async def load_handoff(self, handoff_file: str) -> int:
+        """加载上一个进程留下的交接文件，加载后删除以免重复恢复"""
+        if not os.path.exists(handoff_file):
+            return 0
+        try:
+            with open(handoff_file, "r", encoding="utf-8") as fh:
+                records = json.load(fh)
+        except (OSError, ValueError) as e:
+            logger.warning("无法读取交接文件 %s: %s", handoff_file, e)
+            return 0
+        finally:
+            os.remove(handoff_file)
+
+        restored = await self.restore(records)
+        logger.info("已从交接文件恢复 %s 个房间", restored)
+        return restored
+
+    async def restore(self, records: List[Dict[str, Any]]) -> int:
+        """按房间记录恢复房间，已存在的房间（例如已由变更日志恢复）跳过"""
+        restored = 0
+        async with self.lock:
+            for record in records:
+                room_id = record["room_id"]
+                if room_id in self.rooms or room_id in self.cold:
+                    continue
+                restored += 1
+                journal.record(room_id, "upsert", room=record)
+                if len(self.rooms) >= settings.max_rooms and record["status"] != "running":
+                    # 超出活跃容量的休眠房间直接放回冷存储
+                    self.cold.put(room_id, record)
+                    continue
+                room = Room.from_handoff(record)
+                self.rooms[room_id] = room
+                self.next_version()
+                self.note_dormancy(room)
+                lobby.room_created(room_id, 0, room.status, room.cycle)
+        return restored
+
+
+def _write_handoff(path: str, records: List[Dict[str, Any]]) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(records, fh, separators=(",", ":"), ensure_ascii=False)
+    os.replace(tmp_path, path)
 
 
 manager = RoomManager()
+load_monitor = LoadMonitor(
+    lambda: sum(len(room.clients) for room in list(manager.rooms.values())),
+    max_loop_lag=settings.admission_max_loop_lag,
+    max_connections=settings.admission_max_connections,
+    max_outbound=settings.admission_max_outbound,
+    retry_after=settings.admission_retry_after,
+)
+connect_gate = ConnectGate(
+    rate=settings.connect_rate_limit,
+    burst=settings.connect_burst,
+    max_queue=settings.connect_queue_size,
+    max_wait=settings.connect_queue_timeout,
+)
+profiler = StackSampler(interval=settings.profile_interval)
+message_timings = MessageTimings()
+trace_ring = RingExporter(settings.trace_ring_size)
+trace_file = FileExporter(settings.trace_file) if settings.trace_file else None
+tracer = Tracer(settings.trace_sample_rate, [trace_ring] + ([trace_file] if trace_file else []))
+
+# 进程内唯一的连接编号，用于生成不会冲突的访客名
+_connection_ids = itertools.count(1)
 
 app = FastAPI(title="Online Study Room API")
 
@@ -413,13 +1368,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     """Global exception handler for unhandled errors."""
-    logger.error(f"Unhandled exception: {exc}", exc_info=True)
+    logger.error("Unhandled exception: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
@@ -434,10 +1390,22 @@ async def startup_event() -> None:
         settings.validate_required()
         logger.info("Configuration validated successfully")
     except ValueError as e:
-        logger.warning(f"Configuration validation failed: {e}")
+        logger.warning("Configuration validation failed: %s", e)
         logger.warning("LiveKit features will be disabled")
 
+    if settings.journal_enabled:
+        restored = await manager.restore(await journal.replay())
+        logger.info("已从变更日志恢复 %s 个房间", restored)
+        await journal.start()
+    await manager.load_handoff(settings.handoff_file)
+    _install_sigterm_drain()
     await manager.start_cleanup_task()
+    await manager.start_heartbeat_task()
+    await load_monitor.start()
+    if settings.event_log_enabled:
+        await event_log.start()
+    if settings.sfu_reconcile_interval > 0 and settings.livekit_api_key and settings.livekit_api_secret:
+        await sfu_reconciler.start()
     logger.info("Application started successfully")
 
 
@@ -445,10 +1413,75 @@ async def startup_event() -> None:
 async def shutdown_event() -> None:
     """Clean up resources on shutdown."""
     logger.info("Shutting down application...")
+    await manager.drain(settings.handoff_file)
     await manager.stop_cleanup_task()
+    await manager.stop_heartbeat_task()
+    await load_monitor.stop()
+    await event_log.stop()
+    await journal.stop()
+    await sfu_reconciler.stop()
+    if trace_file is not None:
+        await asyncio.to_thread(trace_file.close)
     logger.info("Application shut down successfully")
 
 
+# SIGTERM 触发的排空任务，保存引用以免被垃圾回收
+_sigterm_drain: Optional[asyncio.Task] = None
+
+
+def _install_sigterm_drain() -> None:
+    """在服务器自己的 SIGTERM 处理器之前先排空房间
+
+    uvicorn 收到 SIGTERM 后会先以 1012 关闭所有 WebSocket，之后才运行 shutdown 事件，
+    客户端因此收不到 ``server:draining`` 和错开的重连延迟。这里包装已安装的处理器：
+    先发送排空通知、写交接文件，完成后再交给原处理器开始关闭。没有服务器处理器
+    （例如测试客户端）或不在主线程时什么都不做。
+    """
+    previous = signal.getsignal(signal.SIGTERM)
+    if not callable(previous):
+        return
+    loop = asyncio.get_running_loop()
+
+    async def drain_then_exit(sig: int, frame: Any) -> None:
+        try:
+            await asyncio.wait_for(manager.drain(settings.handoff_file), timeout=settings.drain_timeout)
+        except Exception as e:
+            logger.error("收到 SIGTERM 后排空失败: %s", e, exc_info=True)
+        finally:
+            previous(sig, frame)
+
+    def start_drain(sig: int, frame: Any) -> None:
+        global _sigterm_drain
+        _sigterm_drain = loop.create_task(drain_then_exit(sig, frame))
+
+    def handle(sig: int, frame: Any) -> None:
+        loop.call_soon_threadsafe(start_drain, sig, frame)
+
+    try:
+        signal.signal(signal.SIGTERM, handle)
+    except ValueError:
+        return
+    logger.info("已安装 SIGTERM 排空处理器")
+
+
+def _check_admission() -> None:
+    """过载时以 503 拒绝新的会话请求，并通过 Retry-After 提示客户端稍后重试"""
+    retry_after = load_monitor.admit()
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is overloaded, retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+async def _refuse_websocket(websocket: WebSocket, message_type: str, retry_after: float, code: int) -> None:
+    """接受握手后立即发送带重试提示的消息并关闭，浏览器无法读取握手被拒时的响应"""
+    await websocket.accept()
+    await websocket.send_json({"type": message_type, "reconnect_after": retry_after})
+    await websocket.close(code=code, reason=f"retry_after={retry_after}")
+
+
 class RoomCreateRequest(RoomConfig):
     pass
 
@@ -459,36 +1492,192 @@ class Message(BaseModel):
     text: Optional[str] = None
     goal: Optional[str] = None
     media: Optional[Dict[str, bool]] = None
+    t0: Optional[float] = None
 
 
 @app.post("/rooms", response_model=RoomState)
-async def create_room(payload: RoomCreateRequest) -> RoomState:
+async def create_room(payload: RoomCreateRequest) -> FastJSONResponse:
+    _check_admission()
     room = await manager.upsert(payload)
-    return await room.serialize()
+    return FastJSONResponse(room.state_dict(), headers={"ETag": room.etag})
 
 
 @app.get("/rooms", response_model=List[RoomState])
-async def list_rooms() -> List[RoomState]:
-    return await manager.list_states()
+async def list_rooms(if_none_match: Optional[str] = Header(default=None)) -> Response:
+    """List active rooms; the ETag is the aggregate state version of all rooms."""
+    etag = _etag(manager.version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return FastJSONResponse(manager.list_states(), headers={"ETag": etag})
 
 
 @app.get("/rooms/{room_id}", response_model=RoomState)
-async def get_room(room_id: str) -> RoomState:
+async def get_room(room_id: str, if_none_match: Optional[str] = Header(default=None)) -> Response:
+    """Return one room's state, or 304 without serializing when the ETag still matches.
+
+    Cold rooms are served from their stored record without being thawed.
+    """
+    try:
+        room = await manager.peek(room_id)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Room not found") from exc
+    # 状态字典是同步构建的，版本号和内容一定对应同一个时刻
+    etag = room.etag
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return FastJSONResponse(room.state_dict(), headers={"ETag": etag})
+
+
+async def spectator_stream(room: Room, queue: asyncio.Queue):
+    """Yield pre-encoded SSE frames for one spectator, starting with the current state."""
+    try:
+        yield sse_frame({"type": "state", "data": room.state_dict()})
+        while True:
+            try:
+                frame = await asyncio.wait_for(queue.get(), timeout=settings.spectator_keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if frame is None:
+                return
+            yield frame
+    finally:
+        room.remove_spectator(queue)
+
+
+@app.get("/rooms/{room_id}/events")
+async def room_events(room_id: str) -> StreamingResponse:
+    """Read-only Server-Sent Events stream of a room's state, events and chat."""
     try:
         room = await manager.get(room_id)
     except KeyError as exc:
         raise HTTPException(status_code=404, detail="Room not found") from exc
-    return await room.serialize()
+    if manager.draining:
+        raise HTTPException(status_code=503, detail="Server is draining")
+    _check_admission()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.spectator_queue_size)
+    if not room.add_spectator(queue):
+        raise HTTPException(status_code=429, detail="Too many spectators")
+    return StreamingResponse(
+        spectator_stream(room, queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/rooms/{room_id}/reset", response_model=RoomState)
-async def reset_room(room_id: str, user: str = "system") -> RoomState:
+async def reset_room(room_id: str, user: str = "system") -> FastJSONResponse:
     try:
         room = await manager.get(room_id)
     except KeyError as exc:
         raise HTTPException(status_code=404, detail="Room not found") from exc
     await room.reset(user=user)
-    return await room.serialize()
+    return FastJSONResponse(room.state_dict(), headers={"ETag": room.etag})
+
+
+def _focus_report(kind: str, key: str, start: Optional[date], end: Optional[date]) -> Dict[str, Any]:
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=6)
+    if start > end:
+        raise HTTPException(status_code=422, detail="start must not be after end")
+    days = event_log.focus_seconds(kind, key, start, end)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "focus_minutes": round(sum(days.values()) / 60, 1),
+        "days": {day: round(seconds / 60, 1) for day, seconds in days.items()},
+    }
+
+
+@app.get("/stats/rooms/{room_id}/focus")
+async def room_focus_stats(room_id: str, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Any]:
+    """Focus minutes logged in a room between two UTC dates (inclusive)."""
+    try:
+        room_id = sanitize_room_id(room_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    report = _focus_report("rooms", room_id, start, end)
+    return {"room_id": room_id, **report}
+
+
+@app.get("/stats/users/{user}/focus")
+async def user_focus_stats(user: str, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Any]:
+    """Focus minutes a user spent in running focus cycles between two UTC dates."""
+    report = _focus_report("users", user, start, end)
+    return {"user": user, **report}
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """管理接口的令牌校验：未配置令牌时一律拒绝，比较使用常量时间"""
+    expected = settings.admin_token.encode("utf-8")
+    supplied = (x_admin_token or "").encode("utf-8")
+    if not expected or not hmac.compare_digest(supplied, expected):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.post("/admin/drain", dependencies=[Depends(require_admin)])
+async def drain_server() -> Dict[str, Any]:
+    """Enter drain mode ahead of a rolling deploy and hand room state to the next process."""
+    drained = await manager.drain(settings.handoff_file)
+    return {"draining": True, "rooms": drained}
+
+
+@app.get("/admin/load", dependencies=[Depends(require_admin)])
+async def load_stats() -> Dict[str, Any]:
+    """Report admission signals, including the connect rate and the connect queue."""
+    return {
+        "loop_lag": round(load_monitor.loop_lag, 4),
+        "connections": load_monitor.connections,
+        "outbound_pending": load_monitor.outbound_pending,
+        "rejected": load_monitor.rejected,
+        "connect_rate": round(load_monitor.connect_rate, 2),
+        "connect_queue": connect_gate.waiting,
+        "connect_backlog": round(connect_gate.backlog(), 3),
+        "connects_admitted": connect_gate.admitted,
+        "connects_refused": connect_gate.refused,
+        "logs": log_pipeline.stats(),
+    }
+
+
+@app.get("/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile_event_loop(
+    seconds: float = Query(default=5.0, gt=0),
+) -> PlainTextResponse:
+    """Sample the event loop thread's stack and return flamegraph-compatible collapsed stacks."""
+    seconds = min(seconds, settings.profile_max_seconds)
+    try:
+        stacks = await profiler.profile(seconds)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return PlainTextResponse(stacks)
+
+
+@app.get("/admin/message-timings", dependencies=[Depends(require_admin)])
+async def message_timing_stats(
+    reset: bool = False,
+) -> Dict[str, Any]:
+    """Per-message-type handling time histograms collected while MESSAGE_TIMING is enabled."""
+    result = {
+        "enabled": settings.message_timing,
+        "since": message_timings.started,
+        "types": message_timings.snapshot(),
+    }
+    if reset:
+        message_timings.reset()
+    return result
+
+
+@app.get("/admin/traces", dependencies=[Depends(require_admin)])
+async def recent_traces(
+    limit: int = Query(default=50, ge=1, le=1000),
+    name: str = "",
+) -> Dict[str, Any]:
+    """Return the most recent sampled traces, newest first, optionally filtered by root span name."""
+    return {
+        "sample_rate": tracer.sample_rate,
+        "sampled": tracer.sampled,
+        "traces": trace_ring.traces(limit, name),
+    }
 
 
 @app.post("/sfu/token")
@@ -503,99 +1692,239 @@ async def issue_livekit_token(payload: LiveKitTokenRequest) -> Dict[str, str]:
     identity = payload.user
     room_id = payload.room_id
 
-    logger.info(f"为用户 '{identity}' 在房间 '{room_id}' 中签发 LiveKit 令牌")
-
-    ttl_seconds = max(60, int(settings.livekit_token_ttl or 0))
-    token_ttl = timedelta(seconds=ttl_seconds)
-
-    token = AccessToken(
-        settings.livekit_api_key,
-        settings.livekit_api_secret
-    ).with_identity(identity).with_name(identity).with_grants(
-        VideoGrants(
-            room_join=True,
-            room=room_id,
-            can_publish=True,
-            can_subscribe=True,
-            can_publish_data=True,
-        )
-    ).with_ttl(token_ttl)
+    with tracer.trace("http.sfu_token", room=room_id):
+        # livekit.api 连同 protobuf 等依赖导入较慢，且未配置凭证时根本用不到，
+        # 因此推迟到第一次签发令牌时再导入
+        from livekit.api import AccessToken, VideoGrants
+
+        logger.info("为用户 '%s' 在房间 '%s' 中签发 LiveKit 令牌", identity, room_id)
+
+        ttl_seconds = max(60, int(settings.livekit_token_ttl or 0))
+        token_ttl = timedelta(seconds=ttl_seconds)
+
+        token = AccessToken(
+            settings.livekit_api_key,
+            settings.livekit_api_secret
+        ).with_identity(identity).with_name(identity).with_grants(
+            VideoGrants(
+                room_join=True,
+                room=room_id,
+                can_publish=True,
+                can_subscribe=True,
+                can_publish_data=True,
+            )
+        ).with_ttl(token_ttl)
+
+        return {
+            "token": token.to_jwt(),
+            "server_url": settings.livekit_server_url,
+            "room": room_id,
+            "identity": identity,
+            "ttl": str(ttl_seconds),
+        }
 
-    return {
-        "token": token.to_jwt(),
-        "server_url": settings.livekit_server_url,
-        "room": room_id,
-        "identity": identity,
-        "ttl": str(ttl_seconds),
-    }
 
+async def _apply_sfu_updates(room_id: str, updates: List[SfuUpdate]) -> None:
+    # 只处理活跃房间；冷存储中的房间没有参与者，也就没有需要修正的媒体状态
+    room = manager.rooms.get(room_id)
+    if room is not None and await room.apply_sfu_updates(updates):
+        await room.broadcast_state()
 
-@app.websocket("/ws/rooms/{room_id}")
-async def room_socket(websocket: WebSocket, room_id: str) -> None:
+
+sfu_events = SfuEventBatcher(_apply_sfu_updates, window=settings.sfu_webhook_batch_window)
+
+
+def _rooms_to_reconcile() -> List[str]:
+    return [room_id for room_id, room in manager.rooms.items() if room.participants]
+
+
+async def _reconcile_room(room_id: str, snapshot: SfuSnapshot, since: float) -> None:
+    room = manager.rooms.get(room_id)
+    if room is not None and await room.reconcile_sfu(snapshot, since):
+        await room.broadcast_state()
+
+
+sfu_reconciler = SfuReconciler(
+    _rooms_to_reconcile,
+    _reconcile_room,
+    url=settings.livekit_server_url,
+    api_key=settings.livekit_api_key,
+    api_secret=settings.livekit_api_secret,
+    interval=settings.sfu_reconcile_interval,
+    batch_size=settings.sfu_reconcile_batch_size,
+    rate=settings.sfu_reconcile_rate,
+    max_connections=settings.sfu_reconcile_connections,
+)
+
+
+@app.post("/sfu/webhook")
+async def livekit_webhook(request: Request, authorization: str = Header(default="")) -> Dict[str, bool]:
+    """Receive a LiveKit webhook and queue its media / presence change for the room."""
+    if not settings.livekit_api_key or not settings.livekit_api_secret:
+        raise HTTPException(status_code=503, detail="LiveKit credentials are not configured.")
+    body = (await request.body()).decode("utf-8")
     try:
-        room = await manager.get(room_id)
-    except KeyError:
-        config = RoomConfig(room_id=room_id)
-        room = await manager.upsert(config)
+        parsed = parse_webhook(body, authorization, settings.livekit_api_key, settings.livekit_api_secret)
+    except Exception as exc:
+        logger.warning("LiveKit webhook 校验失败: %s", exc)
+        raise HTTPException(status_code=401, detail="Invalid webhook signature") from exc
+    if parsed is not None:
+        sfu_events.submit(*parsed)
+    return {"ok": True}
+
 
-    await room.connect(websocket)
-    await room.broadcast_state()
+async def _announce_leave(room: Room, user: Optional[str]) -> None:
+    """用户的最后一个连接离开时广播离开事件；还有其他连接时什么都不做"""
+    if user is not None:
+        await room.announce_leave([user])
 
-    user_name = f"guest-{int(time.time())}"
 
+@app.websocket("/ws/lobby")
+async def lobby_socket(websocket: WebSocket) -> None:
+    """Stream a room-list snapshot followed by compact deltas."""
+    await websocket.accept()
     try:
+        await lobby.subscribe(websocket)
+        while True:
+            # 大厅连接只接收推送；读取循环用于及时感知断开，并把 pong 记为活跃
+            await websocket.receive_text()
+            lobby.touch(websocket)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        lobby.unsubscribe(websocket)
+
+
+# _handle_message 认识的消息类型。耗时统计和追踪名称只用这些类型作键，其余一律记为
+# "other"，客户端随意填写的 type 不会让统计表无限增长
+_MESSAGE_TYPES = frozenset(
+    {
+        "pong",
+        "time:ping",
+        "join",
+        "leave",
+        "timer:start_focus",
+        "timer:start_break",
+        "timer:pause",
+        "timer:reset",
+        "timer:skip_break",
+        "chat",
+        "goal:update",
+        "media:update",
+    }
+)
+
+
+async def _handle_message(
+    room: Room, websocket: WebSocket, message: Message, user_name: str, received_at: float
+) -> str:
+    """处理一条房间 WebSocket 消息，返回该连接此后使用的用户名"""
+    user = message.user or user_name
+
+    if message.type == "pong":
+        return user_name
+    if message.type == "time:ping":
+        # NTP 式对时：t0 为客户端发送时间，t1/t2 为服务器收到和回复时的墙钟时间
+        await websocket.send_json(
+            {
+                "type": "time:pong",
+                "t0": message.t0,
+                "t1": received_at,
+                "t2": time.time(),
+                "mono": time.monotonic(),
+            }
+        )
+        return user_name
+    if message.type == "join":
+        user = user_name = sys.intern(user)
+        previous = room.client_users.get(websocket)
+        if previous is not None and previous != user:
+            # 同一连接改名：按旧名字离开
+            await _announce_leave(room, await room.detach(websocket))
+        if await room.attach(websocket, user):
+            event_log.record(room.room_id, "user:join", user)
+            await room.broadcast({"type": "event", "event": "user:join", "user": user})
+            await room.broadcast_state()
+        else:
+            # 同一用户的另一个标签页：只给这个连接发状态，不惊动整个房间
+            await websocket.send_text(room.snapshot_frame())
+    elif message.type == "leave":
+        await _announce_leave(room, await room.detach(websocket))
+    elif message.type == "timer:start_focus":
+        await room.start_focus(user=user)
+    elif message.type == "timer:start_break":
+        await room.start_break(user=user)
+    elif message.type == "timer:pause":
+        await room.pause(user=user)
+    elif message.type == "timer:reset":
+        await room.reset(user=user)
+    elif message.type == "timer:skip_break":
+        await room.skip_break(user=user)
+    elif message.type == "chat":
+        if not message.text:
+            return user_name
+        payload = {
+            "type": "chat",
+            "user": user,
+            "text": message.text.strip(),
+            "ts": time.time(),
+        }
+        await room.broadcast(payload)
+    elif message.type == "goal:update":
+        goal_text = message.goal or ""
+        room.goal = goal_text[:120]
+        room.updated_at = time.time()
+        room.mark_changed()
+        journal.record(room.room_id, "goal", goal=room.goal, updated_at=room.updated_at)
+        await room.broadcast({"type": "event", "event": "goal:update", "goal": room.goal})
+        await room.broadcast_state()
+    elif message.type == "media:update":
+        snapshot = await room.update_media_state(user, message.media)
+        room.queue_media_broadcast(user, snapshot)
+    return user_name
+
+
+@app.websocket("/ws/rooms/{room_id}")
+async def room_socket(websocket: WebSocket, room_id: str, since: Optional[int] = None) -> None:
+    if manager.draining:
+        delay = round(random.uniform(0, settings.drain_reconnect_spread), 2)
+        await _refuse_websocket(websocket, "server:draining", delay, code=1012)
+        return
+    retry_after = load_monitor.admit()
+    if retry_after is not None:
+        # 1013 = Try Again Later
+        await _refuse_websocket(websocket, "server:busy", retry_after, code=1013)
+        return
+    # 重连风暴时新连接在这里排队匀速放行，之后才查找房间和发送状态
+    queued_retry = await connect_gate.acquire()
+    if queued_retry is not None:
+        await _refuse_websocket(websocket, "server:busy", queued_retry, code=1013)
+        return
+    load_monitor.note_connect()
+
+    room = await manager.get_or_create(room_id)
+    user_name = f"guest-{next(_connection_ids)}"
+
+    try:
+        await room.connect(websocket, since)
         while True:
             try:
                 raw = await websocket.receive_json()
             except RuntimeError as exc:
                 # Starlette raises RuntimeError instead of WebSocketDisconnect
                 # when the client disappears before we can accept / read.
-                message = str(exc)
-                if "WebSocket is not connected" in message:
+                if "WebSocket is not connected" in str(exc):
                     raise WebSocketDisconnect() from exc
                 raise
+            received_at = time.time()
+            room.touch(websocket)
             message = Message(**raw)
-            user = message.user or user_name
-
-            if message.type == "join":
-                user_name = user
-                await room.add_participant(user)
-                await room.broadcast({"type": "event", "event": "user:join", "user": user})
-                await room.broadcast_state()
-            elif message.type == "leave":
-                await room.remove_participant(user)
-                await room.broadcast({"type": "event", "event": "user:leave", "user": user})
-                await room.broadcast_state()
-            elif message.type == "timer:start_focus":
-                await room.start_focus(user=user)
-            elif message.type == "timer:start_break":
-                await room.start_break(user=user)
-            elif message.type == "timer:pause":
-                await room.pause(user=user)
-            elif message.type == "timer:reset":
-                await room.reset(user=user)
-            elif message.type == "timer:skip_break":
-                await room.skip_break(user=user)
-            elif message.type == "chat":
-                if not message.text:
-                    continue
-                payload = {
-                    "type": "chat",
-                    "user": user,
-                    "text": message.text.strip(),
-                    "ts": time.time(),
-                }
-                await room.broadcast(payload)
-            elif message.type == "goal:update":
-                goal_text = message.goal or ""
-                room.goal = goal_text[:120]
-                room.updated_at = time.time()
-                await room.broadcast({"type": "event", "event": "goal:update", "goal": room.goal})
-                await room.broadcast_state()
-            elif message.type == "media:update":
-                snapshot = await room.update_media_state(user, message.media)
-                payload = {"type": "media:update", "user": user, "media": snapshot}
-                await room.broadcast(payload)
+            kind = message.type if message.type in _MESSAGE_TYPES else "other"
+            started = time.perf_counter() if settings.message_timing else 0.0
+            with tracer.trace("ws." + kind, room=room.room_id):
+                user_name = await _handle_message(room, websocket, message, user_name, received_at)
+            if started:
+                message_timings.observe(kind, time.perf_counter() - started)
     except WebSocketDisconnect:
         await room.disconnect(websocket)
     except RuntimeError as exc:
@@ -605,8 +1934,7 @@ async def room_socket(websocket: WebSocket, room_id: str) -> None:
             raise
         await room.disconnect(websocket)
     finally:
-        await room.remove_participant(user_name)
-        await room.broadcast_state()
+        await _announce_leave(room, await room.detach(websocket))
 
 
 if __name__ == "__main__":
@@ -617,5 +1945,9 @@ if __name__ == "__main__":
         host=settings.host,
         port=settings.port,
         reload=settings.reload,
-        log_level=settings.log_level.lower()
+        log_level=settings.log_level.lower(),
+        # 日志由 setup_logging 统一接管，不让 uvicorn 再装上同步写出的处理器
+        log_config=None,
+        # SIGTERM 时先排空再关闭；仍未结束的连接最多再等这么久
+        timeout_graceful_shutdown=settings.graceful_shutdown_timeout,
     )
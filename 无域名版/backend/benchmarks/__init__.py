@@ -0,0 +1,7 @@
+"""Benchmark suite for the study room backend.
+
+Run every benchmark with ``python -m benchmarks`` (or ``make bench``) from the
+``backend`` directory, or a single one with ``python -m benchmarks.bench_startup``.
+Each module exposes ``main(argv) -> int``; a non-zero return means a budget
+was exceeded.
+"""
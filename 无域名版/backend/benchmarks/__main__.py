@@ -0,0 +1,27 @@
+"""Run every ``bench_*`` module in this package and report failures."""
+
+import importlib
+import pkgutil
+import sys
+from pathlib import Path
+
+
+def main() -> int:
+    failed = []
+    package_dir = Path(__file__).parent
+    for info in sorted(pkgutil.iter_modules([str(package_dir)]), key=lambda m: m.name):
+        if not info.name.startswith("bench_"):
+            continue
+        print(f"=== {info.name}")
+        module = importlib.import_module(f"benchmarks.{info.name}")
+        if module.main([]) != 0:
+            failed.append(info.name)
+        print()
+    if failed:
+        print(f"Budget exceeded: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
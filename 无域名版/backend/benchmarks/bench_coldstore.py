@@ -0,0 +1,85 @@
+"""Dormant-room footprint in the cold tier and reactivation latency.
+
+Builds N dormant rooms, demotes them all to the cold store and reports the
+traced bytes per room in each tier, then rehydrates a sample of rooms through
+``RoomManager.get`` and reports the latency distribution.
+"""
+
+import argparse
+import asyncio
+import gc
+import sys
+import time
+import tracemalloc
+from typing import List, Optional, Tuple
+
+from app import Room, RoomConfig, RoomManager
+from config import settings
+
+
+def _room_id(i: int) -> str:
+    return f"dormant{i:07d}"
+
+
+async def measure(rooms: int, sample: int) -> Tuple[float, float, List[float]]:
+    manager = RoomManager()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(rooms):
+            room = Room(RoomConfig(room_id=_room_id(i), goal="Review lecture notes"))
+            room.updated_at -= 1
+            manager.rooms[room.room_id] = room
+            manager.note_dormancy(room)
+        gc.collect()
+        hot = tracemalloc.get_traced_memory()[0] - before
+        await manager.demote_dormant_rooms()
+        gc.collect()
+        cold = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    latencies: List[float] = []
+    for i in range(0, rooms, max(1, rooms // sample)):
+        started = time.perf_counter()
+        await manager.get(_room_id(i))
+        latencies.append(time.perf_counter() - started)
+    return hot / rooms, cold / rooms, latencies
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, default=100000)
+    parser.add_argument("--sample", type=int, default=2000)
+    parser.add_argument("--cold-budget", type=float, default=512, help="max bytes per cold room")
+    parser.add_argument("--latency-budget", type=float, default=0.001, help="max p99 rehydration latency (s)")
+    args = parser.parse_args(argv)
+
+    saved = (settings.max_rooms, settings.max_cold_rooms, settings.cold_room_after)
+    settings.max_rooms = args.rooms
+    settings.max_cold_rooms = args.rooms
+    settings.cold_room_after = 0
+    try:
+        hot, cold, latencies = asyncio.run(measure(args.rooms, args.sample))
+    finally:
+        settings.max_rooms, settings.max_cold_rooms, settings.cold_room_after = saved
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    print(f"{args.rooms} dormant rooms: hot {hot:6.0f} B/room  cold {cold:6.0f} B/room")
+    print(f"rehydrate via get(): p50 {p50 * 1e6:7.1f} us  p99 {p99 * 1e6:7.1f} us")
+
+    ok = True
+    if cold > args.cold_budget:
+        print(f"cold budget of {args.cold_budget:.0f} B/room exceeded")
+        ok = False
+    if p99 > args.latency_budget:
+        print(f"latency budget of {args.latency_budget * 1000:.1f} ms exceeded")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""First-connect room creation throughput under concurrent WebSocket connects.
+
+Drives the real ``room_socket`` endpoint with in-memory connections. Each
+scenario opens N connections at once and times how long it takes until
+every one has received its first state frame. The connections are then
+closed. ``distinct`` connects each socket to its own new room, which
+measures rooms created per second. ``same`` connects all of them to one
+new room, which checks that the room is built exactly once. Admission
+control and the connect gate are switched off so that every connect is
+served immediately.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import List, Optional, cast
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+import app as app_module
+from config import settings
+
+
+class FirstConnectWebSocket:
+    def __init__(self, release: asyncio.Event) -> None:
+        self.release = release
+        self.first_state = asyncio.get_running_loop().create_future()
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        if not self.first_state.done():
+            self.first_state.set_result(time.perf_counter())
+
+    async def send_json(self, payload: dict) -> None:
+        await self.send_text("")
+
+    async def receive_json(self) -> dict:
+        await self.release.wait()
+        raise WebSocketDisconnect()
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+class CountingRoom(app_module.Room):
+    __slots__ = ()
+    built = 0
+
+    def __init__(self, config, version=None) -> None:
+        super().__init__(config, version)
+        CountingRoom.built += 1
+
+
+async def measure(connects: int, same_room: bool) -> tuple:
+    manager = app_module.manager
+    CountingRoom.built = 0
+    release = asyncio.Event()
+    sockets = [FirstConnectWebSocket(release) for _ in range(connects)]
+    room_ids = ["benchsame" if same_room else f"bench{i:06d}" for i in range(connects)]
+
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(app_module.room_socket(cast(WebSocket, ws), room_id))
+        for ws, room_id in zip(sockets, room_ids)
+    ]
+    done_at = max(await asyncio.gather(*(ws.first_state for ws in sockets)))
+    elapsed = done_at - started
+    created = CountingRoom.built
+    clients = sum(len(room.clients) for room in manager.rooms.values())
+
+    release.set()
+    await asyncio.gather(*tasks)
+    async with manager.lock:
+        manager.rooms.clear()
+        manager._vacant.clear()
+    app_module.lobby._rooms.clear()
+    return elapsed, created, clients
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connects", type=int, default=1000)
+    parser.add_argument("--budget", type=float, default=2.0, help="max seconds until every connect is served")
+    args = parser.parse_args(argv)
+
+    monitor = app_module.load_monitor
+    gate = app_module.connect_gate
+    saved = (settings.max_rooms, monitor.max_loop_lag, monitor.max_connections, monitor.max_outbound, gate.rate)
+    settings.max_rooms = args.connects * 2
+    monitor.max_loop_lag = monitor.max_connections = monitor.max_outbound = gate.rate = 0
+    original_room = app_module.Room
+    setattr(app_module, "Room", CountingRoom)
+    ok = True
+    try:
+        for label, same_room in (("distinct", False), ("same", True)):
+            elapsed, created, clients = asyncio.run(measure(args.connects, same_room))
+            expected_rooms = 1 if same_room else args.connects
+            print(
+                f"{label:>8}: {args.connects} concurrent first connects in {elapsed * 1000:7.1f} ms  "
+                f"({args.connects / elapsed:8.0f} connects/s, {created} rooms built, {clients} clients)"
+            )
+            if created != expected_rooms or clients != args.connects:
+                print(f"expected {expected_rooms} rooms built and {args.connects} clients")
+                ok = False
+            if elapsed > args.budget:
+                print(f"budget of {args.budget:.1f}s exceeded")
+                ok = False
+    finally:
+        settings.max_rooms, monitor.max_loop_lag, monitor.max_connections, monitor.max_outbound, gate.rate = saved
+        setattr(app_module, "Room", original_room)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
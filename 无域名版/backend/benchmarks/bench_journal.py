@@ -0,0 +1,107 @@
+"""Write-ahead journal throughput and replay time.
+
+Appends N room mutations (upserts, timer transitions and goal updates across
+a fixed set of rooms) from producer tasks that yield to the event loop the
+way request handlers do, waits until everything is committed, then replays
+the journal from disk. Reports appends per second, the number of group
+commits (fsyncs) and the replay time.
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+from journal import RoomJournal
+
+ROOMS = 10000
+
+
+def _room(room_id: str) -> dict:
+    return {
+        "room_id": room_id,
+        "goal": "Review lecture notes",
+        "timer_length": 1500,
+        "break_length": 300,
+        "status": "idle",
+        "cycle": "focus",
+        "remaining": 1500,
+        "focus_mark": None,
+        "updated_at": 0.0,
+        "saved_at": 0.0,
+    }
+
+
+async def _produce(journal: RoomJournal, start: int, count: int, chunk: int) -> None:
+    for i in range(start, start + count):
+        room_id = f"room{i % ROOMS:05d}"
+        if i < ROOMS:
+            journal.record(room_id, "upsert", room=_room(room_id))
+        elif i % 7 == 0:
+            journal.record(room_id, "goal", goal=f"goal {i}", updated_at=float(i))
+        else:
+            journal.record(
+                room_id,
+                "timer",
+                status="running",
+                cycle="focus",
+                remaining=i % 1500,
+                focus_mark=1500,
+                updated_at=float(i),
+            )
+        if i % chunk == 0:
+            await asyncio.sleep(0)
+
+
+async def measure(directory: str, entries: int, producers: int, fsync: bool) -> Tuple[float, int, float, int]:
+    journal = RoomJournal(directory, segment_bytes=64 * 1024 * 1024, fsync=fsync, max_pending=entries)
+    await journal.start()
+    started = time.perf_counter()
+    # 先写入全部房间的 upsert，之后的变更才有房间可以应用
+    await _produce(journal, 0, ROOMS, 100)
+    share = (entries - ROOMS) // producers
+    await asyncio.gather(*(_produce(journal, ROOMS + p * share, share, 100) for p in range(producers)))
+    await journal.stop()
+    append_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    records = await RoomJournal(directory).replay()
+    replay_elapsed = time.perf_counter() - started
+    return append_elapsed, journal.commits, replay_elapsed, len(records)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--producers", type=int, default=8)
+    parser.add_argument("--no-fsync", action="store_true")
+    parser.add_argument("--append-budget", type=float, default=30.0, help="max seconds to append and commit")
+    parser.add_argument("--replay-budget", type=float, default=10.0, help="max seconds to replay")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        append_elapsed, commits, replay_elapsed, rooms = asyncio.run(
+            measure(directory, args.entries, args.producers, not args.no_fsync)
+        )
+
+    print(
+        f"append {args.entries} entries: {append_elapsed:6.2f} s  "
+        f"({args.entries / append_elapsed:9.0f}/s, {commits} group commits, "
+        f"{args.entries / max(commits, 1):6.0f} entries/commit)"
+    )
+    print(f"replay:                  {replay_elapsed:6.2f} s  ({args.entries / replay_elapsed:9.0f}/s, {rooms} rooms)")
+
+    ok = True
+    if append_elapsed > args.append_budget:
+        print(f"append budget of {args.append_budget:.1f}s exceeded")
+        ok = False
+    if replay_elapsed > args.replay_budget:
+        print(f"replay budget of {args.replay_budget:.1f}s exceeded")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Resident memory per room and per participant, measured with tracemalloc.
+
+Each scenario builds N rooms, first empty and then with P participants that
+have published media, and reports the traced bytes per room and the extra
+bytes per participant. The results tell you how high ``max_rooms`` can go on
+a given memory budget.
+"""
+
+import argparse
+import asyncio
+import gc
+import sys
+import tracemalloc
+from typing import Any, Callable, List, Optional, Tuple, TypeVar, cast
+
+from app import Room, RoomConfig
+
+T = TypeVar("T")
+
+SCENARIOS = [(1000, 50), (10000, 5)]
+
+
+def _build_rooms(count: int) -> List[Room]:
+    return [Room(RoomConfig(room_id=f"bench{i:06d}")) for i in range(count)]
+
+
+async def _populate(rooms: List[Room], per_room: int) -> None:
+    for i, room in enumerate(rooms):
+        for j in range(per_room):
+            # 构造新字符串，模拟从网络消息里解析出的用户名
+            name = "".join(["user-", str(i % 97), "-", str(j)])
+            # 走真实的加入路径：每个参与者对应一个连接，连带按连接计数的在线状态
+            await room.attach(cast(Any, object()), name)
+            await room.update_media_state(name, {"audio": True, "video": j % 2 == 0, "screen": False})
+
+
+def _traced(fn: Callable[[], T]) -> Tuple[int, T]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def measure(rooms: int, per_room: int) -> Tuple[float, float]:
+    room_bytes, built = _traced(lambda: _build_rooms(rooms))
+    participant_bytes, _ = _traced(lambda: asyncio.run(_populate(built, per_room)))
+    return room_bytes / rooms, participant_bytes / (rooms * per_room)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--room-budget", type=float, default=1024, help="max bytes per empty room")
+    parser.add_argument("--participant-budget", type=float, default=256, help="max bytes per participant")
+    args = parser.parse_args(argv)
+
+    ok = True
+    for rooms, per_room in SCENARIOS:
+        per_room_bytes, per_participant_bytes = measure(rooms, per_room)
+        print(
+            f"{rooms:>6} rooms x {per_room:>3} participants: "
+            f"{per_room_bytes:8.0f} B/room  {per_participant_bytes:6.0f} B/participant"
+        )
+        if per_room_bytes > args.room_budget or per_participant_bytes > args.participant_budget:
+            ok = False
+    if not ok:
+        print("memory budget exceeded")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""Recovery from a reconnect storm, with and without the connect gate.
+
+Simulates the moment after a restart. Every client of every room opens its
+WebSocket within the same instant and sends ``join``. The clients drive the
+real ``room_socket`` endpoint with in-memory connections. A refused client
+waits for the server-assigned ``reconnect_after`` and tries again.
+
+For each scenario the harness reports:
+- the recovery time, until the last client has joined;
+- the longest event-loop stall seen by a 5 ms ticker, which includes the
+  arrival of the whole storm within one loop iteration;
+- the peak connect rate sampled by the load monitor;
+- how many connects were refused and retried.
+
+``ungated`` admits everyone at once. ``gated`` queues the storm and releases
+it at ``--rate`` connects/s, so recovery should take about
+``(clients - burst) / rate`` seconds. ``small-queue`` also caps the queue, so
+part of the storm is turned away with jittered retry hints. The budget
+requires gated recovery to stay close to that prediction and its worst stall
+to stay below ``--max-stall``.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import List, Optional, cast
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+import app as app_module
+from config import settings
+
+
+class StormWebSocket:
+    def __init__(self, user: str, release: asyncio.Event) -> None:
+        self.user = user
+        self.release = release
+        self.reads = 0
+        self.joined_at: Optional[float] = None
+        self.retry_after: Optional[float] = None
+        # 加入成功或被拒绝时完成
+        self.settled = asyncio.get_running_loop().create_future()
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        pass
+
+    async def send_json(self, payload: dict) -> None:
+        if payload.get("type") == "server:busy":
+            self.retry_after = payload["reconnect_after"]
+            self.settled.set_result(None)
+
+    async def receive_json(self) -> dict:
+        self.reads += 1
+        if self.reads == 1:
+            return {"type": "join", "user": self.user}
+        # 第二次读取说明 join 已经处理完毕
+        if self.joined_at is None:
+            self.joined_at = time.perf_counter()
+            self.settled.set_result(None)
+        await self.release.wait()
+        raise WebSocketDisconnect()
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        pass
+
+
+async def _client(user: str, room_id: str, release: asyncio.Event, joined: list, retries: list) -> None:
+    while True:
+        ws = StormWebSocket(user, release)
+        task = asyncio.create_task(app_module.room_socket(cast(WebSocket, ws), room_id))
+        await asyncio.wait([ws.settled, task], return_when=asyncio.FIRST_COMPLETED)
+        if ws.retry_after is None:
+            joined.append(ws.joined_at)
+            await task
+            return
+        await task
+        retries.append(ws.retry_after)
+        await asyncio.sleep(ws.retry_after)
+
+
+async def _ticker(stop: asyncio.Event, stalls: list) -> None:
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.005)
+        now = time.perf_counter()
+        stalls.append(now - last - 0.005)
+        last = now
+
+
+async def measure(clients: int, rooms: int) -> dict:
+    manager = app_module.manager
+    monitor = app_module.load_monitor
+    monitor.sample_interval = 0.1
+    monitor.connect_rate = 0.0
+    await monitor.start()
+    peak_rate = 0.0
+
+    release = asyncio.Event()
+    stop = asyncio.Event()
+    stalls: list = []
+    joined: list = []
+    retries: list = []
+    ticker = asyncio.create_task(_ticker(stop, stalls))
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_client(f"user{i:06d}", f"storm{i % rooms:05d}", release, joined, retries))
+        for i in range(clients)
+    ]
+    while len(joined) < clients:
+        await asyncio.sleep(0.05)
+        peak_rate = max(peak_rate, monitor.connect_rate)
+    recovery = max(joined) - started
+
+    # 先停止计时器再断开所有客户端，断开时的离开广播不计入停顿
+    stop.set()
+    await ticker
+    release.set()
+    await asyncio.gather(*tasks)
+    await monitor.stop()
+    async with manager.lock:
+        for room in manager.rooms.values():
+            if room.timer_task:
+                room.timer_task.cancel()
+        manager.rooms.clear()
+        manager._vacant.clear()
+    app_module.lobby._rooms.clear()
+    return {
+        "recovery": recovery,
+        "stall": max(stalls) if stalls else 0.0,
+        "peak_rate": peak_rate,
+        "refused": len(retries),
+        "max_retry_after": max(retries) if retries else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--rooms", type=int, default=250)
+    parser.add_argument("--rate", type=float, default=1000.0, help="connect gate rate for the gated scenarios")
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--max-stall", type=float, default=0.4, help="max event-loop stall (s) while gated")
+    args = parser.parse_args(argv)
+
+    monitor = app_module.load_monitor
+    gate = app_module.connect_gate
+    saved_rooms = settings.max_rooms
+    saved_monitor = (monitor.max_loop_lag, monitor.max_connections, monitor.max_outbound, monitor.sample_interval)
+    saved_gate = (gate.rate, gate.burst, gate.max_queue, gate.max_wait)
+    settings.max_rooms = args.rooms * 2
+    monitor.max_loop_lag = monitor.max_connections = monitor.max_outbound = 0
+
+    predicted = max(0, args.clients - args.burst) / args.rate
+    scenarios = (
+        ("ungated", 0.0, 0),
+        ("gated", args.rate, args.clients),
+        ("small-queue", args.rate, args.clients // 4),
+    )
+    ok = True
+    try:
+        for label, rate, queue in scenarios:
+            gate.rate, gate.burst, gate.max_queue, gate.max_wait = rate, args.burst, queue, 30.0
+            gate._tat = 0.0
+            result = asyncio.run(measure(args.clients, args.rooms))
+            print(
+                f"{label:>11}: {args.clients} clients in {args.rooms} rooms recovered in {result['recovery']:6.2f} s  "
+                f"(max stall {result['stall'] * 1000:6.1f} ms, peak {result['peak_rate']:7.0f} connects/s, "
+                f"{result['refused']} refused, max retry_after {result['max_retry_after']:.2f} s)"
+            )
+            if label == "gated":
+                print(f"{'':>11}  predicted recovery {predicted:.2f} s at {args.rate:.0f} connects/s")
+                if result["recovery"] > predicted * 1.25 + 0.25:
+                    print("gated recovery is not within 25% of the prediction")
+                    ok = False
+                if result["stall"] > args.max_stall:
+                    print(f"gated stall above {args.max_stall * 1000:.0f} ms")
+                    ok = False
+    finally:
+        settings.max_rooms = saved_rooms
+        monitor.max_loop_lag, monitor.max_connections, monitor.max_outbound, monitor.sample_interval = saved_monitor
+        gate.rate, gate.burst, gate.max_queue, gate.max_wait = saved_gate
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
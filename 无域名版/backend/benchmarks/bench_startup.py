@@ -0,0 +1,116 @@
+"""Cold-start benchmark: ``import app`` time and time to first accepted WebSocket.
+
+Both numbers are measured in fresh subprocesses so nothing is cached between
+runs. The run fails when the median exceeds the configured budget.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import websockets
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+
+
+def _isolated_env(tmp_dir: str) -> dict:
+    env = dict(os.environ)
+    env.update(
+        {
+            "EVENT_LOG_DIR": os.path.join(tmp_dir, "events"),
+            "HANDOFF_FILE": os.path.join(tmp_dir, "handoff.json"),
+            "JOURNAL_DIR": os.path.join(tmp_dir, "journal"),
+            "LOG_LEVEL": "WARNING",
+        }
+    )
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def measure_import(env: dict) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+async def _wait_for_first_state(url: str, deadline: float) -> None:
+    while time.perf_counter() < deadline:
+        try:
+            async with websockets.connect(url, open_timeout=1) as ws:
+                message = json.loads(await ws.recv())
+                if message.get("type") == "state":
+                    return
+        except (OSError, websockets.exceptions.WebSocketException, asyncio.TimeoutError):
+            await asyncio.sleep(0.01)
+    raise TimeoutError("server did not accept a WebSocket in time")
+
+
+def measure_first_websocket(env: dict, timeout: float = 30.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(_wait_for_first_state(f"ws://127.0.0.1:{port}/ws/rooms/benchstart", started + timeout))
+        return time.perf_counter() - started
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=1.5, help="max median import time (s)")
+    parser.add_argument("--ready-budget", type=float, default=3.0, help="max median time to first WebSocket (s)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = _isolated_env(tmp_dir)
+        imports = [measure_import(env) for _ in range(args.runs)]
+        ready = [measure_first_websocket(env) for _ in range(args.runs)]
+
+    import_median = statistics.median(imports)
+    ready_median = statistics.median(ready)
+    print(f"import app:          median {import_median * 1000:7.1f} ms  (max {max(imports) * 1000:7.1f} ms)")
+    print(f"first WebSocket:     median {ready_median * 1000:7.1f} ms  (max {max(ready) * 1000:7.1f} ms)")
+
+    ok = True
+    if import_median > args.import_budget:
+        print(f"import budget of {args.import_budget:.2f}s exceeded")
+        ok = False
+    if ready_median > args.ready_budget:
+        print(f"ready budget of {args.ready_budget:.2f}s exceeded")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,6 +19,11 @@ class Settings(BaseSettings):
     livekit_api_key: str = ""
     livekit_api_secret: str = ""
     livekit_token_ttl: int = 3600
+    sfu_webhook_batch_window: float = 0.05  # 秒，窗口内的 webhook 事件按房间合并为一次更新和一次广播
+    sfu_reconcile_interval: float = 30.0  # 秒，定期向 LiveKit 查询参与者并修正漂移，0 表示不对账
+    sfu_reconcile_batch_size: int = 100  # 每次 ListRooms 查询的房间数
+    sfu_reconcile_rate: float = 20.0  # 每秒最多发出的 RoomService 请求数
+    sfu_reconcile_connections: int = 4  # 共享连接池的连接数上限
 
     # CORS 配置
     allowed_origins: str = "http://localhost:5500,http://127.0.0.1:5500"
@@ -27,6 +32,59 @@ class Settings(BaseSettings):
     max_rooms: int = 1000
     room_cleanup_interval: int = 300  # 秒
     room_idle_timeout: int = 1800  # 秒
+    cold_room_after: int = 60  # 秒，没有连接且超过该时长未更新的房间转入冷存储
+    max_cold_rooms: int = 500000
+    heartbeat_interval: int = 20  # 秒，静默超过该时长的连接会收到 ping
+    heartbeat_timeout: int = 60  # 秒，超过该时长无任何消息的连接会被驱逐
+    timer_broadcast_interval: int = 60  # 秒，运行中计时器的纠偏广播间隔，0 表示只在状态转换时广播
+    media_batch_window: float = 0.1  # 秒，窗口内的媒体状态变化合并为一条 media:batch
+    fanout_batch_size: int = 256  # 广播时每批并发发送的连接数，批次之间让出事件循环
+    replay_buffer_size: int = 256  # 每个房间保留的最近出站消息数，供重连客户端续传；0 表示重连总是收到完整快照
+
+    # 只读旁观者（SSE）配置
+    max_spectators_per_room: int = 5000
+    spectator_queue_size: int = 64  # 每个旁观者积压的帧数上限，超过即断开
+    spectator_keepalive: float = 15.0  # 秒
+
+    # 准入控制配置，0 表示不检查对应信号
+    admission_max_loop_lag: float = 0.25  # 秒，平滑后的事件循环延迟
+    admission_max_connections: int = 20000
+    admission_max_outbound: int = 100000  # 广播中尚未完成的发送数
+    admission_retry_after: int = 5  # 秒，实际提示在该值到两倍之间随机
+    connect_rate_limit: float = 500.0  # 每秒放行的新 WebSocket 会话数，0 表示不限速
+    connect_burst: int = 100  # 无需排队即可放行的突发连接数
+    connect_queue_size: int = 5000  # 同时排队等待放行的连接数上限
+    connect_queue_timeout: float = 5.0  # 秒，预计等待超过该值的连接直接拒绝并提示重试
+
+    # 排空与交接配置
+    handoff_file: str = "data/handoff.json"
+    drain_reconnect_spread: float = 10.0  # 秒，客户端重连延迟在 0 到该值之间随机分布
+    drain_timeout: float = 10.0  # 秒，SIGTERM 后排空的最长等待，超时后照常关闭
+    graceful_shutdown_timeout: int = 10  # 秒，排空后服务器等待剩余 HTTP 连接结束的上限
+    admin_token: str = ""  # 管理接口令牌，留空则禁用管理接口
+
+    # 按需性能分析配置
+    profile_max_seconds: float = 30.0  # 单次调用栈采样的最长秒数
+    profile_interval: float = 0.005  # 秒，调用栈采样间隔
+    message_timing: bool = False  # 是否按消息类型统计 WebSocket 消息的处理耗时
+
+    # 链路追踪配置
+    trace_sample_rate: float = 0.0  # 入口（WebSocket 消息、令牌请求）的采样比例，0 表示关闭追踪
+    trace_ring_size: int = 200  # 内存中保留、供 /admin/traces 查看的最近追踪条数
+    trace_file: str = ""  # 追踪的 JSON Lines 导出文件，留空则只保留在内存中
+
+    # 事件日志配置
+    event_log_enabled: bool = True
+    event_log_dir: str = "data/events"
+    event_log_segment_bytes: int = 4 * 1024 * 1024
+    event_log_max_segments: int = 64
+    event_log_flush_interval: float = 1.0  # 秒
+
+    # 房间变更日志（WAL）配置
+    journal_enabled: bool = True
+    journal_dir: str = "data/journal"
+    journal_segment_bytes: int = 16 * 1024 * 1024  # 活动分段超过该大小后轮转并在后台压缩进快照
+    journal_fsync: bool = True
 
     # 服务器配置
     host: str = "0.0.0.0"
@@ -35,6 +93,10 @@ class Settings(BaseSettings):
 
     # 日志配置
     log_level: str = "INFO"
+    log_format: str = "text"  # text | json，json 为每行一条结构化记录
+    log_queue_size: int = 10000  # 待写出日志的队列上限，满时丢弃并计数而不阻塞事件循环
+    log_rate_limit: float = 20.0  # 每条消息模板每秒最多写出的条数，0 表示不限流
+    log_burst: int = 50  # 每条消息模板允许的突发条数
 
     @property
     def allowed_origins_list(self) -> List[str]:
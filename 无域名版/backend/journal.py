@@ -0,0 +1,254 @@
+"""房间变更的预写日志（WAL）：组提交追加写入，启动时在快照之上重放，后台压缩"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".wal"
+SNAPSHOT_NAME = "snapshot.json"
+
+# 复用同一个编码器，避免 json.dumps 每次因非默认参数重新构造
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+def apply_entry(rooms: Dict[str, Dict[str, Any]], entry: Dict[str, Any]) -> None:
+    """把一条日志记录应用到 房间 ID -> 房间记录 的映射上
+
+    - ``upsert``：创建房间或修改配置，携带完整的房间记录
+    - ``timer``：计时状态转换，只携带计时相关字段
+    - ``goal``：目标文本更新
+    - ``remove``：房间被彻底丢弃
+    """
+    op = entry["op"]
+    room_id = entry["id"]
+    if op == "upsert":
+        rooms[room_id] = entry["room"]
+    elif op == "remove":
+        rooms.pop(room_id, None)
+    else:
+        record = rooms.get(room_id)
+        if record is None:
+            return
+        record.update(entry["fields"])
+        # 计时器按记录写入时刻扣除流逝时间，与交接记录的 saved_at 语义一致
+        record["saved_at"] = entry["ts"]
+
+
+class RoomJournal:
+    """异步组提交的房间变更日志
+
+    ``record`` 只把记录追加到内存缓冲区；后台任务在上一批写完后立即取走
+    期间积累的全部记录，在线程中一次写入并 ``fsync``，磁盘再慢也不会阻塞
+    事件循环，而慢的 fsync 会自然地让下一批变大。活动分段超过
+    ``segment_bytes`` 后轮转，已封存的分段在后台与快照合并成新的
+    ``snapshot.json`` 后删除。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 16 * 1024 * 1024,
+        fsync: bool = True,
+        max_pending: int = 100000,
+    ) -> None:
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.commits = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._compact_task: Optional[asyncio.Task] = None
+        # 同一时刻只允许一个批次写入，显式 commit 与后台任务不会交错操作文件
+        self._commit_lock = asyncio.Lock()
+        # 已封存的最大分段号，以及已经压缩进快照的最大分段号
+        self._sealed_seq = 0
+        self._compacted_seq = 0
+        self._closing = False
+        self._active_seq = 0
+        self._active_size = 0
+        self._fh: Optional[IO[str]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def record(self, room_id: str, op: str, **fields: Any) -> None:
+        """记录一次房间变更；日志未启动时静默忽略"""
+        if self._task is None:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning("变更日志积压过多，已丢弃 %s 条记录", self.dropped)
+            return
+        entry: Dict[str, Any] = {"ts": round(time.time(), 3), "id": room_id, "op": op}
+        if op == "upsert":
+            entry["room"] = fields["room"]
+        elif fields:
+            entry["fields"] = fields
+        self._pending.append(entry)
+        self._wakeup.set()
+
+    async def replay(self) -> List[Dict[str, Any]]:
+        """读取快照并按顺序重放其后的所有分段，返回每个房间的最新记录"""
+        rooms = await asyncio.to_thread(self._load)
+        return [dict(record, room_id=room_id) for room_id, record in rooms.items()]
+
+    async def start(self) -> None:
+        """打开新的活动分段并启动后台组提交任务"""
+        if self._task is not None:
+            return
+        await asyncio.to_thread(self._open)
+        self._wakeup = asyncio.Event()
+        self._commit_lock = asyncio.Lock()
+        self._closing = False
+        self._task = asyncio.create_task(self._writer_loop())
+        logger.info("变更日志已启动: %s", self.directory)
+
+    async def stop(self) -> None:
+        """停止后台任务，提交剩余记录并等待进行中的压缩完成"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        await self.commit()
+        if self._compact_task is not None:
+            await self._compact_task
+        await asyncio.to_thread(self._close)
+        logger.info("变更日志已停止")
+
+    async def commit(self) -> None:
+        """把当前缓冲区作为一组写入并落盘"""
+        async with self._commit_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            rotated = await asyncio.to_thread(self._write_batch, batch)
+            self.commits += 1
+        if rotated:
+            self._sealed_seq = max(self._sealed_seq, rotated)
+            if self._compact_task is None:
+                self._compact_task = asyncio.create_task(self._compact())
+
+    async def _writer_loop(self) -> None:
+        while not self._closing:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await self.commit()
+            except Exception as e:
+                logger.error("写入变更日志出错: %s", e, exc_info=True)
+
+    async def _compact(self) -> None:
+        try:
+            # 压缩期间又有分段被封存时继续压缩，直到追上最新的封存分段
+            while self._compacted_seq < self._sealed_seq:
+                upto = self._sealed_seq
+                await asyncio.to_thread(self._compact_sealed, upto)
+                self._compacted_seq = upto
+        except Exception as e:
+            logger.error("压缩变更日志出错: %s", e, exc_info=True)
+        finally:
+            self._compact_task = None
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"{seq:06d}{SEGMENT_SUFFIX}"
+
+    def _segment_seqs(self) -> List[int]:
+        return sorted(int(p.name[: -len(SEGMENT_SUFFIX)]) for p in self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def _read_snapshot(self) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        path = self.directory / SNAPSHOT_NAME
+        if not path.exists():
+            return 0, {}
+        data = json.loads(path.read_text("utf-8"))
+        return data["seq"], data["rooms"]
+
+    def _fold_segment(self, rooms: Dict[str, Dict[str, Any]], seq: int) -> None:
+        with self._segment_path(seq).open("r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 崩溃时可能在分段末尾留下半行
+                    continue
+                apply_entry(rooms, entry)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.directory.exists():
+            return {}
+        snapshot_seq, rooms = self._read_snapshot()
+        for seq in self._segment_seqs():
+            if seq > snapshot_seq:
+                self._fold_segment(rooms, seq)
+        return rooms
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        snapshot_seq, _ = self._read_snapshot()
+        seqs = self._segment_seqs()
+        for seq in seqs:
+            # 压缩替换快照后、删除分段前崩溃留下的分段
+            if seq <= snapshot_seq:
+                self._segment_path(seq).unlink(missing_ok=True)
+        # 总是从新分段开始追加，不续写上次可能被截断的分段
+        self._active_seq = max([snapshot_seq, *seqs]) + 1
+        self._active_size = 0
+        self._fh = self._segment_path(self._active_seq).open("a", encoding="utf-8")
+
+    def _close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> int:
+        """写入一组记录并落盘；发生轮转时返回被封存的分段号，否则返回 0"""
+        fh = self._fh
+        if fh is None:
+            raise RuntimeError("变更日志未打开")
+        data = "".join([_encoder.encode(entry) + "\n" for entry in batch])
+        fh.write(data)
+        fh.flush()
+        if self.fsync:
+            os.fsync(fh.fileno())
+        # 分段大小按落盘字节计，中文目标等非 ASCII 内容按 UTF-8 编码后的长度累计
+        self._active_size += len(data.encode("utf-8"))
+        if self._active_size < self.segment_bytes:
+            return 0
+        sealed = self._active_seq
+        fh.close()
+        self._active_seq += 1
+        self._active_size = 0
+        self._fh = self._segment_path(self._active_seq).open("a", encoding="utf-8")
+        return sealed
+
+    def _compact_sealed(self, upto: int) -> None:
+        """把 ``upto`` 及之前的分段合并进快照，写入新快照后再删除这些分段"""
+        snapshot_seq, rooms = self._read_snapshot()
+        folded = [seq for seq in self._segment_seqs() if snapshot_seq < seq <= upto]
+        for seq in folded:
+            self._fold_segment(rooms, seq)
+        path = self.directory / SNAPSHOT_NAME
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as fh:
+            json.dump({"seq": upto, "rooms": rooms}, fh, separators=(",", ":"), ensure_ascii=False)
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+        for seq in folded:
+            self._segment_path(seq).unlink(missing_ok=True)
+        logger.info("变更日志已压缩: %s 个分段，%s 个房间", len(folded), len(rooms))
@@ -0,0 +1,168 @@
+"""负载监控与准入控制：根据事件循环延迟、连接数和待发送消息数决定是否接收新会话，并对新连接匀速放行"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LoadMonitor:
+    """周期性采样服务器负载信号
+
+    - ``loop_lag``：定时器实际唤醒比预期晚了多少秒，反映事件循环是否被占满
+    - ``connections``：所有房间的 WebSocket 连接总数
+    - ``outbound_pending``：广播中已发起但尚未完成的发送数
+    - ``connect_rate``：平滑后每秒建立的新会话数，由 ``note_connect`` 计数
+
+    阈值为 0 表示不检查对应信号。
+    """
+
+    def __init__(
+        self,
+        count_connections: Callable[[], int],
+        max_loop_lag: float = 0.0,
+        max_connections: int = 0,
+        max_outbound: int = 0,
+        retry_after: int = 5,
+        sample_interval: float = 0.5,
+    ) -> None:
+        self.count_connections = count_connections
+        self.max_loop_lag = max_loop_lag
+        self.max_connections = max_connections
+        self.max_outbound = max_outbound
+        self.retry_after_base = retry_after
+        self.sample_interval = sample_interval
+        self.loop_lag = 0.0
+        self.connections = 0
+        self.outbound_pending = 0
+        self.rejected = 0
+        self.connects = 0
+        self.connect_rate = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample_loop())
+            logger.info("负载监控已启动")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("负载监控已停止")
+
+    def note_connect(self) -> None:
+        self.connects += 1
+
+    async def _sample_loop(self) -> None:
+        last_connects = self.connects
+        while True:
+            started = time.monotonic()
+            expected = started + self.sample_interval
+            await asyncio.sleep(self.sample_interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            # 指数平滑，避免单次抖动就触发拒绝
+            self.loop_lag = lag if lag > self.loop_lag else self.loop_lag * 0.7 + lag * 0.3
+            rate = (self.connects - last_connects) / (now - started)
+            last_connects = self.connects
+            self.connect_rate = self.connect_rate * 0.5 + rate * 0.5
+            try:
+                self.connections = self.count_connections()
+            except Exception as e:
+                logger.error("统计连接数出错: %s", e, exc_info=True)
+
+    def overload_reason(self) -> Optional[str]:
+        """返回超出的信号名称；未过载时返回 None"""
+        if self.max_loop_lag and self.loop_lag > self.max_loop_lag:
+            return "loop_lag"
+        if self.max_connections and self.connections >= self.max_connections:
+            return "connections"
+        if self.max_outbound and self.outbound_pending >= self.max_outbound:
+            return "outbound"
+        return None
+
+    def admit(self) -> Optional[int]:
+        """准入检查：允许时返回 None，拒绝时返回建议的重试秒数（带随机抖动）"""
+        reason = self.overload_reason()
+        if reason is None:
+            return None
+        self.rejected += 1
+        if self.rejected % 100 == 1:
+            logger.warning("负载过高（%s），拒绝新会话，累计 %s 次", reason, self.rejected)
+        return self.retry_after_base + random.randint(0, self.retry_after_base)
+
+
+class ConnectGate:
+    """新 WebSocket 会话的准入队列：按令牌桶匀速放行，等待者数量有上限
+
+    重启或网络抖动后所有客户端会在同一秒内重连。每个新连接按
+    ``rate`` 个/秒依次领取放行时间（允许 ``burst`` 个的突发），在此之前
+    只是睡眠等待，不查找房间也不发送状态；恢复时间因此约为
+    ``积压连接数 / rate``，可以预测。等待者已达 ``max_queue`` 个或需要等待
+    超过 ``max_wait`` 秒时直接拒绝，并给出覆盖当前积压排空时间、带随机
+    抖动的重试提示，让被拒绝的客户端错开回来。``rate`` 为 0 表示不限速。
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        burst: int = 1,
+        max_queue: int = 0,
+        max_wait: float = 5.0,
+        min_retry_after: float = 1.0,
+    ) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.min_retry_after = min_retry_after
+        self.waiting = 0
+        self.admitted = 0
+        self.refused = 0
+        # GCRA 的理论到达时间：下一个连接在不超出速率时最早可以放行的时刻
+        self._tat = 0.0
+
+    def backlog(self) -> float:
+        """按当前速率排空已领取放行时间的连接还需要的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        return max(0.0, self._tat - time.monotonic())
+
+    def retry_after(self) -> float:
+        """覆盖当前积压排空时间、带抖动的重试秒数，拒绝的客户端分散在 [排空, 2 × 排空] 内回来"""
+        base = max(self.min_retry_after, self.backlog())
+        return round(base * random.uniform(1.0, 2.0), 2)
+
+    async def acquire(self) -> Optional[float]:
+        """排队等待放行：放行时返回 None，拒绝时返回建议的重试秒数"""
+        if self.rate <= 0:
+            self.admitted += 1
+            return None
+        interval = 1.0 / self.rate
+        now = time.monotonic()
+        tat = max(self._tat, now)
+        wait = tat - now - (self.burst - 1) * interval
+        if wait > 0 and (wait > self.max_wait or (self.max_queue and self.waiting >= self.max_queue)):
+            self.refused += 1
+            if self.refused % 100 == 1:
+                logger.warning("连接准入队列已满（%s 个等待），累计拒绝 %s 次", self.waiting, self.refused)
+            return self.retry_after()
+        self._tat = tat + interval
+        if wait > 0:
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.waiting -= 1
+        self.admitted += 1
+        return None
@@ -0,0 +1,202 @@
+"""非阻塞日志管道：事件循环只把记录放入有界队列，后台线程负责格式化和写出
+
+- 日志调用使用 ``%`` 风格的惰性参数，级别未启用、被限流或被丢弃的记录不会格式化
+- ``RateLimitFilter`` 按消息模板限流，风暴中同一条高频日志每秒只写出有限几条，
+  被抑制的条数附在该模板下一条写出的记录上
+- 队列满时直接丢弃并计数，不阻塞调用方
+- 输出为单行 JSON（``json``）或原来的文本格式（``text``）
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=str)
+
+# uvicorn 自带的记录器默认各挂一个同步的 StreamHandler 且不向上传播，需要改为交给根记录器
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# 限流桶数量上限；第三方库用预先格式化的字符串记录日志时每条都是新模板，超过后清空重来
+MAX_BUCKETS = 4096
+
+
+class JsonFormatter(logging.Formatter):
+    """把记录编码为一行 JSON：时间、级别、记录器、消息，以及被抑制条数和异常堆栈"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return _encoder.encode(entry)
+
+
+class TextFormatter(logging.Formatter):
+    """原有的文本格式，被抑制的条数附在消息末尾"""
+
+    def __init__(self) -> None:
+        super().__init__(TEXT_FORMAT)
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            line += f" (已抑制 {suppressed} 条相同日志)"
+        return line
+
+
+class RateLimitFilter(logging.Filter):
+    """按 (记录器, 级别, 消息模板) 做令牌桶限流
+
+    惰性参数让同一调用点的记录共享同一个模板，因此风暴中同一条日志只占一个桶。
+    变更日志和事件日志在工作线程中写日志，桶的读写由锁保护。
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        super().__init__()
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.suppressed = 0
+        # 键 -> [剩余令牌, 上次补充时间, 自上次写出以来被抑制的条数]
+        self._buckets: Dict[Tuple[str, int, Any], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._buckets.clear()
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            else:
+                bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.suppressed += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = int(bucket[2])
+                bucket[2] = 0
+            return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """把记录放入有界队列；队列已满时丢弃并计数，调用方永远不会阻塞"""
+
+    def __init__(self, log_queue: "queue.Queue[Any]") -> None:
+        super().__init__(log_queue)
+        self.log_queue = log_queue
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 只在这里合并 % 参数，参数对象之后被修改也不会影响输出；
+        # 时间格式化、JSON 编码和写出都留给后台线程
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.log_queue.full():
+            self.dropped += 1
+            return
+        try:
+            self.log_queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+
+class LogPipeline:
+    """根记录器上安装的队列处理器、限流过滤器和后台写出线程"""
+
+    def __init__(self, handler: DroppingQueueHandler, limiter: RateLimitFilter, listener: QueueListener) -> None:
+        self.handler = handler
+        self.limiter = limiter
+        self.listener = listener
+        self._running = True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "dropped": self.handler.dropped,
+            "suppressed": self.limiter.suppressed,
+            "queued": self.handler.log_queue.qsize(),
+        }
+
+    def stop(self) -> None:
+        """写完队列中剩余的记录后停止后台线程"""
+        if self._running:
+            self._running = False
+            self.listener.stop()
+
+
+def build_pipeline(
+    fmt: str = "text",
+    queue_size: int = 10000,
+    rate: float = 20.0,
+    burst: int = 50,
+    stream: Optional[Any] = None,
+) -> LogPipeline:
+    """创建队列处理器并启动后台写出线程，尚未挂到任何记录器上"""
+    writer = logging.StreamHandler(stream or sys.stderr)
+    writer.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    log_queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+    handler = DroppingQueueHandler(log_queue)
+    limiter = RateLimitFilter(rate, burst)
+    handler.addFilter(limiter)
+    listener = QueueListener(log_queue, writer, respect_handler_level=True)
+    listener.start()
+    return LogPipeline(handler, limiter, listener)
+
+
+def setup_logging(
+    level: str = "INFO",
+    fmt: str = "text",
+    queue_size: int = 10000,
+    rate: float = 20.0,
+    burst: int = 50,
+) -> LogPipeline:
+    """用非阻塞管道替换根记录器上的处理器，取代 ``logging.basicConfig``
+
+    uvicorn 的记录器也去掉自带的处理器并改为向上传播，访问日志同样经过队列和限流。
+    """
+    pipeline = build_pipeline(fmt, queue_size, rate, burst)
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(pipeline.handler)
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        for existing in list(uvicorn_logger.handlers):
+            uvicorn_logger.removeHandler(existing)
+        uvicorn_logger.propagate = True
+    return pipeline
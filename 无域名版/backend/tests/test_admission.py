@@ -0,0 +1,103 @@
+"""Tests for load-aware admission control."""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from app import connect_gate, load_monitor
+from load import ConnectGate
+
+
+@pytest.fixture
+def overloaded(monkeypatch):
+    monkeypatch.setattr(load_monitor, "max_connections", 10)
+    monkeypatch.setattr(load_monitor, "connections", 10)
+
+
+def test_monitor_reports_overload_signals(monkeypatch):
+    """Test each load signal against its threshold."""
+    monkeypatch.setattr(load_monitor, "max_loop_lag", 0.1)
+    monkeypatch.setattr(load_monitor, "loop_lag", 0.0)
+    assert load_monitor.overload_reason() is None
+
+    monkeypatch.setattr(load_monitor, "loop_lag", 0.5)
+    assert load_monitor.overload_reason() == "loop_lag"
+    retry_after = load_monitor.admit()
+    assert retry_after is not None
+    assert load_monitor.retry_after_base <= retry_after <= 2 * load_monitor.retry_after_base
+
+
+def test_create_room_rejected_when_overloaded(client: TestClient, overloaded):
+    """Test that POST /rooms returns 503 with Retry-After when overloaded."""
+    response = client.post("/rooms", json={"room_id": "busyroom"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_websocket_refused_with_retry_hint(client: TestClient, overloaded):
+    """Test that new WebSocket sessions receive a retry hint and are closed."""
+    with client.websocket_connect("/ws/rooms/busyroom") as websocket:
+        message = websocket.receive_json()
+        assert message["type"] == "server:busy"
+        assert message["reconnect_after"] > 0
+
+
+@pytest.mark.asyncio
+async def test_connect_gate_admits_burst_then_queues_at_rate():
+    """Test that the gate admits a burst at once and spaces the rest at the configured rate."""
+    gate = ConnectGate(rate=100, burst=2, max_queue=10, max_wait=1.0)
+    started = time.monotonic()
+    results = await asyncio.gather(*(gate.acquire() for _ in range(5)))
+    elapsed = time.monotonic() - started
+
+    assert results == [None] * 5
+    assert gate.admitted == 5
+    assert gate.waiting == 0
+    # 突发 2 个立即放行，其余 3 个按 10ms 间隔依次放行
+    assert 0.02 <= elapsed < 0.2
+
+
+@pytest.mark.asyncio
+async def test_connect_gate_refuses_when_queue_is_full():
+    """Test that waiters beyond max_queue are refused with a jittered hint covering the backlog."""
+    gate = ConnectGate(rate=10, burst=1, max_queue=2, max_wait=5.0, min_retry_after=0.1)
+    first = await gate.acquire()
+    queued = [asyncio.create_task(gate.acquire()) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert gate.waiting == 2
+
+    retry_after = await gate.acquire()
+    backlog = gate.backlog()
+    assert first is None
+    assert retry_after is not None
+    assert backlog * 0.9 <= retry_after <= 2 * max(backlog, 0.1) + 0.01
+    assert gate.refused == 1
+    for task in queued:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_connect_gate_refuses_long_waits():
+    """Test that a connect whose slot is further away than max_wait is refused immediately."""
+    gate = ConnectGate(rate=1, burst=1, max_queue=100, max_wait=0.5)
+    assert await gate.acquire() is None
+    assert await gate.acquire() is not None
+    assert gate.waiting == 0
+
+
+def test_websocket_refused_by_connect_gate(client: TestClient, monkeypatch):
+    """Test that a connect refused by the gate gets server:busy and close code 1013."""
+    monkeypatch.setattr(connect_gate, "rate", 1.0)
+    monkeypatch.setattr(connect_gate, "burst", 1)
+    monkeypatch.setattr(connect_gate, "max_wait", 0.0)
+    monkeypatch.setattr(connect_gate, "_tat", time.monotonic() + 30)
+    with client.websocket_connect("/ws/rooms/stormroom") as websocket:
+        message = websocket.receive_json()
+        assert message["type"] == "server:busy"
+        assert message["reconnect_after"] >= 30
+        with pytest.raises(WebSocketDisconnect) as excinfo:
+            websocket.receive_json()
+    assert excinfo.value.code == 1013
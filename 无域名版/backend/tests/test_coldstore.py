@@ -0,0 +1,99 @@
+"""Tests for hot/cold room storage."""
+
+import asyncio
+import time
+from typing import Any, Dict
+
+import pytest
+
+from app import RoomConfig, manager
+from coldstore import ColdStore, decode_record, encode_record
+from config import settings
+from tests.conftest import join
+
+
+def test_record_round_trip_and_compression():
+    """Test that records survive encoding and long goals get compressed."""
+    record: Dict[str, Any] = {
+        "room_id": "cold1",
+        "goal": "Finish chapter " * 20,
+        "timer_length": 1500,
+        "break_length": 300,
+        "status": "paused",
+        "cycle": "focus",
+        "remaining": 420,
+        "focus_mark": None,
+        "updated_at": 1.5,
+        "saved_at": 2.5,
+        "version": 7,
+    }
+    blob = encode_record(record)
+    assert blob[:1] == b"z"
+    assert len(blob) < len(record["goal"])
+    assert decode_record("cold1", blob) == record
+
+
+def test_cold_store_drops_oldest_over_capacity():
+    """Test that the cold store is bounded."""
+    store = ColdStore(max_rooms=2)
+    for room_id in ("a", "b"):
+        assert store.put(room_id, {"goal": ""}) is None
+    assert store.put("c", {"goal": ""}) == "a"
+    assert "a" not in store and len(store) == 2
+
+
+@pytest.mark.asyncio
+async def test_dormant_room_is_demoted_and_rehydrated(monkeypatch):
+    """Test that idle rooms move to cold storage and come back on access."""
+    monkeypatch.setattr(settings, "cold_room_after", 0)
+    room = await manager.upsert(RoomConfig(room_id="sleepy", goal="Physics", timer_length=1800))
+    await room.start_focus(user="alice")
+    await room.pause(user="alice")
+    room.updated_at = time.time() - 1
+    remaining = room.remaining
+
+    busy = await manager.upsert(RoomConfig(room_id="busyroom"))
+    await join(busy, "bob")
+
+    assert await manager.demote_dormant_rooms() == 1
+    assert "sleepy" not in manager.rooms
+    assert "sleepy" in manager.cold
+    assert "busyroom" in manager.rooms
+
+    restored = await manager.get("sleepy")
+    assert restored is not room
+    assert (restored.goal, restored.status, restored.remaining) == ("Physics", "paused", remaining)
+    assert "sleepy" not in manager.cold
+
+
+@pytest.mark.asyncio
+async def test_idle_cleanup_keeps_rooms_with_spectators(monkeypatch):
+    """Test that idle cleanup demotes only dormant rooms and leaves a spectated room serving its stream."""
+    monkeypatch.setattr(settings, "room_idle_timeout", 0)
+    watched = await manager.upsert(RoomConfig(room_id="watched"))
+    queue: asyncio.Queue = asyncio.Queue(maxsize=8)
+    watched.add_spectator(queue)
+    idle = await manager.upsert(RoomConfig(room_id="idleroom"))
+    for room in (watched, idle):
+        room.updated_at = time.time() - 1
+
+    await manager._cleanup_idle_rooms()
+
+    assert "idleroom" in manager.cold
+    assert "watched" not in manager.cold
+    assert await manager.get("watched") is watched
+    await watched.reset(user="alice")
+    assert not queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_demotes_instead_of_dropping(monkeypatch):
+    """Test that rooms evicted for capacity can still be rehydrated."""
+    monkeypatch.setattr(settings, "max_rooms", 1)
+    await manager.upsert(RoomConfig(room_id="first", goal="keep me"))
+    await manager.upsert(RoomConfig(room_id="second"))
+    assert "first" in manager.cold
+
+    room = await manager.get("first")
+    assert room.goal == "keep me"
+    assert "second" in manager.cold
@@ -0,0 +1,117 @@
+"""Tests for the room mutation write-ahead journal."""
+
+import pytest
+
+import app as app_module
+from app import RoomConfig, manager
+from journal import RoomJournal
+
+
+def _room(room_id, **overrides):
+    record = {
+        "room_id": room_id,
+        "goal": "",
+        "timer_length": 1500,
+        "break_length": 300,
+        "status": "idle",
+        "cycle": "focus",
+        "remaining": 1500,
+        "focus_mark": None,
+        "updated_at": 0,
+        "saved_at": 0,
+    }
+    record.update(overrides)
+    return record
+
+
+@pytest.mark.asyncio
+async def test_replay_applies_mutations_in_order(tmp_path):
+    """Test that upserts, timer transitions, goal updates and removals replay."""
+    journal = RoomJournal(str(tmp_path), fsync=False)
+    await journal.start()
+    journal.record("a", "upsert", room=_room("a"))
+    journal.record("b", "upsert", room=_room("b"))
+    journal.record("a", "timer", status="paused", cycle="focus", remaining=700, focus_mark=None, updated_at=5)
+    journal.record("a", "goal", goal="Essay", updated_at=6)
+    journal.record("b", "remove")
+    journal.record("ghost", "goal", goal="ignored", updated_at=7)
+    await journal.stop()
+
+    records = await RoomJournal(str(tmp_path)).replay()
+    assert [r["room_id"] for r in records] == ["a"]
+    assert records[0]["status"] == "paused"
+    assert records[0]["remaining"] == 700
+    assert records[0]["goal"] == "Essay"
+
+
+@pytest.mark.asyncio
+async def test_rotation_compacts_into_snapshot(tmp_path):
+    """Test that sealed segments are folded into the snapshot and deleted."""
+    journal = RoomJournal(str(tmp_path), segment_bytes=300, fsync=False)
+    await journal.start()
+    for i in range(20):
+        journal.record(f"r{i}", "upsert", room=_room(f"r{i}"))
+        await journal.commit()
+        if i % 2:
+            journal.record(f"r{i}", "remove")
+    await journal.stop()
+
+    assert (tmp_path / "snapshot.json").exists()
+    assert len(list(tmp_path.glob("*.wal"))) <= 3
+
+    records = await RoomJournal(str(tmp_path)).replay()
+    assert sorted(r["room_id"] for r in records) == sorted(f"r{i}" for i in range(0, 20, 2))
+
+
+@pytest.mark.asyncio
+async def test_segment_size_counts_encoded_bytes(tmp_path):
+    """Test that rotation uses the UTF-8 size on disk, not the character count."""
+    journal = RoomJournal(str(tmp_path), segment_bytes=400, fsync=False)
+    await journal.start()
+    first = journal._active_seq
+    # 约 330 个字符，UTF-8 编码后超过 500 字节
+    journal.record("a", "upsert", room=_room("a", goal="专注" * 60))
+    await journal.commit()
+    await journal.stop()
+
+    assert journal._active_seq == first + 1
+
+
+@pytest.mark.asyncio
+async def test_torn_tail_is_ignored(tmp_path):
+    """Test that a half-written last line from a crash does not break replay."""
+    journal = RoomJournal(str(tmp_path), fsync=False)
+    await journal.start()
+    journal.record("a", "upsert", room=_room("a"))
+    await journal.stop()
+    segment = next(tmp_path.glob("*.wal"))
+    with segment.open("a", encoding="utf-8") as fh:
+        fh.write('{"ts":1,"id":"a","op":"ti')
+
+    records = await RoomJournal(str(tmp_path)).replay()
+    assert [r["room_id"] for r in records] == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_manager_state_survives_restart(tmp_path, monkeypatch):
+    """Test that room mutations are journaled and restored on the next start."""
+    journal = RoomJournal(str(tmp_path), fsync=False)
+    monkeypatch.setattr(app_module, "journal", journal)
+    await journal.start()
+
+    room = await manager.upsert(RoomConfig(room_id="wal", goal="Read"))
+    await room.start_focus(user="alice")
+    await room.pause(user="alice")
+    await manager.upsert(RoomConfig(room_id="wal", goal="Read more", timer_length=1200))
+    await journal.stop()
+
+    async with manager.lock:
+        manager.rooms.clear()
+        manager._vacant.clear()
+    assert await manager.restore(await RoomJournal(str(tmp_path)).replay()) == 1
+
+    restored = await manager.get("wal")
+    assert restored.goal == "Read more"
+    assert restored.timer_length == 1200
+    assert restored.status == "paused"
+    assert restored.timer_task is None
@@ -0,0 +1,43 @@
+"""Tests for the lobby room-list feed."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import RoomConfig, lobby, manager
+from tests.conftest import FakeWebSocket, join
+
+
+@pytest.mark.asyncio
+async def test_lobby_streams_coalesced_deltas():
+    """Test that room mutations become one coalesced delta frame."""
+    ws = FakeWebSocket()
+    await lobby.subscribe(ws)
+    try:
+        assert ws.sent[0] == {"type": "lobby:snapshot", "rooms": []}
+
+        room = await manager.upsert(RoomConfig(room_id="lobbyroom"))
+        await join(room, "alice")
+        await join(room, "bob")
+        await room.broadcast_state()
+        await room.start_focus(user="alice")
+        await asyncio.sleep(0.01)
+
+        changes = [change for frame in ws.sent[1:] for change in frame["changes"]]
+        assert {"op": "created", "id": "lobbyroom", "n": 0, "status": "idle", "cycle": "focus"} in changes
+        assert {"op": "count", "id": "lobbyroom", "n": 2} in changes
+        assert {"op": "status", "id": "lobbyroom", "status": "running", "cycle": "focus"} in changes
+        assert room.timer_task is not None
+        room.timer_task.cancel()
+    finally:
+        lobby.unsubscribe(ws)
+
+
+def test_lobby_socket_snapshot(client: TestClient):
+    """Test that a lobby connection starts with a snapshot of existing rooms."""
+    client.post("/rooms", json={"room_id": "lobbysnap"})
+    with client.websocket_connect("/ws/lobby") as websocket:
+        snapshot = websocket.receive_json()
+        assert snapshot["type"] == "lobby:snapshot"
+        assert snapshot["rooms"] == [{"id": "lobbysnap", "n": 0, "status": "idle", "cycle": "focus"}]
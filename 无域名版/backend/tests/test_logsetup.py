@@ -0,0 +1,132 @@
+"""Tests for the queue-based logging pipeline."""
+
+import io
+import json
+import logging
+import logging.config
+import queue
+import threading
+
+from uvicorn.config import LOGGING_CONFIG
+
+from fastapi.testclient import TestClient
+
+from config import settings
+from logsetup import UVICORN_LOGGERS, DroppingQueueHandler, RateLimitFilter, build_pipeline, setup_logging
+
+
+class CountingArg:
+    """Log argument that records how often it was formatted."""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "arg"
+
+
+def _logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def test_json_lines_are_written_by_the_listener():
+    """Test that records come out as one JSON object per line with lazy args merged."""
+    stream = io.StringIO()
+    pipeline = build_pipeline(fmt="json", stream=stream)
+    logger = _logger("test.logsetup.json", pipeline.handler)
+    logger.info("Created room: %s", "myroom")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.error("Failed for %s", "myroom", exc_info=True)
+    pipeline.stop()
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["msg"] == "Created room: myroom"
+    assert first["level"] == "INFO"
+    assert first["logger"] == "test.logsetup.json"
+    assert second["msg"] == "Failed for myroom"
+    assert "ValueError: boom" in second["exc"]
+
+
+def test_hot_messages_are_rate_limited_and_not_formatted():
+    """Test that a storm of one message template is capped and suppressed records are never formatted."""
+    stream = io.StringIO()
+    pipeline = build_pipeline(fmt="json", rate=0.001, burst=3, stream=stream)
+    logger = _logger("test.logsetup.storm", pipeline.handler)
+    arg = CountingArg()
+    for _ in range(10):
+        logger.info("Broadcast failed for %s", arg)
+    assert arg.formatted == 3
+    assert pipeline.stats()["suppressed"] == 7
+
+    # 令牌补充后，下一条写出的记录带上被抑制的条数
+    for bucket in pipeline.limiter._buckets.values():
+        bucket[0] = 1.0
+    logger.info("Broadcast failed for %s", arg)
+    pipeline.stop()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(lines) == 4
+    assert lines[-1]["suppressed"] == 7
+
+
+def test_full_queue_drops_instead_of_blocking():
+    """Test that records beyond the queue bound are dropped and counted."""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+    logger = _logger("test.logsetup.full", handler)
+    arg = CountingArg()
+    for _ in range(5):
+        logger.warning("Queue full %s", arg)
+    assert handler.dropped == 3
+    assert handler.log_queue.qsize() == 2
+    assert arg.formatted == 2
+
+
+def test_load_stats_report_log_pipeline(client: TestClient, monkeypatch):
+    """Test that the admin load endpoint exposes dropped and suppressed log counts."""
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    response = client.get("/admin/load", headers={"X-Admin-Token": "secret"})
+    assert set(response.json()["logs"]) == {"dropped", "suppressed", "queued"}
+
+
+def test_rate_limit_is_exact_across_threads():
+    """Test that concurrent callers from worker threads never admit more than the burst."""
+    limiter = RateLimitFilter(rate=1e-9, burst=100)
+    admitted = []
+
+    def hammer():
+        record = logging.LogRecord("test.logsetup.threads", logging.INFO, __file__, 0, "Saved %s", ("x",), None)
+        admitted.append(sum(limiter.filter(record) for _ in range(2000)))
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(admitted) == 100
+    assert limiter.suppressed == 8 * 2000 - 100
+
+
+def test_setup_logging_routes_uvicorn_loggers_through_the_pipeline():
+    """Test that uvicorn's own stream handlers are removed and its records reach the root pipeline."""
+    root = logging.getLogger()
+    saved = (list(root.handlers), root.level)
+    logging.config.dictConfig(LOGGING_CONFIG)
+    pipeline = setup_logging("INFO")
+    try:
+        for name in UVICORN_LOGGERS:
+            uvicorn_logger = logging.getLogger(name)
+            assert uvicorn_logger.handlers == []
+            assert uvicorn_logger.propagate is True
+        assert root.handlers == [pipeline.handler]
+    finally:
+        pipeline.stop()
+        root.handlers = saved[0]
+        root.setLevel(saved[1])
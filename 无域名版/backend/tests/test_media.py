@@ -0,0 +1,38 @@
+"""Tests for coalesced media state fanout."""
+
+import asyncio
+
+import pytest
+
+from app import RoomConfig, manager
+from config import settings
+from tests.conftest import FakeWebSocket
+
+
+@pytest.mark.asyncio
+async def test_rapid_toggles_are_coalesced(monkeypatch):
+    """Test that toggles inside the window produce one batch with the latest state."""
+    monkeypatch.setattr(settings, "media_batch_window", 0.05)
+    room = await manager.upsert(RoomConfig(room_id="mediabatch"))
+    ws = FakeWebSocket()
+    await room.connect(ws)
+    ws.sent.clear()
+
+    for video in (True, False, True):
+        room.queue_media_broadcast("alice", {"audio": False, "video": video, "screen": False})
+    room.queue_media_broadcast("bob", {"audio": True, "video": False, "screen": False})
+    assert ws.sent == []
+
+    await asyncio.sleep(0.1)
+
+    batches = [msg for msg in ws.sent if msg["type"] == "media:batch"]
+    assert len(batches) == 1
+    updates = {item["user"]: item["media"] for item in batches[0]["updates"]}
+    assert updates == {
+        "alice": {"audio": False, "video": True, "screen": False},
+        "bob": {"audio": True, "video": False, "screen": False},
+    }
+
+    room.queue_media_broadcast("alice", {"audio": True, "video": True, "screen": False})
+    await asyncio.sleep(0.1)
+    assert len([msg for msg in ws.sent if msg["type"] == "media:batch"]) == 2
@@ -0,0 +1,58 @@
+"""Tests for connection-based presence."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import Room, RoomConfig
+from tests.conftest import FakeWebSocket
+
+
+@pytest.mark.asyncio
+async def test_presence_is_reference_counted_per_connection():
+    """Test that only the first connect and last disconnect change presence."""
+    room = Room(RoomConfig(room_id="presence"))
+    tab1, tab2 = FakeWebSocket(), FakeWebSocket()
+
+    assert await room.attach(tab1, "alice") is True
+    assert await room.attach(tab2, "alice") is False
+    assert list(room.participants) == ["alice"]
+
+    assert await room.detach(tab1) is None
+    assert "alice" in room.participants
+    assert await room.detach(tab2) == "alice"
+    assert room.participants == {}
+    assert room.user_connections == {}
+    assert await room.detach(tab2) is None
+
+
+@pytest.mark.asyncio
+async def test_repeated_join_on_one_connection_counts_once():
+    """Test that a connection sending join twice still leaves with a single detach."""
+    room = Room(RoomConfig(room_id="rejoin"))
+    tab = FakeWebSocket()
+
+    assert await room.attach(tab, "alice") is True
+    assert await room.attach(tab, "alice") is False
+    assert room.user_connections == {"alice": 1}
+    assert await room.detach(tab) == "alice"
+    assert room.participants == {}
+
+
+def test_second_tab_does_not_rebroadcast_join(client: TestClient):
+    """Test that a second tab for the same user gets state without a join event."""
+    with client.websocket_connect("/ws/rooms/twotabs") as first:
+        first.receive_json()
+        first.send_json({"type": "join", "user": "alice"})
+        assert first.receive_json()["event"] == "user:join"
+        first.receive_json()
+
+        with client.websocket_connect("/ws/rooms/twotabs") as second:
+            second.receive_json()
+            second.send_json({"type": "join", "user": "alice"})
+            state = second.receive_json()
+            assert state["type"] == "state"
+            assert state["data"]["participants"] == ["alice"]
+
+        first.send_json({"type": "chat", "user": "alice", "text": "still here"})
+        message = first.receive_json()
+        assert message["type"] == "chat"
@@ -0,0 +1,35 @@
+"""Tests for the compact Room and participant layout."""
+
+import pytest
+
+from app import MEDIA_AUDIO, MEDIA_SCREEN, Room, RoomConfig, pack_media, unpack_media
+from tests.conftest import join
+
+
+def test_media_bitfield_round_trip():
+    """Test packing and unpacking media flags."""
+    bits = pack_media({"audio": True, "video": False, "screen": True})
+    assert bits == MEDIA_AUDIO | MEDIA_SCREEN
+    assert unpack_media(bits) == {"audio": True, "video": False, "screen": True}
+    assert pack_media(None) == 0
+
+
+@pytest.mark.asyncio
+async def test_media_state_is_stored_per_participant():
+    """Test that media flags live on the participant record and are serialized as dicts."""
+    room = Room(RoomConfig(room_id="compact"))
+    assert room._lock is None
+
+    alice = await join(room, "alice")
+    snapshot = await room.update_media_state("alice", {"video": 1})  # type: ignore[dict-item]
+    assert snapshot == {"audio": False, "video": True, "screen": False}
+
+    # 未加入的用户不会留下媒体状态
+    await room.update_media_state("ghost", {"audio": True})
+
+    state = await room.serialize()
+    assert state.media_states == {"alice": {"audio": False, "video": True, "screen": False}}
+
+    await room.detach(alice)
+    assert room.media_states == {}
+    assert not hasattr(room, "__dict__")
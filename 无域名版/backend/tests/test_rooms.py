@@ -3,6 +3,8 @@
 import pytest
 from fastapi.testclient import TestClient
 
+from app import RoomState
+
 
 def test_create_room(client: TestClient):
     """Test creating a new room."""
@@ -161,3 +163,13 @@ async def test_websocket_chat(client: TestClient):
         assert chat["type"] == "chat"
         assert chat["user"] == "testuser"
         assert chat["text"] == "Hello, world!"
+
+
+def test_room_state_fast_path_matches_model(client: TestClient):
+    """Test that the directly encoded state has exactly the RoomState fields."""
+    created = client.post("/rooms", json={"room_id": "fastpath", "goal": "学习"})
+    assert created.headers["content-type"] == "application/json"
+    body = client.get("/rooms/fastpath").json()
+    assert list(body) == list(RoomState.model_fields)
+    assert RoomState(**body).goal == "学习"
+    assert client.get("/rooms").json() == [body]
@@ -0,0 +1,87 @@
+"""Tests for read-only SSE spectators."""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import Room, RoomConfig, manager, spectator_stream
+
+
+@pytest.mark.asyncio
+async def test_spectators_share_frames_and_skip_media():
+    """Test that spectators get one shared frame per event and no media traffic."""
+    room = Room(RoomConfig(room_id="watchers"))
+    first: asyncio.Queue = asyncio.Queue(maxsize=8)
+    second: asyncio.Queue = asyncio.Queue(maxsize=8)
+    room.add_spectator(first)
+    room.add_spectator(second)
+
+    await room.broadcast({"type": "chat", "user": "alice", "text": "hi"})
+    await room.broadcast({"type": "media:batch", "updates": []})
+
+    frame = first.get_nowait()
+    assert frame.startswith("event: chat\n")
+    assert frame is second.get_nowait()
+    assert first.empty()
+    assert room.participants == {}
+    assert room.clients == {}
+
+
+@pytest.mark.asyncio
+async def test_slow_spectator_is_dropped():
+    """Test that a spectator whose queue is full is removed and its stream ends."""
+    room = Room(RoomConfig(room_id="slowwatch"))
+    queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+    room.add_spectator(queue)
+
+    await room.broadcast({"type": "event", "event": "timer:pause"})
+    await room.broadcast({"type": "event", "event": "timer:reset"})
+
+    assert room.spectators is None
+    assert queue.get_nowait() is None
+
+
+@pytest.mark.asyncio
+async def test_spectator_stream_starts_with_state():
+    """Test that the SSE stream opens with the current room state."""
+    room = Room(RoomConfig(room_id="streamme"))
+    queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+    room.add_spectator(queue)
+    stream = spectator_stream(room, queue)
+
+    first = await stream.__anext__()
+    assert first.startswith("event: state\n")
+    queue.put_nowait(None)
+    with pytest.raises(StopAsyncIteration):
+        await stream.__anext__()
+    assert room.spectators is None
+
+
+def test_events_for_missing_room(client: TestClient):
+    """Test that spectating an unknown room returns 404."""
+    assert client.get("/rooms/nowhere/events").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_drain_ends_spectator_streams(tmp_path, monkeypatch):
+    """Test that draining ends open SSE streams so shutdown is not held up by them."""
+    monkeypatch.setattr(manager, "draining", False)
+    room = await manager.upsert(RoomConfig(room_id="drainwatch"))
+    queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+    room.add_spectator(queue)
+    stream = spectator_stream(room, queue)
+    await stream.__anext__()
+
+    await manager.drain(str(tmp_path / "handoff.json"))
+
+    with pytest.raises(StopAsyncIteration):
+        await asyncio.wait_for(stream.__anext__(), timeout=1)
+    assert room.spectators is None
+
+
+def test_events_refused_while_draining(client: TestClient, monkeypatch):
+    """Test that new spectators are turned away once the server is draining."""
+    client.post("/rooms", json={"room_id": "latewatch"})
+    monkeypatch.setattr(manager, "draining", True)
+    assert client.get("/rooms/latewatch/events").status_code == 503
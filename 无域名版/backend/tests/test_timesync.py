@@ -0,0 +1,65 @@
+"""Tests for the clock sync exchange and client-side timer interpolation data."""
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import Room, RoomConfig
+from config import settings
+from tests.conftest import FakeWebSocket
+
+
+def test_time_ping_is_answered_to_sender_only(client: TestClient):
+    """Test that time:ping gets an NTP-style time:pong with server timestamps."""
+    with client.websocket_connect("/ws/rooms/clocksync") as ws:
+        ws.receive_json()
+        before = time.time()
+        ws.send_json({"type": "time:ping", "t0": 1234.5})
+        pong = ws.receive_json()
+
+    assert pong["type"] == "time:pong"
+    assert pong["t0"] == 1234.5
+    assert before <= pong["t1"] <= pong["t2"] <= time.time()
+    assert isinstance(pong["mono"], float)
+
+
+@pytest.mark.asyncio
+async def test_running_state_carries_ends_at():
+    """Test that a running timer exposes its wall-clock end and a paused one does not."""
+    room = Room(RoomConfig(room_id="endsat", timer_length=600))
+    await room.start_focus(user="alice")
+    state = await room.serialize()
+    assert state.ends_at == pytest.approx(time.time() + 600, abs=1)
+
+    await room.pause(user="alice")
+    assert (await room.serialize()).ends_at is None
+
+
+@pytest.mark.asyncio
+async def test_timer_only_broadcasts_on_interval(monkeypatch):
+    """Test that periodic state pushes happen every timer_broadcast_interval seconds."""
+    monkeypatch.setattr(settings, "timer_broadcast_interval", 60)
+    room = Room(RoomConfig(room_id="ticks"))
+    ws = FakeWebSocket()
+    await room.connect(ws)
+    await room.start_focus(user="alice")
+    assert room.timer_task is not None
+    room.timer_task.cancel()
+
+    async def run_tick(remaining):
+        ws.sent.clear()
+        room.remaining = remaining
+        room.deadline = time.monotonic() + remaining - 1 + 0.02
+        room.timer_task = asyncio.create_task(room._timer_loop())
+        await asyncio.sleep(0.1)
+        assert room.timer_task is not None
+        room.timer_task.cancel()
+        return [m for m in ws.sent if m["type"] == "state"]
+
+    assert await run_tick(62) == []
+    assert room.remaining == 61
+    pushes = await run_tick(61)
+    assert room.remaining == 60
+    assert len(pushes) == 1
@@ -0,0 +1,242 @@
+"""进程内的轻量链路追踪：按比例采样的追踪由嵌套的 span 组成，结束后交给可替换的导出器
+
+只有入口（一条 WebSocket 消息、一次令牌请求）决定是否采样。当前 span 保存在
+``ContextVar`` 中，未采样或追踪关闭时 ``span`` / ``traced`` 只做一次上下文变量读取
+并返回共享的空操作对象。追踪结束后新建的子 span（例如入口中创建的后台任务里）会被忽略。
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Protocol, TypeVar, cast
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=str)
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+class Exporter(Protocol):
+    def export(self, trace: Dict[str, Any]) -> None:
+        ...
+
+
+class _NoopSpan:
+    """未采样时返回的共享空 span"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+NOOP = _NoopSpan()
+
+
+class Trace:
+    """一次采样的追踪：根 span 和它在同一上下文中派生的所有子 span"""
+
+    __slots__ = ("tracer", "trace_id", "spans", "started", "done")
+
+    def __init__(self, tracer: "Tracer") -> None:
+        self.tracer = tracer
+        self.trace_id = os.urandom(8).hex()
+        self.spans: List[Span] = []
+        self.started = 0.0
+        self.done = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        root = self.spans[0]
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "start": root.start,
+            "duration_ms": root.duration_ms(),
+            "attrs": root.attrs,
+            "spans": [span.to_dict(self.started) for span in self.spans],
+        }
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "attrs", "start", "started", "ended", "_token")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[int], attrs: Dict[str, Any]) -> None:
+        self.trace = trace
+        self.name = name
+        self.span_id = len(trace.spans)
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.start = 0.0
+        self.started = 0.0
+        self.ended: Optional[float] = None
+        trace.spans.append(self)
+
+    def __enter__(self) -> "Span":
+        self.start = time.time()
+        self.started = time.perf_counter()
+        if self.parent_id is None:
+            self.trace.started = self.started
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.ended = time.perf_counter()
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        if self.parent_id is None:
+            self.trace.done = True
+            self.trace.tracer.export(self.trace)
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def duration_ms(self) -> Optional[float]:
+        if self.ended is None:
+            return None
+        return round((self.ended - self.started) * 1000, 3)
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        # 子 span 的开始时间以相对根 span 的毫秒数表示，便于直接阅读
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset_ms": round((self.started - origin) * 1000, 3),
+            "duration_ms": self.duration_ms(),
+            "attrs": self.attrs,
+        }
+
+
+def span(name: str, **attrs: Any) -> Any:
+    """在当前追踪中开启一个子 span；没有进行中的采样追踪时返回空操作对象"""
+    parent = _current.get()
+    if parent is None or parent.trace.done:
+        return NOOP
+    return Span(parent.trace, name, parent.span_id, attrs)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """把协程函数的每次调用记录为当前追踪中的一个子 span"""
+
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            parent = _current.get()
+            if parent is None or parent.trace.done:
+                return await func(*args, **kwargs)
+            with Span(parent.trace, name, parent.span_id, {}):
+                return await func(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorate
+
+
+class Tracer:
+    """按 ``sample_rate`` 决定入口是否采样，并把结束的追踪交给所有导出器"""
+
+    def __init__(self, sample_rate: float = 0.0, exporters: Optional[List[Exporter]] = None) -> None:
+        self.sample_rate = sample_rate
+        self.exporters: List[Exporter] = list(exporters or [])
+        self.sampled = 0
+
+    def trace(self, name: str, **attrs: Any) -> Any:
+        """开启一次追踪的根 span；未被采样时返回空操作对象，已在追踪中时作为子 span"""
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return NOOP
+        parent = _current.get()
+        if parent is not None and not parent.trace.done:
+            return Span(parent.trace, name, parent.span_id, attrs)
+        self.sampled += 1
+        return Span(Trace(self), name, None, attrs)
+
+    def export(self, trace: Trace) -> None:
+        data = trace.to_dict()
+        for exporter in self.exporters:
+            try:
+                exporter.export(data)
+            except Exception as exc:
+                logger.warning("导出追踪失败：%s", exc)
+
+
+class RingExporter:
+    """在内存中保留最近 ``size`` 条追踪，供调试接口查看"""
+
+    def __init__(self, size: int = 200) -> None:
+        self._traces: Deque[Dict[str, Any]] = deque(maxlen=max(1, size))
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        self._traces.append(trace)
+
+    def traces(self, limit: int = 50, name: str = "") -> List[Dict[str, Any]]:
+        """按从新到旧返回最多 ``limit`` 条追踪，``name`` 按根 span 名称的子串过滤"""
+        result = []
+        for trace in reversed(self._traces):
+            if name and name not in trace["name"]:
+                continue
+            result.append(trace)
+            if len(result) >= limit:
+                break
+        return result
+
+
+class FileExporter:
+    """把追踪按 JSON Lines 追加到本地文件
+
+    写入在独立的后台线程中进行，事件循环只把编码后的行放入有界队列；队列满时
+    丢弃该追踪并计数，不会阻塞请求路径。
+    """
+
+    def __init__(self, path: str, max_pending: int = 1000) -> None:
+        self.path = Path(path)
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(_encoder.encode(trace))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as fh:
+            while True:
+                line = self._queue.get()
+                if line is None:
+                    return
+                fh.write(line + "\n")
+                if self._queue.empty():
+                    fh.flush()
+
+    def close(self, timeout: float = 2.0) -> None:
+        """写完队列中剩余的追踪后结束后台线程"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
@@ -27,6 +27,7 @@ const focusLengthInput = document.getElementById("focus-length");
 const breakLengthInput = document.getElementById("break-length");
 const timerDisplay = document.getElementById("timer-display");
 const timerStatus = document.getElementById("timer-status");
+const roomTimerEl = document.getElementById("room-timer");
 const participantsList = document.getElementById("participants");
 const eventsList = document.getElementById("events");
 const chatList = document.getElementById("chat-log");
@@ -40,6 +41,18 @@ const screenBtn = document.getElementById("screen-btn");
 const leaderboardList = document.getElementById("leaderboard");
 
 let socket = null;
+let serverReconnectDelay = null;
+// 连接以 1012（服务重启）关闭却没有收到排空通知时，在 0 到该秒数之间随机错开重连
+const RESTART_RECONNECT_SPREAD = 10;
+// 最近收到的房间消息序号，重连同一房间时带上它，服务器只补发错过的消息
+let lastEventSeq = null;
+let lastEventRoomId = "";
+// 服务器时钟 - 本地时钟（秒），取往返时延最小的一次 time:ping 样本
+let serverClockOffset = 0;
+let serverClockRtt = Infinity;
+let clockSyncTimerId = null;
+// 房间计时器运行时的本地刷新定时器，按 ends_at 插值，不等服务器推送
+let sharedTimerTickId = null;
 let lastState = null;
 let localUser = "";
 let remoteMediaStates = {};
@@ -725,6 +738,30 @@ function renderState(state) {
     updateRemoteMedia(user, details);
   });
 
+  renderSharedTimer();
+  if (state.status === "running" && !sharedTimerTickId) {
+    sharedTimerTickId = window.setInterval(renderSharedTimer, 500);
+  } else if (state.status !== "running") {
+    stopSharedTimer();
+  }
+}
+
+function renderSharedTimer() {
+  if (!roomTimerEl) return;
+  if (!lastState) {
+    roomTimerEl.hidden = true;
+    return;
+  }
+  const statusText =
+    lastState.status === "running" ? "运行中" : lastState.status === "paused" ? "已暂停" : "待开始";
+  const cycleText = lastState.cycle === "break" ? "休息" : "专注";
+  roomTimerEl.textContent = `房间计时 · ${cycleText} ${formatSeconds(sharedTimerRemaining(lastState))} · ${statusText}`;
+  roomTimerEl.hidden = false;
+}
+
+function stopSharedTimer() {
+  clearInterval(sharedTimerTickId);
+  sharedTimerTickId = null;
 }
 
 function setControlsEnabled(enabled) {
@@ -750,6 +787,42 @@ function sendMessage(payload) {
   socket.send(JSON.stringify(payload));
 }
 
+function sendClockPing() {
+  sendMessage({ type: "time:ping", t0: Date.now() / 1000 });
+}
+
+function handleClockPong(data) {
+  const t3 = Date.now() / 1000;
+  const rtt = t3 - data.t0 - (data.t2 - data.t1);
+  if (!(rtt >= 0) || rtt > serverClockRtt) return;
+  serverClockRtt = rtt;
+  serverClockOffset = (data.t1 - data.t0 + (data.t2 - t3)) / 2;
+}
+
+function startClockSync() {
+  serverClockRtt = Infinity;
+  clearInterval(clockSyncTimerId);
+  // 连接后连发几次取最好的样本，之后定期复测以跟上时钟漂移
+  [0, 500, 1500].forEach((delay) => setTimeout(sendClockPing, delay));
+  clockSyncTimerId = window.setInterval(() => {
+    serverClockRtt = Infinity;
+    sendClockPing();
+  }, 5 * 60 * 1000);
+}
+
+function serverNow() {
+  return Date.now() / 1000 + serverClockOffset;
+}
+
+// 房间计时器的剩余秒数：运行中按 ends_at 和估计的时钟偏移本地插值，不依赖服务器逐秒推送
+function sharedTimerRemaining(state) {
+  if (!state) return 0;
+  if (state.status === "running" && state.ends_at) {
+    return Math.max(0, Math.ceil(state.ends_at - serverNow()));
+  }
+  return state.remaining;
+}
+
 async function ensureRoomExists(roomId) {
   if (!roomId) {
     return;
@@ -804,12 +877,20 @@ async function connectRoom() {
 
   await ensureRoomExists(roomId);
 
-  const wsUrl = `${wsBase}/ws/rooms/${encodeURIComponent(roomId)}`;
+  if (lastEventRoomId !== roomId) {
+    lastEventSeq = null;
+    lastEventRoomId = roomId;
+  }
+  let wsUrl = `${wsBase}/ws/rooms/${encodeURIComponent(roomId)}`;
+  if (lastEventSeq !== null) {
+    wsUrl += `?since=${lastEventSeq}`;
+  }
   socket = new WebSocket(wsUrl);
 
   socket.addEventListener("open", () => {
     timerStatus.textContent = "连接成功";
     sendMessage({ type: "join", user });
+    startClockSync();
     setControlsEnabled(true);
     leaveBtn.disabled = false;
     sendMediaUpdate();
@@ -824,6 +905,13 @@ async function connectRoom() {
 
   socket.addEventListener("message", async (event) => {
     const data = JSON.parse(event.data);
+    if (typeof data.seq === "number") {
+      // 续传与紧随其后的广播可能重复同一条消息；状态快照总是应用
+      if (data.type !== "state" && lastEventSeq !== null && data.seq <= lastEventSeq) {
+        return;
+      }
+      lastEventSeq = Math.max(lastEventSeq ?? data.seq, data.seq);
+    }
     switch (data.type) {
       case "state":
         renderState(data.data);
@@ -837,13 +925,45 @@ async function connectRoom() {
       case "media:update":
         updateRemoteMedia(data.user, data.media || {});
         break;
+      case "media:batch":
+        (data.updates || []).forEach((item) => {
+          updateRemoteMedia(item.user, item.media || {});
+        });
+        break;
+      case "ping":
+        sendMessage({ type: "pong" });
+        break;
+      case "time:pong":
+        handleClockPong(data);
+        break;
+      case "server:draining":
+      case "server:busy":
+        serverReconnectDelay = Number(data.reconnect_after) || 0;
+        break;
       default:
         break;
     }
   });
 
-  socket.addEventListener("close", () => {
-    timerStatus.textContent = "已断开";
+  socket.addEventListener("close", (event) => {
+    clearInterval(clockSyncTimerId);
+    clockSyncTimerId = null;
+    stopSharedTimer();
+    if (serverReconnectDelay === null && event.code === 1012) {
+      // 服务器重启时可能来不及发送 server:draining，按同样的方式错开重连
+      serverReconnectDelay = Math.random() * RESTART_RECONNECT_SPREAD;
+    }
+    if (serverReconnectDelay !== null) {
+      // 服务器排空或过载：按服务器给出的错开延迟重连，避免所有客户端同时涌入
+      const delay = serverReconnectDelay;
+      serverReconnectDelay = null;
+      timerStatus.textContent = "服务器繁忙或正在升级，稍后自动重连…";
+      setTimeout(() => {
+        connectRoom();
+      }, delay * 1000);
+    } else {
+      timerStatus.textContent = "已断开";
+    }
     setControlsEnabled(false);
     leaveBtn.disabled = true;
     cleanupMediaTiles();
@@ -0,0 +1,82 @@
+"""Broadcast cost in very large rooms: wall time, peak memory and loop stall.
+
+Connections are in-memory fakes whose ``send_text`` yields once to the loop,
+so the numbers show the scheduling overhead of ``Room.broadcast`` itself.
+A ticker task measures the longest gap between its wake-ups during the
+broadcasts, which is the stall the rest of the server sees.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+from typing import List, Optional, cast
+
+from fastapi import WebSocket
+
+from app import Room, RoomConfig
+
+SIZES = [1000, 5000, 20000]
+
+
+class NullWebSocket:
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        await asyncio.sleep(0)
+
+
+async def _ticker(gaps: List[float], stop: asyncio.Event) -> None:
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0)
+        now = time.perf_counter()
+        gaps.append(now - last)
+        last = now
+
+
+async def measure(size: int, messages: int) -> tuple:
+    room = Room(RoomConfig(room_id="fanout"))
+    for _ in range(size):
+        await room.connect(cast(WebSocket, NullWebSocket()))
+    payload = {"type": "event", "event": "timer:start_focus", "user": "bench"}
+
+    gaps: List[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(gaps, stop))
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(messages):
+        await room.broadcast(payload)
+    elapsed = (time.perf_counter() - started) / messages
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stop.set()
+    await ticker
+    return elapsed, peak, max(gaps, default=0.0)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--stall-budget", type=float, default=0.25, help="max loop stall per broadcast (s)")
+    args = parser.parse_args(argv)
+
+    ok = True
+    for size in SIZES:
+        elapsed, peak, stall = asyncio.run(measure(size, args.messages))
+        print(
+            f"{size:>6} clients: {elapsed * 1000:8.1f} ms/broadcast  "
+            f"peak {peak / 1024:8.0f} KiB  max loop stall {stall * 1000:6.1f} ms"
+        )
+        if stall > args.stall_budget:
+            ok = False
+    if not ok:
+        print("loop stall budget exceeded")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""REST throughput for room state at 1,000 rooms.
+
+Requests go through the full ASGI stack (routing, CORS middleware, response
+encoding) in-process via ``httpx.ASGITransport``, so the numbers reflect the
+server's per-request CPU cost rather than the network. Reports requests per
+second for ``GET /rooms/{room_id}`` and ``GET /rooms``.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import Any, List, Optional, cast
+
+import httpx
+
+import app as app_module
+from app import RoomConfig
+from config import settings
+
+
+async def _populate(rooms: int) -> List[str]:
+    room_ids = [f"rest{i:05d}" for i in range(rooms)]
+    for i, room_id in enumerate(room_ids):
+        room = await app_module.manager.upsert(RoomConfig(room_id=room_id, goal="Review lecture notes"))
+        for j in range(i % 4):
+            await room.attach(cast(Any, object()), f"user-{i}-{j}")
+            await room.update_media_state(f"user-{i}-{j}", {"audio": True, "video": j % 2 == 0})
+    return room_ids
+
+
+async def _rate(client: httpx.AsyncClient, paths: List[str], concurrency: int) -> float:
+    async def worker(offset: int) -> None:
+        for path in paths[offset::concurrency]:
+            response = await client.get(path)
+            assert response.status_code == 200, response.status_code
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return len(paths) / (time.perf_counter() - started)
+
+
+async def measure(rooms: int, requests: int, list_requests: int, concurrency: int) -> tuple:
+    room_ids = await _populate(rooms)
+    transport = httpx.ASGITransport(app=app_module.app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        single = await _rate(client, [f"/rooms/{room_ids[i % rooms]}" for i in range(requests)], concurrency)
+        listing = await _rate(client, ["/rooms"] * list_requests, concurrency)
+    return single, listing
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--list-requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--single-budget", type=float, default=500, help="min GET /rooms/{id} requests/s")
+    parser.add_argument("--list-budget", type=float, default=5, help="min GET /rooms requests/s")
+    args = parser.parse_args(argv)
+
+    saved = settings.max_rooms
+    settings.max_rooms = max(saved, args.rooms)
+    try:
+        single, listing = asyncio.run(measure(args.rooms, args.requests, args.list_requests, args.concurrency))
+    finally:
+        settings.max_rooms = saved
+
+    print(f"GET /rooms/{{room_id}}: {single:8.0f} req/s  ({args.rooms} rooms)")
+    print(f"GET /rooms:           {listing:8.1f} req/s  ({args.rooms} rooms per response)")
+
+    ok = True
+    if single < args.single_budget:
+        print(f"GET /rooms/{{room_id}} below {args.single_budget:.0f} req/s")
+        ok = False
+    if listing < args.list_budget:
+        print(f"GET /rooms below {args.list_budget:.0f} req/s")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
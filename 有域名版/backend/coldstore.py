@@ -0,0 +1,90 @@
+"""休眠房间的冷存储：把没有连接的房间压缩成紧凑的字节串保存在内存中"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Any, Dict, Iterator, Optional
+
+# 记录按固定顺序编码为 JSON 数组，省去字段名
+FIELDS = (
+    "goal",
+    "timer_length",
+    "break_length",
+    "status",
+    "cycle",
+    "remaining",
+    "focus_mark",
+    "updated_at",
+    "saved_at",
+    "version",
+)
+
+# 首字节标记编码方式：短记录直接存 JSON，较长的（通常是目标文本较长）再用 zlib 压缩
+_RAW = b"j"
+_ZLIB = b"z"
+_COMPRESS_ABOVE = 96
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    values = [record.get(field) for field in FIELDS]
+    data = json.dumps(values, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(data) > _COMPRESS_ABOVE:
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return _ZLIB + compressed
+    return _RAW + data
+
+
+def decode_record(room_id: str, blob: bytes) -> Dict[str, Any]:
+    data = blob[1:]
+    if blob[:1] == _ZLIB:
+        data = zlib.decompress(data)
+    record = dict(zip(FIELDS, json.loads(data)))
+    record["room_id"] = room_id
+    return record
+
+
+class ColdStore:
+    """房间 ID -> 编码后记录的映射，超过 ``max_rooms`` 时丢弃最早冻结的房间"""
+
+    def __init__(self, max_rooms: int) -> None:
+        self.max_rooms = max_rooms
+        self._blobs: Dict[str, bytes] = {}
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def __contains__(self, room_id: object) -> bool:
+        return room_id in self._blobs
+
+    def put(self, room_id: str, record: Dict[str, Any]) -> Optional[str]:
+        """冻结一个房间，返回因容量限制被丢弃的房间 ID（如有）"""
+        self._blobs.pop(room_id, None)
+        self._blobs[room_id] = encode_record(record)
+        if len(self._blobs) > self.max_rooms:
+            oldest = next(iter(self._blobs))
+            del self._blobs[oldest]
+            return oldest
+        return None
+
+    def take(self, room_id: str) -> Optional[Dict[str, Any]]:
+        """取出并删除一个冻结的房间记录"""
+        blob = self._blobs.pop(room_id, None)
+        if blob is None:
+            return None
+        return decode_record(room_id, blob)
+
+    def peek(self, room_id: str) -> Optional[Dict[str, Any]]:
+        """读取一个冻结的房间记录，不取出"""
+        blob = self._blobs.get(room_id)
+        if blob is None:
+            return None
+        return decode_record(room_id, blob)
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for room_id, blob in self._blobs.items():
+            yield decode_record(room_id, blob)
+
+    def clear(self) -> None:
+        self._blobs.clear()
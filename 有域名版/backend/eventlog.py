@@ -0,0 +1,272 @@
+"""追加写入的自习事件日志，带分段轮转和按段预聚合的专注时长统计"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+SUMMARY_SUFFIX = ".sum.json"
+DAY_SECONDS = 86400
+
+
+def _day_of(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).date().isoformat()
+
+
+def split_days(end_ts: float, seconds: int) -> List[Tuple[str, int]]:
+    """把截止到 ``end_ts`` 的 ``seconds`` 秒按 UTC 日期边界拆开，返回 (日期, 秒数)
+
+    专注记录只在专注段结束时写入，跨越午夜的专注段要分摊到前后两天。
+    """
+    parts: List[Tuple[str, int]] = []
+    end = end_ts
+    left = seconds
+    while left > 0:
+        # 恰好落在午夜的时刻算作前一天的结尾
+        day_start = (math.ceil(end / DAY_SECONDS) - 1) * DAY_SECONDS
+        chunk = min(left, max(1, round(end - day_start)))
+        parts.append((_day_of(day_start), chunk))
+        left -= chunk
+        end -= chunk
+    return parts
+
+
+class SegmentSummary:
+    """单个日志分段的预聚合结果：按房间 / 用户和 UTC 日期累计的专注秒数"""
+
+    def __init__(self) -> None:
+        self.first_ts: Optional[float] = None
+        self.last_ts: Optional[float] = None
+        self.rooms: Dict[str, Dict[str, int]] = {}
+        self.users: Dict[str, Dict[str, int]] = {}
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        ts = entry["ts"]
+        if self.first_ts is None:
+            self.first_ts = ts
+        self.last_ts = ts
+        seconds = entry.get("focus")
+        if not seconds:
+            return
+        room_days = self.rooms.setdefault(entry["room"], {})
+        for day, part in split_days(ts, seconds):
+            room_days[day] = room_days.get(day, 0) + part
+        # 新记录带按用户在场时间计算的 credits；旧记录只有 participants，每人按整段计。
+        # 每个用户的秒数同样从专注段结束时刻往前拆分到各自的日期
+        credits = entry.get("credits")
+        if credits is None:
+            credits = dict.fromkeys(entry.get("participants", ()), seconds)
+        for user, credited in credits.items():
+            user_days = self.users.setdefault(user, {})
+            for day, part in split_days(ts, credited):
+                user_days[day] = user_days.get(day, 0) + part
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "first_ts": self.first_ts,
+            "last_ts": self.last_ts,
+            "rooms": self.rooms,
+            "users": self.users,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SegmentSummary":
+        summary = cls()
+        summary.first_ts = data.get("first_ts")
+        summary.last_ts = data.get("last_ts")
+        summary.rooms = data.get("rooms", {})
+        summary.users = data.get("users", {})
+        return summary
+
+
+class EventLog:
+    """异步批量写入的事件日志
+
+    ``record`` 只把事件追加到内存缓冲区，不会阻塞广播路径；后台任务按
+    ``flush_interval`` 或缓冲区达到 ``batch_size`` 时，在线程中把整批事件
+    写入当前分段。分段超过 ``segment_bytes`` 时轮转，并把该段的汇总写入
+    旁边的 ``.sum.json`` 文件，查询只读取这些汇总而不扫描原始事件。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 4 * 1024 * 1024,
+        max_segments: int = 64,
+        flush_interval: float = 1.0,
+        batch_size: int = 256,
+        max_pending: int = 10000,
+    ) -> None:
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._summaries: Dict[int, SegmentSummary] = {}
+        self._summary_lock = threading.Lock()
+        self._active_seq = 0
+        self._active_size = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def record(self, room_id: str, event: str, user: Optional[str] = None, **fields: Any) -> None:
+        """记录一个事件；日志未启动时静默忽略"""
+        if self._task is None:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        entry: Dict[str, Any] = {"ts": round(time.time(), 3), "room": room_id, "event": event}
+        if user is not None:
+            entry["user"] = user
+        entry.update(fields)
+        self._pending.append(entry)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """加载已有分段的汇总并启动后台写入任务"""
+        if self._task is not None:
+            return
+        await asyncio.to_thread(self._open)
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._writer_loop())
+        logger.info("事件日志已启动: %s", self.directory)
+
+    async def stop(self) -> None:
+        """停止后台任务并写出剩余事件"""
+        if self._task is None:
+            return
+        # 用标志位而不是 cancel 结束写入循环，避免取消信号与唤醒同时到达时丢失
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        await self.flush()
+        logger.info("事件日志已停止")
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        await asyncio.to_thread(self._write_batch, batch)
+
+    async def _writer_loop(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("写入事件日志出错: %s", e, exc_info=True)
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"{seq:06d}{SEGMENT_SUFFIX}"
+
+    def _summary_path(self, seq: int) -> Path:
+        return self.directory / f"{seq:06d}{SUMMARY_SUFFIX}"
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        seqs = sorted(int(p.name[: -len(SEGMENT_SUFFIX)]) for p in self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+        summaries: Dict[int, SegmentSummary] = {}
+        for seq in seqs:
+            summary_path = self._summary_path(seq)
+            if summary_path.exists():
+                summaries[seq] = SegmentSummary.from_dict(json.loads(summary_path.read_text("utf-8")))
+            else:
+                # 没有汇总文件的只可能是上次运行时的活动分段，重建一次即可
+                summaries[seq] = self._rebuild_summary(seq)
+        if seqs and not self._summary_path(seqs[-1]).exists():
+            self._active_seq = seqs[-1]
+            self._active_size = self._segment_path(self._active_seq).stat().st_size
+        else:
+            self._active_seq = (seqs[-1] + 1) if seqs else 1
+            self._active_size = 0
+            summaries[self._active_seq] = SegmentSummary()
+        with self._summary_lock:
+            self._summaries = summaries
+        self._prune()
+
+    def _rebuild_summary(self, seq: int) -> SegmentSummary:
+        summary = SegmentSummary()
+        with self._segment_path(seq).open("r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    summary.add(json.loads(line))
+                except (ValueError, KeyError):
+                    # 崩溃时可能留下半行
+                    continue
+        return summary
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n" for entry in batch)
+        with self._segment_path(self._active_seq).open("a", encoding="utf-8") as fh:
+            fh.write(data)
+        self._active_size += len(data.encode("utf-8"))
+        with self._summary_lock:
+            summary = self._summaries[self._active_seq]
+            for entry in batch:
+                summary.add(entry)
+        if self._active_size >= self.segment_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        sealed = self._active_seq
+        with self._summary_lock:
+            payload = self._summaries[sealed].to_dict()
+        self._summary_path(sealed).write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        self._active_seq = sealed + 1
+        self._active_size = 0
+        with self._summary_lock:
+            self._summaries[self._active_seq] = SegmentSummary()
+        self._prune()
+
+    def _prune(self) -> None:
+        """只保留最近的 ``max_segments`` 个分段"""
+        with self._summary_lock:
+            expired = sorted(self._summaries)[: max(0, len(self._summaries) - self.max_segments)]
+            for seq in expired:
+                del self._summaries[seq]
+        for seq in expired:
+            self._segment_path(seq).unlink(missing_ok=True)
+            self._summary_path(seq).unlink(missing_ok=True)
+
+    def focus_seconds(self, kind: str, key: str, start: date, end: date) -> Dict[str, int]:
+        """返回 ``start``..``end``（含）之间每天的专注秒数，``kind`` 为 ``rooms`` 或 ``users``"""
+        start_day, end_day = start.isoformat(), end.isoformat()
+        start_ts = datetime(start.year, start.month, start.day, tzinfo=timezone.utc).timestamp()
+        end_ts = datetime(end.year, end.month, end.day, tzinfo=timezone.utc).timestamp() + 86400
+        days: Dict[str, int] = {}
+        with self._summary_lock:
+            for summary in self._summaries.values():
+                if summary.first_ts is None or summary.last_ts is None:
+                    continue
+                if summary.last_ts < start_ts or summary.first_ts >= end_ts:
+                    continue
+                for day, seconds in getattr(summary, kind).get(key, {}).items():
+                    if start_day <= day <= end_day:
+                        days[day] = days.get(day, 0) + seconds
+        return dict(sorted(days.items()))
@@ -0,0 +1,32 @@
+"""REST 响应的快速 JSON 编码：有 orjson 时用 orjson，否则退回标准库"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 是可选依赖
+    orjson = None  # type: ignore[assignment]
+
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+def dumps(content: Any) -> bytes:
+    """把由 dict / list / str / 数字组成的内容直接编码为 UTF-8 字节"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return _encoder.encode(content).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """直接编码已经是纯 Python 结构的内容，跳过 response_model 的二次校验和 jsonable_encoder
+
+    端点返回这个响应时 FastAPI 不会再处理返回值，``response_model`` 只用于生成 OpenAPI 文档。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,110 @@
+"""大厅订阅：向房间列表页推送房间增删、人数和计时状态的增量变化"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+
+class LobbyFeed:
+    """维护每个房间的摘要，并把变化合并成增量帧推送给大厅订阅者
+
+    房间变化只更新摘要并登记待推送的增量；同一事件循环轮次内的增量会合并成
+    一帧 ``lobby:delta``，同一房间同类变化只保留最新值。帧只编码一次，
+    所有订阅者共享。
+    """
+
+    def __init__(self) -> None:
+        # 订阅者 -> 最近一次收到该连接消息的单调时钟时间，供心跳清理判断
+        self.subscribers: Dict[WebSocket, float] = {}
+        self._rooms: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [dict(summary) for summary in self._rooms.values()]
+
+    def room_created(self, room_id: str, participants: int, status: str, cycle: str) -> None:
+        summary = {"id": room_id, "n": participants, "status": status, "cycle": cycle}
+        self._rooms[room_id] = summary
+        self._push("created", room_id, {"op": "created", **summary})
+
+    def room_removed(self, room_id: str) -> None:
+        if self._rooms.pop(room_id, None) is None:
+            return
+        for op in ("count", "status"):
+            self._pending.pop((op, room_id), None)
+        self._push("removed", room_id, {"op": "removed", "id": room_id})
+
+    def observe(self, room_id: str, participants: int, status: str, cycle: str) -> None:
+        """在房间状态广播时调用，只有人数或计时状态真正变化时才产生增量"""
+        summary = self._rooms.get(room_id)
+        if summary is None:
+            self.room_created(room_id, participants, status, cycle)
+            return
+        if summary["n"] != participants:
+            summary["n"] = participants
+            self._push("count", room_id, {"op": "count", "id": room_id, "n": participants})
+        if summary["status"] != status or summary["cycle"] != cycle:
+            summary["status"] = status
+            summary["cycle"] = cycle
+            self._push("status", room_id, {"op": "status", "id": room_id, "status": status, "cycle": cycle})
+
+    def _push(self, op: str, room_id: str, change: Dict[str, Any]) -> None:
+        key = (op, room_id)
+        # 重新插入以保持变化的先后顺序
+        self._pending.pop(key, None)
+        self._pending[key] = change
+        if not self.subscribers:
+            self._pending.clear()
+            return
+        if self._flush_task is None:
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+            except RuntimeError:
+                self._pending.clear()
+
+    async def _flush(self) -> None:
+        try:
+            await asyncio.sleep(0)
+        finally:
+            changes = list(self._pending.values())
+            self._pending.clear()
+            self._flush_task = None
+        if changes:
+            await self._send_all(json.dumps({"type": "lobby:delta", "changes": changes}, separators=(",", ":")))
+
+    async def _send_all(self, frame: str) -> None:
+        targets = list(self.subscribers)
+
+        async def send(ws: WebSocket) -> Optional[WebSocket]:
+            try:
+                await ws.send_text(frame)
+                return None
+            except Exception:
+                return ws
+
+        for ws in await asyncio.gather(*(send(ws) for ws in targets)):
+            if ws is not None:
+                self.subscribers.pop(ws, None)
+
+    async def subscribe(self, websocket: WebSocket) -> None:
+        """登记订阅者并发送一次完整快照"""
+        self.subscribers[websocket] = time.monotonic()
+        frame = json.dumps({"type": "lobby:snapshot", "rooms": self.snapshot()}, separators=(",", ":"))
+        await websocket.send_text(frame)
+
+    def unsubscribe(self, websocket: WebSocket) -> None:
+        self.subscribers.pop(websocket, None)
+
+    def touch(self, websocket: WebSocket) -> None:
+        """记录订阅者的活跃时间（例如回复了 ping）"""
+        if websocket in self.subscribers:
+            self.subscribers[websocket] = time.monotonic()
@@ -0,0 +1,119 @@
+"""按需采样分析：事件循环线程的调用栈采样和按消息类型统计的处理耗时直方图"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from types import FrameType
+from typing import Any, Dict, List, Optional
+
+# 直方图桶上限（毫秒），最后一个桶收集所有更慢的消息
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+
+class ProfilerBusy(Exception):
+    """已有一次采样在进行中"""
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    # 折叠栈格式以分号分隔各层、以空格分隔计数，名字里不能出现这两个字符
+    name = getattr(code, "co_qualname", code.co_name)
+    label = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label.replace(";", ":").replace(" ", "_")
+
+
+def collapse(frame: Optional[FrameType]) -> str:
+    """把一个调用栈编码为折叠栈的一行（从最外层到最内层，分号分隔）"""
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class StackSampler:
+    """在后台线程中定时读取事件循环线程的调用栈，输出火焰图可用的折叠栈
+
+    采样线程只调用 ``sys._current_frames`` 并遍历栈帧，不在事件循环上注入任何钩子，
+    开销与采样频率成正比，结束后线程退出，不留下常驻成本。同一时刻只允许一次采样。
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.running = False
+        self.profiles = 0
+
+    async def profile(self, seconds: float) -> str:
+        """采样当前事件循环线程 ``seconds`` 秒，返回 ``栈 次数`` 格式的折叠栈文本"""
+        if self.running:
+            raise ProfilerBusy()
+        self.running = True
+        # 请求被取消（例如客户端断开）时通知采样线程立即退出
+        stop = threading.Event()
+        try:
+            target = threading.get_ident()
+            counts: Counter = Counter()
+            await asyncio.to_thread(self._sample, target, seconds, counts, stop)
+            self.profiles += 1
+        finally:
+            stop.set()
+            self.running = False
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+    def _sample(self, target: int, seconds: float, counts: Counter, stop: threading.Event) -> None:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(target)
+            if frame is None:
+                return
+            counts[collapse(frame)] += 1
+            # 及时释放栈帧引用，不延长被采样代码中局部变量的生命周期
+            del frame
+            if stop.wait(self.interval):
+                return
+
+
+class MessageTimings:
+    """按消息类型累计 WebSocket 消息处理的墙钟耗时直方图，只在事件循环内调用"""
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self._totals: Dict[str, List[float]] = {}
+        self._buckets: Dict[str, List[int]] = {}
+
+    def observe(self, message_type: str, seconds: float) -> None:
+        buckets = self._buckets.get(message_type)
+        if buckets is None:
+            buckets = self._buckets[message_type] = [0] * (len(BUCKETS_MS) + 1)
+            self._totals[message_type] = [0.0, 0.0]
+        ms = seconds * 1000
+        buckets[bisect_left(BUCKETS_MS, ms)] += 1
+        totals = self._totals[message_type]
+        totals[0] += ms
+        totals[1] = max(totals[1], ms)
+
+    def reset(self) -> None:
+        self.started = time.time()
+        self._totals.clear()
+        self._buckets.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回每种消息的次数、总耗时、最大耗时和各桶计数，桶以上限毫秒数为键"""
+        labels = [str(bound) for bound in BUCKETS_MS] + ["+Inf"]
+        result: Dict[str, Any] = {}
+        for message_type, buckets in sorted(self._buckets.items()):
+            total_ms, max_ms = self._totals[message_type]
+            result[message_type] = {
+                "count": sum(buckets),
+                "sum_ms": round(total_ms, 3),
+                "max_ms": round(max_ms, 3),
+                "buckets": dict(zip(labels, buckets)),
+            }
+        return result
@@ -0,0 +1,240 @@
+"""LiveKit 集成：webhook 验签与按房间合并应用，以及通过 RoomService 定期对账"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (用户身份, 操作, 媒体类型)；操作为 publish / unpublish / left / finished
+SfuUpdate = Tuple[str, str, Optional[str]]
+
+# livekit.TrackSource 枚举值 -> 媒体类型；屏幕共享的声音不单独展示
+_TRACK_SOURCES = {1: "video", 2: "audio", 3: "screen"}
+# livekit.ParticipantInfo.State.DISCONNECTED
+_PARTICIPANT_DISCONNECTED = 3
+
+
+@lru_cache(maxsize=4)
+def _receiver(api_key: str, api_secret: str) -> Any:
+    """按凭证缓存 WebhookReceiver，避免每个请求都重新构造校验器"""
+    from livekit.api import TokenVerifier, WebhookReceiver
+
+    return WebhookReceiver(TokenVerifier(api_key, api_secret))
+
+
+def parse_webhook(body: str, authorization: str, api_key: str, api_secret: str) -> Optional[Tuple[str, SfuUpdate]]:
+    """验证签名并把 webhook 归一化为 ``(房间 ID, 更新)``；与媒体和在线状态无关的事件返回 None
+
+    签名无效时抛出异常，由调用方转换为 401。
+    """
+    token = authorization[7:] if authorization.startswith("Bearer ") else authorization
+    event = _receiver(api_key, api_secret).receive(body, token)
+    room_id = event.room.name
+    if not room_id:
+        return None
+    identity = event.participant.identity
+    if event.event == "room_finished":
+        return room_id, ("", "finished", None)
+    if event.event == "participant_left" and identity:
+        return room_id, (identity, "left", None)
+    if event.event in ("track_published", "track_unpublished") and identity:
+        media = _TRACK_SOURCES.get(event.track.source)
+        if media is None:
+            return None
+        op = "publish" if event.event == "track_published" else "unpublish"
+        return room_id, (identity, op, media)
+    return None
+
+
+class SfuEventBatcher:
+    """把短时间内到达的 webhook 更新按房间合并，每个房间只调用一次 ``apply``
+
+    LiveKit 对每个事件单独发一次请求；一个参与者断线往往同时带来离开和多条
+    取消发布事件，合并后每个房间只加一次锁、只广播一次状态。
+    """
+
+    def __init__(self, apply: Callable[[str, List[SfuUpdate]], Awaitable[None]], window: float = 0.05) -> None:
+        self.apply = apply
+        self.window = window
+        self._pending: Dict[str, List[SfuUpdate]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def submit(self, room_id: str, update: SfuUpdate) -> None:
+        self._pending.setdefault(room_id, []).append(update)
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        try:
+            if self.window > 0:
+                await asyncio.sleep(self.window)
+        finally:
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """立即应用所有待处理的更新"""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        results = await asyncio.gather(
+            *(self.apply(room_id, updates) for room_id, updates in pending.items()), return_exceptions=True
+        )
+        for room_id, result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.error("应用房间 %s 的 LiveKit 事件出错: %s", room_id, result, exc_info=result)
+
+
+class _RateLimiter:
+    """把请求均匀地间隔开，平均速率不超过 ``rate`` 次/秒；0 表示不限速"""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        wait = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def participant_media(info: Any) -> Dict[str, bool]:
+    """根据 ParticipantInfo 中未静音的轨道推算媒体状态"""
+    media = {"audio": False, "video": False, "screen": False}
+    for track in info.tracks:
+        kind = _TRACK_SOURCES.get(track.source)
+        if kind is not None and not track.muted:
+            media[kind] = True
+    return media
+
+
+# SFU 上某个房间的参与者快照：身份 -> 媒体状态；房间不在 SFU 上或无人时为空
+SfuSnapshot = Dict[str, Dict[str, bool]]
+
+
+class SfuReconciler:
+    """定期向 LiveKit RoomService 查询活跃房间的参与者，修正与 SFU 之间的漂移
+
+    webhook 可能丢失或乱序，因此后台任务按 ``interval`` 全量对账一次：
+    所有请求复用同一个 aiohttp 会话（连接池上限 ``max_connections``），
+    先用 ``ListRooms`` 按每批 ``batch_size`` 个房间名查询哪些房间在 SFU 上有人，
+    只对有人的房间再调用 ``ListParticipants``；全部请求经过同一个限速器，
+    对账再多的房间也不会冲击 LiveKit 服务器。
+    """
+
+    def __init__(
+        self,
+        active_rooms: Callable[[], List[str]],
+        apply: Callable[[str, SfuSnapshot, float], Awaitable[None]],
+        url: str,
+        api_key: str,
+        api_secret: str,
+        interval: float = 30.0,
+        batch_size: int = 100,
+        rate: float = 20.0,
+        max_connections: int = 4,
+    ) -> None:
+        self.active_rooms = active_rooms
+        self.apply = apply
+        self.url = url
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.max_connections = max(1, max_connections)
+        self.requests = 0
+        self._limiter = _RateLimiter(rate)
+        self._session: Any = None
+        self._api: Any = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """创建共享的连接池并启动后台对账任务"""
+        if self._task is not None:
+            return
+        await self.open()
+        self._task = asyncio.create_task(self._loop())
+        logger.info("SFU 对账任务已启动，间隔 %s 秒", self.interval)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.close()
+
+    async def open(self) -> None:
+        if self._api is not None:
+            return
+        import aiohttp
+        from livekit.api import LiveKitAPI
+
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=max(30.0, self.interval * 2))
+        self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10))
+        self._api = LiveKitAPI(self.url, self.api_key, self.api_secret, session=self._session)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+        self._api = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error("SFU 对账出错: %s", e, exc_info=True)
+
+    async def _call(self, method: Callable[[Any], Awaitable[Any]], request: Any) -> Any:
+        await self._limiter.acquire()
+        self.requests += 1
+        return await method(request)
+
+    async def reconcile(self) -> int:
+        """对所有活跃房间执行一轮对账，返回已对账的房间数"""
+        await self.open()
+        room_ids = self.active_rooms()
+        if not room_ids:
+            return 0
+        from livekit.protocol.room import ListParticipantsRequest, ListRoomsRequest
+
+        service = self._api.room
+        # 快照的起点取第一次查询之前：查询期间才加入的参与者可能不在结果里，不能据此移除
+        since = time.time()
+        occupied: Dict[str, int] = {}
+        for i in range(0, len(room_ids), self.batch_size):
+            batch = room_ids[i : i + self.batch_size]
+            response = await self._call(service.list_rooms, ListRoomsRequest(names=batch))
+            for info in response.rooms:
+                occupied[info.name] = info.num_participants
+
+        # 并发数与连接池一致，请求速率仍由限速器决定
+        semaphore = asyncio.Semaphore(self.max_connections)
+
+        async def reconcile_room(room_id: str) -> None:
+            snapshot: SfuSnapshot = {}
+            if occupied.get(room_id):
+                async with semaphore:
+                    response = await self._call(service.list_participants, ListParticipantsRequest(room=room_id))
+                for info in response.participants:
+                    if info.state != _PARTICIPANT_DISCONNECTED and info.identity:
+                        snapshot[info.identity] = participant_media(info)
+            await self.apply(room_id, snapshot, since)
+
+        results = await asyncio.gather(*(reconcile_room(room_id) for room_id in room_ids), return_exceptions=True)
+        for room_id, result in zip(room_ids, results):
+            if isinstance(result, Exception):
+                logger.warning("对账房间 %s 失败: %s", room_id, result)
+        return len(room_ids)
@@ -1,9 +1,58 @@
 """Pytest configuration and fixtures."""
 
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
 import pytest
+from fastapi import WebSocket
 from fastapi.testclient import TestClient
 
-from app import app, manager
+from app import Room, app, lobby, manager
+
+
+async def _no_receive() -> Any:
+    raise RuntimeError("FakeWebSocket does not receive")
+
+
+async def _no_send(message: Any) -> None:
+    raise RuntimeError("FakeWebSocket does not send raw ASGI messages")
+
+
+class FakeWebSocket(WebSocket):
+    """Minimal stand-in for a Starlette WebSocket that records what the server sends."""
+
+    def __init__(self) -> None:
+        super().__init__({"type": "websocket"}, _no_receive, _no_send)
+        self.sent: List[Any] = []
+        self.closed = False
+
+    async def accept(
+        self, subprotocol: Optional[str] = None, headers: Optional[Iterable[Tuple[bytes, bytes]]] = None
+    ) -> None:
+        pass
+
+    async def send_json(self, data: Any, mode: str = "text") -> None:
+        self.sent.append(data)
+
+    async def send_text(self, data: str) -> None:
+        self.sent.append(json.loads(data))
+
+    async def close(self, code: int = 1000, reason: Optional[str] = None) -> None:
+        self.closed = True
+
+
+async def join(room: Room, name: str) -> FakeWebSocket:
+    """Attach a fresh connection for ``name`` the way a join message does and return it."""
+    websocket = FakeWebSocket()
+    await room.attach(websocket, name)
+    return websocket
+
+
+async def ghost(room: Room, name: str) -> None:
+    """Join ``name`` and then lose track of its connection, leaving a participant without a socket."""
+    websocket = await join(room, name)
+    del room.client_users[websocket]
+    del room.user_connections[name]
 
 
 @pytest.fixture
@@ -19,3 +68,6 @@ async def cleanup_rooms():
     # Clear all rooms after each test
     async with manager.lock:
         manager.rooms.clear()
+        manager._vacant.clear()
+        manager.cold.clear()
+    lobby._rooms.clear()
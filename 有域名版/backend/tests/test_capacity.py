@@ -0,0 +1,121 @@
+"""Tests for room creation, capacity and LRU eviction of vacant rooms."""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import RoomConfig, manager
+from config import settings
+from tests.conftest import FakeWebSocket, join
+
+
+@pytest.mark.asyncio
+async def test_lru_vacant_room_is_evicted(monkeypatch):
+    """Test that the least recently used room without participants makes space."""
+    monkeypatch.setattr(settings, "max_rooms", 3)
+    busy = await manager.upsert(RoomConfig(room_id="busy"))
+    await join(busy, "alice")
+    await manager.upsert(RoomConfig(room_id="oldest"))
+    await manager.upsert(RoomConfig(room_id="recent"))
+    await manager.get("oldest")  # now more recently used than "recent"
+
+    await manager.upsert(RoomConfig(room_id="newroom"))
+
+    assert set(manager.rooms) == {"busy", "oldest", "newroom"}
+
+
+@pytest.mark.asyncio
+async def test_room_emptied_becomes_evictable(monkeypatch):
+    """Test that a room becomes evictable once its last participant leaves."""
+    monkeypatch.setattr(settings, "max_rooms", 1)
+    room = await manager.upsert(RoomConfig(room_id="solo"))
+    alice = await join(room, "alice")
+    with pytest.raises(HTTPException) as excinfo:
+        await manager.upsert(RoomConfig(room_id="second"))
+    assert excinfo.value.status_code == 429
+
+    await room.detach(alice)
+    await manager.upsert(RoomConfig(room_id="second"))
+    assert list(manager.rooms) == ["second"]
+
+
+def test_create_rejected_when_all_rooms_occupied(client: TestClient, monkeypatch):
+    """Test that creating a room fails with 429 only when nothing can be evicted."""
+    monkeypatch.setattr(settings, "max_rooms", 1)
+    with client.websocket_connect("/ws/rooms/occupied") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"type": "join", "user": "alice"})
+        websocket.receive_json()
+        websocket.receive_json()
+        assert client.post("/rooms", json={"room_id": "another"}).status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_connects_build_room_once():
+    """Test that concurrent get_or_create calls for a new room share one instance."""
+    rooms = await asyncio.gather(*(manager.get_or_create("together") for _ in range(50)))
+    assert len({id(room) for room in rooms}) == 1
+    assert list(manager.rooms) == ["together"]
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_keeps_existing_config():
+    """Test that a first connect does not reset a room created with a goal."""
+    await manager.upsert(RoomConfig(room_id="configured", goal="Thesis", timer_length=3000))
+    room = await manager.get_or_create("configured")
+    assert (room.goal, room.timer_length) == ("Thesis", 3000)
+
+
+@pytest.mark.asyncio
+async def test_create_does_not_wait_for_manager_lock():
+    """Test that creates and updates are not serialized behind the global manager lock."""
+    async with manager.lock:
+        room = await asyncio.wait_for(manager.upsert(RoomConfig(room_id="unlocked")), timeout=1)
+        await asyncio.wait_for(manager.upsert(RoomConfig(room_id="unlocked", goal="Update")), timeout=1)
+    assert room.goal == "Update"
+
+
+@pytest.mark.asyncio
+async def test_mixed_case_path_finds_the_created_room():
+    """Test that a room created as myroom is the one a /ws/rooms/MyRoom connect joins."""
+    created = await manager.upsert(RoomConfig(room_id="MyRoom", goal="Thesis"))
+    room = await manager.get_or_create("MyRoom")
+
+    assert room is created
+    assert list(manager.rooms) == ["myroom"]
+    assert await manager.get("MYROOM") is room
+
+    alice = await join(room, "alice")
+    assert "myroom" not in manager._vacant
+    await room.detach(alice)
+    assert "myroom" in manager._vacant
+
+
+@pytest.mark.asyncio
+async def test_rooms_with_attachments_are_not_evicted(monkeypatch):
+    """Test that vacant rooms with a socket, a spectator or a running timer are never evicted."""
+    monkeypatch.setattr(settings, "max_rooms", 3)
+    socket_room = await manager.upsert(RoomConfig(room_id="socketroom"))
+    ws = FakeWebSocket()
+    await socket_room.connect(ws)
+    spectated = await manager.upsert(RoomConfig(room_id="spectated"))
+    queue: asyncio.Queue = asyncio.Queue()
+    spectated.add_spectator(queue)
+    running = await manager.upsert(RoomConfig(room_id="running"))
+    await running.start_focus(user="alice")
+
+    # 有连接、旁观者或计时器的房间根本不在淘汰索引里，淘汰不需要逐个跳过
+    assert list(manager._vacant) == []
+    with pytest.raises(HTTPException) as excinfo:
+        await manager.upsert(RoomConfig(room_id="newroom"))
+    assert excinfo.value.status_code == 429
+    assert set(manager.rooms) == {"socketroom", "spectated", "running"}
+
+    await running.pause(user="alice")
+    await socket_room.disconnect(ws)
+    spectated.remove_spectator(queue)
+    assert list(manager._vacant) == ["running", "socketroom", "spectated"]
+    await manager.upsert(RoomConfig(room_id="newroom"))
+    assert set(manager.rooms) == {"socketroom", "spectated", "newroom"}
@@ -0,0 +1,157 @@
+"""Tests for drain mode and room state handoff."""
+
+import asyncio
+import json
+import signal
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import RoomConfig, manager
+from config import settings
+from tests.conftest import FakeWebSocket
+
+
+@pytest.fixture
+def handoff_file(tmp_path, monkeypatch):
+    path = tmp_path / "handoff.json"
+    monkeypatch.setattr(settings, "handoff_file", str(path))
+    monkeypatch.setattr(settings, "drain_reconnect_spread", 5.0)
+    monkeypatch.setattr(manager, "draining", False)
+    return path
+
+
+@pytest.mark.asyncio
+async def test_drain_notifies_clients_and_writes_handoff(handoff_file):
+    """Test that draining notifies clients with a reconnect delay and saves state."""
+    room = await manager.upsert(RoomConfig(room_id="drainme", goal="Read"))
+    ws = FakeWebSocket()
+    await room.connect(ws)
+    await room.start_focus(user="alice")
+
+    assert await manager.drain(str(handoff_file)) == 1
+
+    notice = ws.sent[-1]
+    assert notice["type"] == "server:draining"
+    assert 0 <= notice["reconnect_after"] <= 5.0
+    assert ws.closed
+    assert room.timer_task is None
+
+    records = json.loads(handoff_file.read_text())
+    assert records[0]["room_id"] == "drainme"
+    assert records[0]["status"] == "running"
+
+
+@pytest.mark.asyncio
+async def test_drain_detaches_participants_and_keeps_their_focus(handoff_file):
+    """Test that drained rooms stop listing participants and hand off their focus so far."""
+    room = await manager.upsert(RoomConfig(room_id="drainusers"))
+    ws = FakeWebSocket()
+    await room.connect(ws)
+    await room.attach(ws, "alice")
+    await room.start_focus(user="alice")
+    room.remaining -= 300
+
+    await manager.drain(str(handoff_file))
+
+    assert room.participants == {}
+    assert room.user_connections == {}
+    assert manager.list_states()[0]["participants"] == []
+    assert app_module.lobby._rooms["drainusers"]["n"] == 0
+    record = json.loads(handoff_file.read_text())[0]
+    assert record["focus_credits"] == {"alice": 300}
+
+
+@pytest.mark.asyncio
+async def test_sigterm_drains_before_the_server_handler(handoff_file):
+    """Test that SIGTERM notifies clients with server:draining before the server starts closing sockets."""
+    room = await manager.upsert(RoomConfig(room_id="sigterm"))
+    ws = FakeWebSocket()
+    await room.connect(ws)
+    calls = []
+    original = signal.signal(signal.SIGTERM, lambda sig, frame: calls.append((sig, ws.closed)))
+    try:
+        app_module._install_sigterm_drain()
+        handler = signal.getsignal(signal.SIGTERM)
+        assert callable(handler)
+        handler(signal.SIGTERM, None)
+        while not calls:
+            await asyncio.sleep(0.01)
+    finally:
+        signal.signal(signal.SIGTERM, original)
+
+    assert calls == [(signal.SIGTERM, True)]
+    assert ws.sent[-1]["type"] == "server:draining"
+    assert handoff_file.exists()
+
+
+@pytest.mark.asyncio
+async def test_draining_rejects_new_rooms(client: TestClient, handoff_file):
+    """Test that new rooms are refused while draining."""
+    manager.draining = True
+    response = client.post("/rooms", json={"room_id": "newroom"})
+    assert response.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_load_handoff_restores_rooms(handoff_file):
+    """Test that a handoff file is loaded once and running timers resume."""
+    handoff_file.write_text(
+        json.dumps(
+            [
+                {
+                    "room_id": "restored",
+                    "goal": "Math",
+                    "timer_length": 1500,
+                    "break_length": 300,
+                    "status": "running",
+                    "cycle": "focus",
+                    "remaining": 1000,
+                    "focus_mark": 1500,
+                    "updated_at": 0,
+                    "saved_at": time.time() - 10,
+                }
+            ]
+        )
+    )
+
+    assert await manager.load_handoff(str(handoff_file)) == 1
+    assert not handoff_file.exists()
+
+    room = await manager.get("restored")
+    assert room.goal == "Math"
+    assert 985 <= room.remaining <= 990
+    assert room.timer_task is not None
+    room.timer_task.cancel()
+
+
+def test_admin_drain_requires_token(client: TestClient, handoff_file, monkeypatch):
+    """Test that the drain endpoint is disabled without a matching admin token."""
+    monkeypatch.setattr(settings, "admin_token", "")
+    assert client.post("/admin/drain").status_code == 403
+
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    assert client.post("/admin/drain", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    response = client.post("/admin/drain", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["draining"] is True
+
+
+@pytest.mark.parametrize(
+    "method, path",
+    [
+        ("post", "/admin/drain"),
+        ("get", "/admin/load"),
+        ("get", "/admin/profile"),
+        ("get", "/admin/message-timings"),
+        ("get", "/admin/traces"),
+    ],
+)
+def test_admin_endpoints_share_the_token_check(client: TestClient, handoff_file, monkeypatch, method, path):
+    """Test that every admin endpoint rejects a missing or wrong token before doing any work."""
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    assert getattr(client, method)(path).status_code == 403
+    assert getattr(client, method)(path, headers={"X-Admin-Token": "secret2"}).status_code == 403
+    assert manager.draining is False
@@ -0,0 +1,99 @@
+"""Tests for ETag / If-None-Match on the room state endpoints."""
+
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import RoomConfig, manager
+from config import settings
+from tests.conftest import join
+
+
+def test_room_etag_round_trip(client: TestClient):
+    """Test that a matching If-None-Match gets 304 and a change gets a new ETag."""
+    client.post("/rooms", json={"room_id": "etagged", "goal": "Read"})
+    first = client.get("/rooms/etagged")
+    etag = first.headers["etag"]
+    assert etag.startswith('"')
+
+    cached = client.get("/rooms/etagged", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert client.get("/rooms/etagged", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+
+    client.post("/rooms", json={"room_id": "etagged", "goal": "Write"})
+    changed = client.get("/rooms/etagged", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["goal"] == "Write"
+    assert changed.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_participants_and_media_change_version():
+    """Test that participant and media changes produce a new version."""
+    room = await manager.upsert(RoomConfig(room_id="versions"))
+    versions = [room.version]
+    await join(room, "alice")
+    versions.append(room.version)
+    await room.update_media_state("alice", {"audio": True})
+    versions.append(room.version)
+    await room.update_media_state("alice", {"audio": True})
+    assert room.version == versions[-1]
+    await room.start_focus(user="alice")
+    versions.append(room.version)
+    assert room.timer_task is not None
+    room.timer_task.cancel()
+    assert versions == sorted(set(versions))
+
+
+@pytest.mark.asyncio
+async def test_not_modified_does_not_take_room_lock():
+    """Test that a 304 is answered while the room lock is held elsewhere."""
+    room = await manager.upsert(RoomConfig(room_id="lockfree"))
+    async with room.lock:
+        result = await asyncio.wait_for(app_module.get_room("lockfree", if_none_match=room.etag), timeout=1)
+    assert result.status_code == 304
+
+
+def test_list_etag_tracks_room_set_and_state(client: TestClient):
+    """Test the aggregate list ETag across reads, creates and updates."""
+    client.post("/rooms", json={"room_id": "listed1"})
+    etag = client.get("/rooms").headers["etag"]
+    client.get("/rooms/listed1")
+    assert client.get("/rooms", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/rooms", json={"room_id": "listed2"})
+    response = client.get("/rooms", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [room["room_id"] for room in response.json()] == ["listed1", "listed2"]
+
+
+@pytest.mark.asyncio
+async def test_cold_room_keeps_etag_and_is_read_without_thawing(monkeypatch):
+    """Test that a cold room keeps its ETag and is served from its record even at capacity."""
+    monkeypatch.setattr(settings, "cold_room_after", 0)
+    room = await manager.upsert(RoomConfig(room_id="coldpoll", goal="Poll"))
+    etag = room.etag
+    room.updated_at = time.time() - 1
+    await manager.demote_dormant_rooms()
+    assert "coldpoll" in manager.cold
+
+    monkeypatch.setattr(settings, "max_rooms", 1)
+    await join(await manager.upsert(RoomConfig(room_id="coldbusy")), "alice")
+
+    cached = await app_module.get_room("coldpoll", if_none_match=etag)
+    assert cached.status_code == 304
+    response = await app_module.get_room("coldpoll", if_none_match=None)
+    assert response.status_code == 200
+    assert response.headers["etag"] == etag
+    assert json.loads(response.body)["goal"] == "Poll"
+    assert "coldpoll" in manager.cold and "coldpoll" not in manager.rooms
+
+    monkeypatch.setattr(settings, "max_rooms", 10)
+    thawed = await manager.get("coldpoll")
+    assert thawed.etag == etag
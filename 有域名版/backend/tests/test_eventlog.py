@@ -0,0 +1,149 @@
+"""Tests for the append-only study event log."""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+import eventlog
+from app import Room, RoomConfig
+from eventlog import EventLog, SegmentSummary
+from tests.conftest import join
+
+
+def _today():
+    return datetime.now(timezone.utc).date()
+
+
+@pytest.fixture(autouse=True)
+def midday(monkeypatch):
+    """Record events at noon UTC so focus segments never straddle midnight."""
+    today = _today()
+    noon = datetime(today.year, today.month, today.day, 12, tzinfo=timezone.utc).timestamp()
+    monkeypatch.setattr(eventlog, "time", SimpleNamespace(time=lambda: noon))
+
+
+@pytest.mark.asyncio
+async def test_event_log_aggregates_focus(tmp_path):
+    """Test that focus seconds are summed per room and per participant."""
+    log = EventLog(str(tmp_path), flush_interval=60)
+    await log.start()
+    log.record("room1", "timer:start_focus", "alice")
+    log.record("room1", "timer:pause", "alice", focus=600, participants=["alice", "bob"])
+    log.record("room1", "timer:break_auto", focus=900, participants=["alice"])
+    log.record("room2", "timer:break_auto", focus=300, participants=["bob"])
+    await log.stop()
+
+    today = _today()
+    assert log.focus_seconds("rooms", "room1", today, today) == {today.isoformat(): 1500}
+    assert log.focus_seconds("users", "alice", today, today) == {today.isoformat(): 1500}
+    assert log.focus_seconds("users", "bob", today, today) == {today.isoformat(): 900}
+    assert log.focus_seconds("users", "carol", today, today) == {}
+
+
+@pytest.mark.asyncio
+async def test_user_focus_uses_per_user_credits(tmp_path):
+    """Test that per-user credits replace the whole segment when present."""
+    log = EventLog(str(tmp_path), flush_interval=60)
+    await log.start()
+    log.record("room1", "timer:pause", "alice", focus=600, credits={"alice": 600, "bob": 120})
+    await log.stop()
+
+    today = _today()
+    assert log.focus_seconds("rooms", "room1", today, today) == {today.isoformat(): 600}
+    assert log.focus_seconds("users", "bob", today, today) == {today.isoformat(): 120}
+
+
+def test_focus_across_midnight_is_split_by_day():
+    """Test that a segment ending after midnight credits each UTC day with its own part."""
+    midnight = datetime(2030, 1, 2, tzinfo=timezone.utc).timestamp()
+    summary = SegmentSummary()
+    summary.add({"ts": midnight + 600, "room": "room1", "focus": 1500, "credits": {"alice": 1500, "bob": 300}})
+
+    assert summary.rooms["room1"] == {"2030-01-01": 900, "2030-01-02": 600}
+    assert summary.users["alice"] == {"2030-01-01": 900, "2030-01-02": 600}
+    assert summary.users["bob"] == {"2030-01-02": 300}
+
+
+@pytest.mark.asyncio
+async def test_focus_segment_credits_each_user_for_time_present():
+    """Test that late joiners and early leavers are credited only for their own part of a segment."""
+    room = Room(RoomConfig(room_id="credits", timer_length=3000))
+    alice = await join(room, "alice")
+    await room.start_focus(user="alice")
+    assert room.timer_task is not None
+    room.timer_task.cancel()
+
+    room.remaining -= 600
+    await join(room, "bob")
+    room.remaining -= 300
+    await room.detach(alice)
+    room.remaining -= 100
+    await join(room, "carol")
+    room.remaining -= 200
+
+    async with room.lock:
+        focus = room._close_focus()
+    assert focus == {"focus": 1200, "credits": {"alice": 900, "bob": 600, "carol": 200}}
+    assert room.focus_credits is None
+    assert all(participant.focus_from is None for participant in room.participants.values())
+
+
+@pytest.mark.asyncio
+async def test_event_log_rotates_and_reloads(tmp_path):
+    """Test segment rotation, retention and reloading summaries from disk."""
+    log = EventLog(str(tmp_path), segment_bytes=200, max_segments=100, flush_interval=60, batch_size=1)
+    await log.start()
+    for _ in range(10):
+        log.record("room1", "timer:break_auto", focus=60, participants=["alice"])
+        await log.flush()
+    await log.stop()
+
+    assert len(list(tmp_path.glob("*.log"))) > 1
+    assert list(tmp_path.glob("*.sum.json"))
+
+    reloaded = EventLog(str(tmp_path), flush_interval=60)
+    await reloaded.start()
+    await reloaded.stop()
+    today = _today()
+    assert reloaded.focus_seconds("rooms", "room1", today, today) == {today.isoformat(): 600}
+
+    pruned = EventLog(str(tmp_path), segment_bytes=200, max_segments=2, flush_interval=60)
+    await pruned.start()
+    pruned.record("room1", "timer:break_auto", focus=60, participants=["alice"])
+    await pruned.stop()
+    assert len(list(tmp_path.glob("*.log"))) <= 2
+
+
+def test_record_is_noop_when_stopped(tmp_path):
+    """Test that recording without a running writer does not buffer events."""
+    log = EventLog(str(tmp_path))
+    log.record("room1", "user:join", "alice")
+    assert log._pending == []
+
+
+@pytest.mark.asyncio
+async def test_focus_stats_endpoints(client: TestClient, tmp_path, monkeypatch):
+    """Test the per-room and per-user focus statistics endpoints."""
+    log = EventLog(str(tmp_path), flush_interval=60)
+    monkeypatch.setattr(app_module, "event_log", log)
+    await log.start()
+    log.record("statsroom", "timer:break_auto", focus=1500, participants=["alice"])
+    await log.flush()
+
+    response = client.get("/stats/rooms/StatsRoom/focus")
+    assert response.status_code == 200
+    assert response.json()["room_id"] == "statsroom"
+    assert response.json()["focus_minutes"] == 25.0
+
+    assert client.get("/stats/rooms/bad%20id!/focus").status_code == 422
+
+    response = client.get("/stats/users/alice/focus", params={"start": _today().isoformat()})
+    assert response.status_code == 200
+    assert response.json()["days"] == {_today().isoformat(): 25.0}
+
+    response = client.get("/stats/users/alice/focus", params={"start": "2030-01-02", "end": "2030-01-01"})
+    assert response.status_code == 422
+    await log.stop()
@@ -0,0 +1,35 @@
+"""Tests for batched broadcast fanout."""
+
+import pytest
+
+from app import Room, RoomConfig
+from config import settings
+from tests.conftest import FakeWebSocket
+
+
+class BrokenWebSocket(FakeWebSocket):
+    broken = False
+
+    async def send_text(self, data: str) -> None:
+        if self.broken:
+            raise RuntimeError("WebSocket is not connected")
+        await super().send_text(data)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_in_batches_removes_dead_clients(monkeypatch):
+    """Test that every live client gets the frame and dead ones are removed together."""
+    monkeypatch.setattr(settings, "fanout_batch_size", 3)
+    room = Room(RoomConfig(room_id="bigroom"))
+    live = [FakeWebSocket() for _ in range(8)]
+    dead = [BrokenWebSocket() for _ in range(3)]
+    for ws in live + dead:
+        await room.connect(ws)
+        ws.sent.clear()
+    for ws in dead:
+        ws.broken = True
+
+    await room.broadcast({"type": "chat", "user": "alice", "text": "hi"})
+
+    assert all(ws.sent == [{"type": "chat", "user": "alice", "text": "hi", "seq": room.seq}] for ws in live)
+    assert set(room.clients) == set(live)
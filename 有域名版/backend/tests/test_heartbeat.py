@@ -0,0 +1,105 @@
+"""Tests for the server-side heartbeat sweeper."""
+
+import asyncio
+import time
+from typing import Optional
+
+import pytest
+
+import app as app_module
+from app import RoomConfig, manager
+from config import settings
+from tests.conftest import FakeWebSocket
+
+
+@pytest.mark.asyncio
+async def test_sweep_pings_quiet_and_evicts_stale(monkeypatch):
+    """Test that quiet connections are pinged and stale ones evicted."""
+    monkeypatch.setattr(settings, "heartbeat_interval", 10)
+    monkeypatch.setattr(settings, "heartbeat_timeout", 30)
+    room = await manager.upsert(RoomConfig(room_id="heartbeat"))
+
+    fresh, quiet, stale = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    for ws in (fresh, quiet, stale):
+        await room.connect(ws)
+    await room.attach(stale, "sleepy")
+
+    now = time.monotonic()
+    room.clients[quiet] = now - 15
+    room.clients[stale] = now - 45
+
+    await manager.sweep_connections()
+
+    assert stale.closed
+    assert stale not in room.clients
+    assert "sleepy" not in room.participants
+    assert any(msg["type"] == "ping" for msg in quiet.sent)
+    assert not any(msg["type"] == "ping" for msg in fresh.sent)
+
+
+@pytest.mark.asyncio
+async def test_touch_refreshes_last_seen():
+    """Test that activity on a connection postpones its eviction."""
+    room = await manager.upsert(RoomConfig(room_id="hbtouch"))
+    ws = FakeWebSocket()
+    await room.connect(ws)
+    room.clients[ws] = 0.0
+    room.touch(ws)
+    assert room.clients[ws] > 0.0
+
+
+class HangingWebSocket(FakeWebSocket):
+    """Half-open connection whose close never completes."""
+
+    async def close(self, code: int = 1000, reason: Optional[str] = None) -> None:
+        await asyncio.Event().wait()
+
+
+@pytest.mark.asyncio
+async def test_sweep_closes_concurrently_and_broadcasts_once(monkeypatch):
+    """Test that stale sockets are closed in parallel and announced like a normal leave with one state broadcast."""
+    monkeypatch.setattr(settings, "heartbeat_timeout", 30)
+    monkeypatch.setattr(app_module, "EVICT_CLOSE_TIMEOUT", 0.2)
+    room = await manager.upsert(RoomConfig(room_id="stalesweep"))
+    watcher = FakeWebSocket()
+    await room.connect(watcher)
+    stale = [HangingWebSocket() for _ in range(5)]
+    for i, ws in enumerate(stale):
+        await room.connect(ws)
+        await room.attach(ws, f"user{i}")
+        room.clients[ws] = time.monotonic() - 45
+    watcher.sent.clear()
+
+    started = time.perf_counter()
+    await manager.sweep_connections()
+
+    assert time.perf_counter() - started < 1
+    assert room.participants == {}
+    assert list(room.clients) == [watcher]
+    assert [msg["type"] for msg in watcher.sent] == ["event"] * 5 + ["state"]
+    assert sorted(msg["user"] for msg in watcher.sent[:5]) == [f"user{i}" for i in range(5)]
+    assert {msg["event"] for msg in watcher.sent[:5]} == {"user:leave"}
+
+
+@pytest.mark.asyncio
+async def test_sweep_covers_lobby_subscribers(monkeypatch):
+    """Test that quiet lobby sockets are pinged and silent ones dropped from the feed."""
+    monkeypatch.setattr(settings, "heartbeat_interval", 10)
+    monkeypatch.setattr(settings, "heartbeat_timeout", 30)
+    quiet, stale = FakeWebSocket(), FakeWebSocket()
+    for ws in (quiet, stale):
+        await app_module.lobby.subscribe(ws)
+    now = time.monotonic()
+    app_module.lobby.subscribers[quiet] = now - 15
+    app_module.lobby.subscribers[stale] = now - 45
+
+    try:
+        await manager.sweep_connections()
+
+        assert stale.closed
+        assert stale not in app_module.lobby.subscribers
+        assert quiet.sent[-1]["type"] == "ping"
+        app_module.lobby.touch(quiet)
+        assert app_module.lobby.subscribers[quiet] > now
+    finally:
+        app_module.lobby.unsubscribe(quiet)
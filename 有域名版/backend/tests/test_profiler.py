@@ -0,0 +1,108 @@
+"""Tests for the on-demand stack sampler and the per-message timing histogram."""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from config import settings
+from profiler import MessageTimings
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+async def admin_client(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    transport = httpx.ASGITransport(app=app_module.app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        busy = time.perf_counter() + 0.02
+        while time.perf_counter() < busy:
+            pass
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_profile_requires_admin_token(admin_client):
+    """Test that the profiler is unavailable without the admin token."""
+    response = await admin_client.get("/admin/profile", params={"seconds": 0.01})
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_profile_returns_collapsed_stacks_of_the_event_loop(admin_client):
+    """Test that busy coroutines on the event loop show up as collapsed stacks with counts."""
+    spinner = asyncio.create_task(_spin(0.5))
+    response = await admin_client.get("/admin/profile", params={"seconds": 0.3}, headers=ADMIN)
+    await spinner
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert " " not in stack
+    assert any("_spin" in line for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_only_one_profile_at_a_time(admin_client, monkeypatch):
+    """Test that a second profile request is refused while one is running."""
+    monkeypatch.setattr(app_module.profiler, "running", True)
+    response = await admin_client.get("/admin/profile", params={"seconds": 0.01}, headers=ADMIN)
+    assert response.status_code == 409
+
+
+def test_message_timings_buckets():
+    """Test that observations land in the right bucket and totals are kept per type."""
+    timings = MessageTimings()
+    timings.observe("chat", 0.0003)
+    timings.observe("chat", 0.004)
+    timings.observe("join", 2.0)
+
+    snapshot = timings.snapshot()
+    assert snapshot["chat"]["count"] == 2
+    assert snapshot["chat"]["buckets"]["0.5"] == 1
+    assert snapshot["chat"]["buckets"]["5"] == 1
+    assert snapshot["chat"]["max_ms"] == 4.0
+    assert snapshot["join"]["buckets"]["+Inf"] == 1
+
+    timings.reset()
+    assert timings.snapshot() == {}
+
+
+def test_room_socket_records_message_timings(client: TestClient, monkeypatch):
+    """Test that enabled message timing records each handled type and pools unknown ones."""
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    monkeypatch.setattr(settings, "message_timing", True)
+    app_module.message_timings.reset()
+    with client.websocket_connect("/ws/rooms/timings") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"type": "join", "user": "alice"})
+        websocket.receive_json()
+        websocket.receive_json()
+        websocket.send_json({"type": "made-up-1"})
+        websocket.send_json({"type": "made-up-2"})
+        websocket.send_json({"type": "chat", "user": "alice", "text": "hi"})
+        websocket.receive_json()
+
+    response = client.get("/admin/message-timings", params={"reset": True}, headers=ADMIN)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["enabled"] is True
+    assert body["types"]["join"]["count"] == 1
+    assert body["types"]["chat"]["count"] == 1
+    assert body["types"]["other"]["count"] == 2
+    assert sorted(body["types"]) == ["chat", "join", "other"]
+    assert app_module.message_timings.snapshot() == {}
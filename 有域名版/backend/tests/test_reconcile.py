@@ -0,0 +1,188 @@
+"""Tests for periodic SFU reconciliation against a local fake LiveKit RoomService."""
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from livekit.api import TokenVerifier
+from livekit.protocol import models
+from livekit.protocol.room import (
+    ListParticipantsRequest,
+    ListParticipantsResponse,
+    ListRoomsRequest,
+    ListRoomsResponse,
+)
+
+import app as app_module
+from app import RoomConfig, manager
+from sfu import SfuReconciler
+from tests.conftest import FakeWebSocket, ghost
+
+API_KEY = "APIreconciletest"
+API_SECRET = "reconcile-test-secret-with-enough-length"
+
+
+class FakeLiveKit:
+    """Minimal Twirp RoomService: ListRooms and ListParticipants over protobuf."""
+
+    def __init__(self):
+        # room name -> identity -> list of (TrackSource, muted)
+        self.rooms = {}
+        self.url = ""
+        self.calls = []
+        # awaited while a ListRooms request is being served
+        self.during_list_rooms = None
+        self.verifier = TokenVerifier(API_KEY, API_SECRET)
+
+    def app(self):
+        application = web.Application()
+        application.router.add_post("/twirp/livekit.RoomService/ListRooms", self.list_rooms)
+        application.router.add_post("/twirp/livekit.RoomService/ListParticipants", self.list_participants)
+        return application
+
+    def _authorize(self, request):
+        self.verifier.verify(request.headers["Authorization"][len("Bearer ") :])
+
+    async def list_rooms(self, request):
+        self._authorize(request)
+        body = ListRoomsRequest.FromString(await request.read())
+        self.calls.append(("ListRooms", list(body.names)))
+        if self.during_list_rooms is not None:
+            await self.during_list_rooms()
+        rooms = [
+            models.Room(name=name, num_participants=len(self.rooms[name])) for name in body.names if name in self.rooms
+        ]
+        return web.Response(
+            body=ListRoomsResponse(rooms=rooms).SerializeToString(), content_type="application/protobuf"
+        )
+
+    async def list_participants(self, request):
+        self._authorize(request)
+        body = ListParticipantsRequest.FromString(await request.read())
+        self.calls.append(("ListParticipants", body.room))
+        participants = [
+            models.ParticipantInfo(
+                identity=identity,
+                state=models.ParticipantInfo.State.ACTIVE,
+                tracks=[models.TrackInfo(source=source, muted=muted) for source, muted in tracks],
+            )
+            for identity, tracks in self.rooms.get(body.room, {}).items()
+        ]
+        response = ListParticipantsResponse(participants=participants)
+        return web.Response(body=response.SerializeToString(), content_type="application/protobuf")
+
+
+@pytest.fixture
+async def fake_livekit():
+    fake = FakeLiveKit()
+    server = TestServer(fake.app())
+    await server.start_server()
+    fake.url = str(server.make_url("/"))
+    yield fake
+    await server.close()
+
+
+def _reconciler(fake, **kwargs):
+    options = {"batch_size": 2, "rate": 0}
+    options.update(kwargs)
+    return SfuReconciler(
+        app_module._rooms_to_reconcile,
+        app_module._reconcile_room,
+        url=fake.url,
+        api_key=API_KEY,
+        api_secret=API_SECRET,
+        **options,
+    )
+
+
+async def _room_with(room_id, *names, since_joined=60):
+    room = await manager.upsert(RoomConfig(room_id=room_id))
+    for name in names:
+        await ghost(room, name)
+        room.participants[name].joined_at -= since_joined
+    return room
+
+
+@pytest.mark.asyncio
+async def test_reconcile_fixes_media_and_removes_ghosts(fake_livekit):
+    """Test that SFU truth overrides media flags and ghosts without sockets are removed."""
+    room = await _room_with("drift", "alice", "bob", "ghost")
+    ws = FakeWebSocket()
+    await room.connect(ws)
+    await room.attach(ws, "bob")
+    room.participants["bob"].joined_at -= 60
+    await room.update_media_state("bob", {"video": True})
+    await room.update_media_state("ghost", {"audio": True})
+    fake_livekit.rooms["drift"] = {
+        "alice": [(models.TrackSource.CAMERA, False), (models.TrackSource.MICROPHONE, True)],
+    }
+    ws.sent.clear()
+
+    reconciler = _reconciler(fake_livekit)
+    try:
+        assert await reconciler.reconcile() == 1
+    finally:
+        await reconciler.close()
+
+    assert room.media_states == {
+        "alice": {"audio": False, "video": True, "screen": False},
+        "bob": {"audio": False, "video": False, "screen": False},
+    }
+    assert len([m for m in ws.sent if m["type"] == "state"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_reconcile_batches_list_rooms_and_skips_empty_rooms(fake_livekit):
+    """Test that ListRooms is batched and ListParticipants is only called for occupied SFU rooms."""
+    for room_id in ("room1", "room2", "room3"):
+        await _room_with(room_id, "alice")
+    await manager.upsert(RoomConfig(room_id="empty"))
+    fake_livekit.rooms["room2"] = {"alice": [(models.TrackSource.SCREEN_SHARE, False)]}
+
+    reconciler = _reconciler(fake_livekit)
+    try:
+        await reconciler.reconcile()
+    finally:
+        await reconciler.close()
+
+    list_rooms = [names for method, names in fake_livekit.calls if method == "ListRooms"]
+    assert sorted(name for names in list_rooms for name in names) == ["room1", "room2", "room3"]
+    assert all(len(names) <= 2 for names in list_rooms)
+    assert [room for method, room in fake_livekit.calls if method == "ListParticipants"] == ["room2"]
+    assert reconciler.requests == len(fake_livekit.calls)
+    assert manager.rooms["room2"].media_states["alice"]["screen"] is True
+    assert "alice" not in manager.rooms["room1"].participants
+
+
+@pytest.mark.asyncio
+async def test_reconcile_skips_participants_newer_than_snapshot(fake_livekit):
+    """Test that a participant who joined after the SFU query started is left alone."""
+    room = await _room_with("fresh", "alice", since_joined=-60)
+    await room.update_media_state("alice", {"audio": True})
+
+    reconciler = _reconciler(fake_livekit)
+    try:
+        await reconciler.reconcile()
+    finally:
+        await reconciler.close()
+
+    assert room.media_states == {"alice": {"audio": True, "video": False, "screen": False}}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_keeps_participants_who_join_during_list_rooms(fake_livekit):
+    """Test that the snapshot starts before ListRooms, so a join racing the query is not removed."""
+    room = await _room_with("racing", "bob")
+    fake_livekit.rooms["racing"] = {"bob": []}
+
+    async def join_now():
+        await ghost(room, "alice")
+
+    fake_livekit.during_list_rooms = join_now
+    reconciler = _reconciler(fake_livekit)
+    try:
+        await reconciler.reconcile()
+    finally:
+        await reconciler.close()
+
+    assert fake_livekit.calls == [("ListRooms", ["racing"]), ("ListParticipants", "racing")]
+    assert sorted(room.participants) == ["alice", "bob"]
@@ -0,0 +1,101 @@
+"""Tests for sequence-numbered broadcasts and resume-on-reconnect."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import Room, RoomConfig
+from config import settings
+from tests.conftest import FakeWebSocket
+
+
+async def _chat(room, text):
+    await room.broadcast({"type": "chat", "user": "alice", "text": text})
+
+
+@pytest.mark.asyncio
+async def test_broadcasts_carry_increasing_sequence_numbers():
+    """Test that every broadcast gets the next room sequence number."""
+    room = Room(RoomConfig(room_id="sequence"))
+    ws = FakeWebSocket()
+    await room.connect(ws)
+    base = ws.sent[0]["seq"]
+
+    await _chat(room, "one")
+    await room.broadcast_state()
+
+    assert [message["seq"] for message in ws.sent[1:]] == [base + 1, base + 2]
+
+
+@pytest.mark.asyncio
+async def test_connect_sends_snapshot_only_to_new_client():
+    """Test that a fresh connection gets a private snapshot and nobody else hears about it."""
+    room = Room(RoomConfig(room_id="private"))
+    present, newcomer = FakeWebSocket(), FakeWebSocket()
+    await room.connect(present)
+    present.sent.clear()
+
+    await room.connect(newcomer)
+
+    assert present.sent == []
+    assert [message["type"] for message in newcomer.sent] == ["state"]
+    assert newcomer.sent[0]["seq"] == room.seq
+
+
+@pytest.mark.asyncio
+async def test_resume_replays_only_missed_messages():
+    """Test that a client resuming within the buffer gets exactly the messages it missed."""
+    room = Room(RoomConfig(room_id="resume"))
+    await _chat(room, "seen")
+    last_seen = room.seq
+    for text in ("missed-1", "missed-2"):
+        await _chat(room, text)
+    other = FakeWebSocket()
+    await room.connect(other)
+    other.sent.clear()
+
+    ws = FakeWebSocket()
+    await room.connect(ws, since=last_seen)
+
+    assert [message["text"] for message in ws.sent] == ["missed-1", "missed-2"]
+    assert [message["seq"] for message in ws.sent] == [last_seen + 1, last_seen + 2]
+    assert other.sent == []
+
+    up_to_date = FakeWebSocket()
+    await room.connect(up_to_date, since=room.seq)
+    assert up_to_date.sent == []
+
+
+@pytest.mark.asyncio
+async def test_resume_falls_back_to_snapshot(monkeypatch):
+    """Test that a gap older than the buffer, or a sequence from another room instance, gets a snapshot."""
+    monkeypatch.setattr(settings, "replay_buffer_size", 4)
+    room = Room(RoomConfig(room_id="toolate"))
+    await _chat(room, "first")
+    stale = room.seq
+    for i in range(10):
+        await _chat(room, f"later-{i}")
+
+    for since in (stale, room.seq + 100):
+        ws = FakeWebSocket()
+        await room.connect(ws, since=since)
+        assert [message["type"] for message in ws.sent] == ["state"]
+        assert ws.sent[0]["seq"] == room.seq
+
+
+def test_reconnect_with_since_over_websocket(client: TestClient):
+    """Test resume end to end through the room WebSocket query parameter."""
+    with client.websocket_connect("/ws/rooms/reconnect") as ws:
+        ws.receive_json()
+        ws.send_json({"type": "join", "user": "alice"})
+        ws.receive_json()
+        last_seen = ws.receive_json()["seq"]
+
+        with client.websocket_connect("/ws/rooms/reconnect") as other:
+            other.receive_json()
+            other.send_json({"type": "chat", "user": "bob", "text": "while you were away"})
+            other.receive_json()
+
+        with client.websocket_connect(f"/ws/rooms/reconnect?since={last_seen}") as resumed:
+            missed = resumed.receive_json()
+            assert missed["type"] == "chat"
+            assert missed["seq"] == last_seen + 1
@@ -0,0 +1,128 @@
+"""Tests for sampled tracing spans, exporters and the traces debug endpoint."""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from config import settings
+from tracing import NOOP, FileExporter, RingExporter, Tracer, span, traced
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def sampled(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    monkeypatch.setattr(app_module.tracer, "sample_rate", 1.0)
+    app_module.trace_ring._traces.clear()
+    yield
+    app_module.trace_ring._traces.clear()
+
+
+@traced("inner")
+async def _inner():
+    with span("step", n=1):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_disabled_tracer_returns_noop():
+    """Test that nothing is recorded when sampling is off or no trace is active."""
+    ring = RingExporter()
+    tracer = Tracer(0.0, [ring])
+    assert tracer.trace("root") is NOOP
+    assert span("orphan") is NOOP
+    with tracer.trace("root"):
+        await _inner()
+    assert ring.traces() == []
+
+
+@pytest.mark.asyncio
+async def test_sampled_trace_nests_spans():
+    """Test that decorated coroutines and span blocks become children of the sampled root."""
+    ring = RingExporter()
+    tracer = Tracer(1.0, [ring])
+    with tracer.trace("root", room="abc"):
+        await _inner()
+
+    (trace,) = ring.traces()
+    assert trace["name"] == "root"
+    assert trace["attrs"] == {"room": "abc"}
+    names = {s["name"]: s for s in trace["spans"]}
+    assert names["inner"]["parent_id"] == names["root"]["span_id"]
+    assert names["step"]["parent_id"] == names["inner"]["span_id"]
+    assert names["step"]["attrs"] == {"n": 1}
+    assert all(s["duration_ms"] is not None for s in trace["spans"])
+
+
+@pytest.mark.asyncio
+async def test_spans_after_the_root_ends_are_dropped():
+    """Test that a background task spawned inside a trace does not extend it."""
+    ring = RingExporter()
+    tracer = Tracer(1.0, [ring])
+    release = asyncio.Event()
+
+    async def later():
+        await release.wait()
+        await _inner()
+
+    with tracer.trace("root"):
+        task = asyncio.create_task(later())
+    release.set()
+    await task
+
+    assert [s["name"] for s in ring.traces()[0]["spans"]] == ["root"]
+
+
+@pytest.mark.asyncio
+async def test_file_exporter_writes_json_lines(tmp_path):
+    """Test that the file exporter appends one JSON line per trace from its own thread."""
+    path = tmp_path / "traces" / "spans.jsonl"
+    exporter = FileExporter(str(path))
+    tracer = Tracer(1.0, [exporter])
+    for _ in range(3):
+        with tracer.trace("root"):
+            await _inner()
+    exporter.close()
+
+    lines = path.read_text("utf-8").splitlines()
+    assert len(lines) == 3
+    assert [s["name"] for s in json.loads(lines[0])["spans"]] == ["root", "inner", "step"]
+
+
+def test_websocket_message_is_traced(client: TestClient, sampled):
+    """Test that a sampled timer message shows mutation, serialization and fanout spans."""
+    with client.websocket_connect("/ws/rooms/traced") as websocket:
+        websocket.receive_json()
+        websocket.send_json({"type": "timer:start_focus", "user": "alice"})
+        websocket.receive_json()
+        websocket.receive_json()
+
+    response = client.get("/admin/traces", params={"name": "ws.timer:start_focus"}, headers=ADMIN)
+    assert response.status_code == 200
+    (trace,) = response.json()["traces"]
+    names = [s["name"] for s in trace["spans"]]
+    assert names[0] == "ws.timer:start_focus"
+    for expected in ("room.start_focus", "room.broadcast", "room.encode", "room.fanout", "room.state_dict"):
+        assert expected in names
+    fanout = next(s for s in trace["spans"] if s["name"] == "room.fanout")
+    assert fanout["attrs"] == {"clients": 1}
+
+
+def test_sfu_token_is_traced(client: TestClient, sampled, monkeypatch):
+    """Test that token issuance is recorded as its own trace."""
+    monkeypatch.setattr(settings, "livekit_api_key", "test_key")
+    monkeypatch.setattr(settings, "livekit_api_secret", "test_secret")
+    assert client.post("/sfu/token", json={"room_id": "tokenroom", "user": "alice"}).status_code == 200
+
+    traces = client.get("/admin/traces", headers=ADMIN).json()["traces"]
+    assert [t["name"] for t in traces] == ["http.sfu_token"]
+    assert traces[0]["attrs"] == {"room": "tokenroom"}
+
+
+def test_traces_endpoint_requires_admin_token(client: TestClient):
+    """Test that traces are only visible with the admin token."""
+    assert client.get("/admin/traces").status_code == 403
@@ -0,0 +1,115 @@
+"""Tests for LiveKit webhook ingestion using recorded webhook fixtures."""
+
+import base64
+import hashlib
+from pathlib import Path
+
+import httpx
+import pytest
+from livekit.api import AccessToken
+
+import app as app_module
+from app import RoomConfig, manager
+from config import settings
+from tests.conftest import FakeWebSocket, ghost, join
+
+FIXTURES = Path(__file__).parent / "fixtures" / "livekit"
+API_KEY = "APIwebhooktest"
+API_SECRET = "webhook-test-secret-with-enough-length"
+
+
+def _fixture(name):
+    return (FIXTURES / f"{name}.json").read_text("utf-8")
+
+
+def _sign(body, secret=API_SECRET):
+    digest = base64.b64encode(hashlib.sha256(body.encode("utf-8")).digest()).decode()
+    return AccessToken(API_KEY, secret).with_sha256(digest).to_jwt()
+
+
+@pytest.fixture
+async def webhook_client(monkeypatch):
+    monkeypatch.setattr(settings, "livekit_api_key", API_KEY)
+    monkeypatch.setattr(settings, "livekit_api_secret", API_SECRET)
+    # 窗口足够长，测试里手动 flush，保证所有请求落在同一批
+    monkeypatch.setattr(app_module.sfu_events, "window", 60)
+    transport = httpx.ASGITransport(app=app_module.app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    task = app_module.sfu_events._flush_task
+    if task is not None:
+        task.cancel()
+    app_module.sfu_events._flush_task = None
+    app_module.sfu_events._pending.clear()
+
+
+async def _post(client, name, secret=API_SECRET):
+    body = _fixture(name)
+    return await client.post(
+        "/sfu/webhook",
+        content=body,
+        headers={"Authorization": _sign(body, secret), "Content-Type": "application/webhook+json"},
+    )
+
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_bad_signature(webhook_client):
+    """Test that a webhook signed with the wrong secret or a tampered body is refused."""
+    response = await _post(webhook_client, "track_published_camera", secret="not-the-right-secret-at-all")
+    assert response.status_code == 401
+
+    body = _fixture("track_published_camera")
+    tampered = body.replace("alice", "mallory")
+    response = await webhook_client.post("/sfu/webhook", content=tampered, headers={"Authorization": _sign(body)})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_webhook_requires_livekit_credentials(webhook_client, monkeypatch):
+    """Test that the endpoint is unavailable without LiveKit credentials."""
+    monkeypatch.setattr(settings, "livekit_api_secret", "")
+    response = await _post(webhook_client, "participant_joined")
+    assert response.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_webhook_events_apply_in_one_batch(webhook_client):
+    """Test that track and participant events become one bulk update and one broadcast."""
+    room = await manager.upsert(RoomConfig(room_id="sfuroom"))
+    ws = FakeWebSocket()
+    await room.connect(ws)
+    await room.attach(ws, "alice")
+    await ghost(room, "bob")
+    await room.update_media_state("bob", {"audio": True, "video": True})
+    ws.sent.clear()
+
+    for name in (
+        "participant_joined",
+        "track_published_camera",
+        "track_published_microphone",
+        "track_unpublished_camera",
+        "participant_left",
+    ):
+        response = await _post(webhook_client, name)
+        assert response.status_code == 200
+    assert ws.sent == []
+
+    await app_module.sfu_events.flush()
+
+    states = [message for message in ws.sent if message["type"] == "state"]
+    assert len(states) == 1
+    assert states[0]["data"]["participants"] == ["alice"]
+    assert room.media_states == {"alice": {"audio": True, "video": False, "screen": False}}
+
+
+@pytest.mark.asyncio
+async def test_room_finished_clears_media(webhook_client):
+    """Test that room_finished clears stale media flags for everyone."""
+    room = await manager.upsert(RoomConfig(room_id="sfuroom"))
+    await join(room, "alice")
+    await room.update_media_state("alice", {"video": True, "screen": True})
+
+    assert (await _post(webhook_client, "room_finished")).status_code == 200
+    await app_module.sfu_events.flush()
+
+    assert room.media_states == {"alice": {"audio": False, "video": False, "screen": False}}